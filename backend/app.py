@@ -1,15 +1,29 @@
 import os
 import json
 from pathlib import Path
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, g, Response
 from flask_cors import CORS
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
-from collections import Counter
-import requests
-import icalendar
-from datetime import datetime
-import threading
+from datetime import date
+from hotness import fetch_hotness_map, count_course_hotness
+from table_scan import iter_table_rows
+from wrapped import get_wrapped_payload
+from response_cache import ResponseCache
+from static_data import StaticDataStore, CALENDAR_DATASET, CONTACTS_DATASET, CALENDAR_INDEX
+from calendar_index import CalendarIndex, today_local
+from catalog import get_catalog, KEYED_FIELDS
+from timeslots import parse_time_mask
+from timetable import build_problem, run_generation, TimetableError, TimetableBusy
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from graduation import get_requirement_index
+from course_archive import get_archive
+from schedule_store import (save_schedule, ScheduleWriteBuffer, ScheduleCache, SCHEDULE_WRITE_BEHIND_SECONDS,
+                            pending_schedule, schedule_query, schedule_from_rows)
+from schedule_requests import (RequestError, require_user_id, parse_save_body, parse_patch_body, patched_schedule,
+                               saved_body, queued_body, patched_body, conflicts_schedule_data, conflicts_body,
+                               parse_progress_params, progress_body)
+import metrics
 
 # --- 初始化 ---
 load_dotenv()
@@ -27,11 +41,31 @@ CORS(app, resources={r"/api/*": {"origins": ALLOWED_ORIGINS}})
 # --- 安全設定 END ---
 
 
+# --- 🆕 效能指標 (見 metrics.py) ---
+@app.before_request
+def start_request_metrics():
+    g.request_trace = metrics.begin_request(request.method, request.path)
+    trace = metrics.current_trace()
+    if trace is not None:
+        trace.route = request.url_rule.rule if request.url_rule else None
+
+@app.after_request
+def record_request_metrics(response):
+    metrics.end_request(g.pop('request_trace', None), response.status_code)
+    return response
+
+@app.teardown_request
+def record_failed_request_metrics(error=None):
+    # 未處理的例外不會經過 after_request，以 500 記錄
+    metrics.end_request(g.pop('request_trace', None), 500)
+
+
 # --- 全域變數宣告 ---
 supabase: Client = None
-STATIC_DATA = {}
-CALENDAR_EVENTS = []
-data_loaded = threading.Event()
+static_store = StaticDataStore()
+response_cache = ResponseCache()
+HOTNESS_CACHE_KEY = 'courses_hotness'
+HOTNESS_CACHE_SECONDS = int(os.environ.get("HOTNESS_CACHE_SECONDS", "30"))
 
 def initialize_app():
     """在應用程式上下文中，初始化所有服務"""
@@ -42,51 +76,54 @@ def initialize_app():
         key: str = os.environ.get("SUPABASE_KEY")
         if not url or not key:
             raise ValueError("FATAL: SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
-        supabase = create_client(url, key)
+        # 🆕 傳入計時用的 httpx client，記錄每次查詢的耗時
+        supabase = create_client(url, key, options=ClientOptions(httpx_client=metrics.timed_http_client()))
         print("Supabase client initialized.")
 
+schedule_cache = ScheduleCache()
+
+def on_schedule_saved(user_id, saved):
+    """課表寫入資料庫後：以寫入結果更新課表快取，熱門度有變動時讓熱門度快取失效"""
+    row = (saved or {}).get('data') or {}
+    schedule_cache.saved(user_id, {  # 🆕 同時通知其他 worker 的快取失效
+        'schedule_data': row.get('schedule_data', {}),
+        'flexible_courses': row.get('flexible_courses', []),
+        'version': (saved or {}).get('version', row.get('version')),
+    })
+    if saved and saved.get('hotness_changed'):
+        response_cache.invalidate(HOTNESS_CACHE_KEY)
+
+def write_buffered_schedule(user_id, schedule_data, flexible_courses):
+    return save_schedule(supabase, user_id, schedule_data, flexible_courses)
+
+# 🆕 選用的課表 write-behind 緩衝 (SCHEDULE_WRITE_BEHIND_SECONDS > 0 時啟用)
+schedule_write_buffer = (
+    ScheduleWriteBuffer(write_buffered_schedule, SCHEDULE_WRITE_BEHIND_SECONDS, on_flushed=on_schedule_saved)
+    if SCHEDULE_WRITE_BEHIND_SECONDS > 0 else None
+)
+
+def get_user_schedule(user_id) -> tuple:
+    """
+    🆕 讀取使用者課表 => (課表, CachedPayload)
+    依序查 write-behind 緩衝、課表快取，都沒有才查資料庫並放入快取；快取命中不查資料庫，
+    其他 worker 寫入後由變更計數 (ScheduleVersionBoard) 使快取失效
+    查詢與回應內容的組成見 schedule_store.py，asgi.py 的 async 版本共用同一套步驟
+    """
+    pending = pending_schedule(schedule_write_buffer, user_id)
+    if pending is not None:
+        return pending
+
+    cached = schedule_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    generation = schedule_cache.generation(user_id)  # 🆕 查詢前取得，查詢期間的寫入會讓這筆快取失效
+    schedule = schedule_from_rows(schedule_query(supabase, user_id).execute().data)  # 🆕 精簡格式補回完整課程資料
+    return schedule, schedule_cache.put(user_id, schedule, generation)
+
 def load_static_data_if_needed():
-    """懶加載：檢查資料是否已載入，如果沒有，則執行載入"""
-    if not data_loaded.is_set():
-        print("Static data not loaded yet. Loading now...")
-        global STATIC_DATA, CALENDAR_EVENTS
-        api_urls = {
-            'unitId_ncnu': 'https://api.ncnu.edu.tw/API/get.aspx?json=unitId_ncnu',
-            'contact_ncnu': 'https://api.ncnu.edu.tw/API/get.aspx?json=contact_ncnu',
-            'course_deptId': 'https://api.ncnu.edu.tw/API/get.aspx?json=course_deptId'
-        }
-        for key, data_url in api_urls.items():
-            try:
-                response = requests.get(data_url, timeout=15)
-                response.raise_for_status()
-                content = response.json()
-                data_key = list(content.keys())[0]
-                STATIC_DATA[key] = content[data_key].get('item', [])
-            except Exception as e:
-                print(f"Warning: Failed to fetch static data for '{key}'. Error: {e}")
-                STATIC_DATA[key] = []
-        try:
-            ics_url = "https://www.google.com/calendar/ical/curricul%40mail.ncnu.edu.tw/public/basic.ics"
-            response = requests.get(ics_url, timeout=15)
-            response.raise_for_status()
-            calendar = icalendar.Calendar.from_ical(response.content)
-            temp_events = []
-            CALENDAR_EVENTS.clear()
-            for component in calendar.walk():
-                if component.name == "VEVENT":
-                    dtstart, dtend = component.get('dtstart'), component.get('dtend')
-                    if dtstart and dtend:
-                        temp_events.append({
-                            "summary": str(component.get('summary')),
-                            "start": dtstart.dt.isoformat() if hasattr(dtstart.dt, 'isoformat') else str(dtstart.dt),
-                            "end": dtend.dt.isoformat() if hasattr(dtend.dt, 'isoformat') else str(dtend.dt)
-                        })
-            CALENDAR_EVENTS.extend(sorted(temp_events, key=lambda x: x['start']))
-        except Exception as e:
-            print(f"Warning: Failed to fetch calendar. Error: {e}")
-        
-        data_loaded.set()
-        print("Static data loading finished.")
+    """懶加載：第一次請求時載入，之後由背景執行緒定期更新"""
+    static_store.ensure_loaded()
 
 # --- API 端點 ---
 @app.route("/")
@@ -115,257 +152,288 @@ def handle_schedule():
         return jsonify({"error": "User ID is required"}), 400
     
     if request.method == 'POST':
-        # 🆕 接收兩種資料：schedule_data 和 flexible_courses
-        data = request.json
-        
-        # 兼容舊版前端（直接傳 schedule_data 物件）
-        if isinstance(data, dict) and 'schedule_data' not in data and 'flexible_courses' not in data:
-            # 舊版格式：直接傳課表物件
-            schedule_data = data
-            flexible_courses = []
-        else:
-            # 新版格式：包含 schedule_data 和 flexible_courses
-            schedule_data = data.get('schedule_data', {})
-            flexible_courses = data.get('flexible_courses', [])
+        # 🆕 接收兩種資料：schedule_data 和 flexible_courses (兼容舊版前端直接傳 schedule_data 物件)
+        try:
+            schedule_data, flexible_courses = parse_save_body(request.get_json(silent=True))
+        except RequestError as e:
+            return jsonify(e.body()), e.status
         
+        # 🆕 write-behind 開啟時只排入緩衝，由背景執行緒合併寫出
+        if schedule_write_buffer is not None:
+            pending_row = schedule_write_buffer.put(user_id, schedule_data, flexible_courses)
+            schedule_cache.invalidate(user_id)
+            return jsonify(queued_body(pending_row))
+
         try:
-            response = supabase.table('schedules').select('id').eq('user_id', user_id).limit(1).execute()
-            if response.data:
-                # 更新現有記錄
-                update_response = supabase.table('schedules').update({
-                    'schedule_data': schedule_data,
-                    'flexible_courses': flexible_courses  # 🆕 同時更新彈性課程
-                }).eq('user_id', user_id).execute()
-                return jsonify({"success": True, "action": "updated", "data": update_response.data[0]})
-            else:
-                # 新增記錄
-                insert_response = supabase.table('schedules').insert({
-                    'user_id': user_id,
-                    'schedule_data': schedule_data,
-                    'flexible_courses': flexible_courses  # 🆕 同時插入彈性課程
-                }).execute()
-                return jsonify({"success": True, "action": "inserted", "data": insert_response.data[0]})
+            # 🆕 單次 RPC：以 user_id upsert，並在同一交易中累加課程熱門度 (sql/003_save_schedule.sql)
+            saved = save_schedule(supabase, user_id, schedule_data, flexible_courses)
         except Exception as e:
+            schedule_cache.invalidate(user_id)  # 寫入結果不明，下次讀取改查資料庫
             print(f"!!!!!! FATAL ERROR during POST /api/schedule for user {user_id} !!!!!!")
             import traceback
             traceback.print_exc()
             return jsonify({"error": str(e)}), 500
+
+        on_schedule_saved(user_id, saved)
+        return jsonify(saved_body(saved))
     
     if request.method == 'GET':
         try:
-            # 🆕 同時查詢 schedule_data 和 flexible_courses
-            response = supabase.table('schedules').select('schedule_data, flexible_courses').eq('user_id', user_id).limit(1).execute()
-            
-            if response.data:
-                return jsonify({
-                    'schedule_data': response.data[0].get('schedule_data', {}),
-                    'flexible_courses': response.data[0].get('flexible_courses', [])  # 🆕 回傳彈性課程
-                })
-            else:
-                # 無資料時回傳預設值
-                return jsonify({
-                    'schedule_data': {},
-                    'flexible_courses': []
-                })
+            # 🆕 課表快取 + ETag：客戶端帶 If-None-Match 且課表未變時回 304
+            _, payload = get_user_schedule(user_id)
+            return payload.to_response(request, cache_control='private, no-cache')
         except Exception as e: 
             return jsonify({"error": str(e)}), 500
 
+@app.route("/api/schedule", methods=['PATCH'])
+def patch_schedule():
+    """
+    🆕 增量同步：只送出這次的變動，並以版本號避免多個分頁互相覆蓋
+    Body: {"base_version": 3, "ops": [{"op": "add", "course": {...}}, {"op": "remove", "course_id": "992062"}]}
+    操作格式見 schedule_format.apply_schedule_ops；版本不符時回 409 與目前版本，前端需重新讀取課表
+    """
+    user_id = request.args.get('user_id')
+    try:
+        require_user_id(user_id)
+        base_version, ops = parse_patch_body(request.get_json(silent=True))
+        # 緩衝中的舊課表必須先寫出，否則稍後寫出時會蓋掉這次的變動
+        if schedule_write_buffer is not None:
+            schedule_write_buffer.flush(user_ids={user_id})
+        schedule, _ = get_user_schedule(user_id)
+        schedule_data, flexible_courses = patched_schedule(schedule, base_version, ops)
+        saved = save_schedule(supabase, user_id, schedule_data, flexible_courses, base_version=base_version)
+    except RequestError as e:
+        return jsonify(e.body()), e.status
+    except Exception as e:
+        schedule_cache.invalidate(user_id)
+        print(f"ERROR in patch_schedule for user {user_id}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    on_schedule_saved(user_id, saved)
+    return jsonify(patched_body(saved))
+
+@app.route("/api/schedule/conflicts", methods=['POST'])
+def check_schedule_conflicts():
+    """
+    🆕 批次衝堂檢查：一次回傳目錄中哪些課程與課表衝堂、哪些可排
+    Body: {"schedule_data": {...}}；若未提供則以 ?user_id= 讀取已儲存的課表
+    """
+    user_id = request.args.get('user_id')
+    try:
+        schedule_data = conflicts_schedule_data(request.get_json(silent=True), user_id)
+        if schedule_data is None:
+            schedule_data = get_user_schedule(user_id)[0]['schedule_data']
+        return jsonify(conflicts_body(schedule_data))
+    except RequestError as e:
+        return jsonify(e.body()), e.status
+    except Exception as e:
+        print(f"ERROR in check_schedule_conflicts: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/schedule/generate", methods=['POST'])
+def generate_schedule():
+    """
+    🆕 自動排課：由願望清單產生不衝堂的班別組合，依排進課數、到校天數排序
+    Body: {"course_ids": [...], "required": [...], "blocked_slots": ["1e", "5ab"],
+           "max_credits": 20, "max_results": 10}
+    """
+    data = request.get_json(silent=True) or {}
+    course_ids = data.get('course_ids')
+    if not isinstance(course_ids, list):
+        return jsonify({"error": "course_ids must be a list"}), 400
+
+    blocked_mask = 0
+    for slot in data.get('blocked_slots') or []:
+        blocked_mask |= parse_time_mask(slot)
+
+    max_credits = data.get('max_credits')
+    try:
+        max_credits = float(max_credits) if max_credits is not None else None
+        max_results = int(data.get('max_results', 10))
+        problem = build_problem(get_catalog(), course_ids, data.get('required') or [], blocked_mask,
+                                max_credits, max_results)
+    except (TimetableError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        return jsonify(run_generation(problem))
+    except TimetableBusy as e:
+        return jsonify({"error": str(e)}), 503
+    except FutureTimeoutError:
+        return jsonify({"error": "Schedule generation timed out, please narrow down the wishlist."}), 503
+    except Exception as e:
+        print(f"ERROR in generate_schedule: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def compute_course_hotness() -> dict:
+    # 🆕 直接讀取增量維護的 course_hotness 表，不再全表掃描 schedules
+    # 空表是正常狀態 (還沒有人排課，或剛 reconcile)，直接回傳 {}
+    try:
+        return fetch_hotness_map(supabase)
+    except Exception as e:
+        print(f"Warning: Failed to read course_hotness table, falling back to full scan. Error: {e}")
+
+    # 計數表尚未建立 (未執行 sql/001) 時，退回即時計算
+    rows = iter_table_rows(supabase, 'schedules', 'schedule_data, flexible_courses')  # 🆕 分頁串流掃描
+    return dict(count_course_hotness(rows))
+
 @app.route("/api/courses/hotness")
 def get_course_hotness():
     try:
-        response = supabase.table('schedules').select('schedule_data, flexible_courses').execute()  # 🆕 也查詢 flexible_courses
-        if not response.data:
-            return jsonify({})
-
-        course_counts = Counter()
-        
-        # 計算固定時間課程熱度
-        all_schedules = [item['schedule_data'] for item in response.data if item and item.get('schedule_data')]
-        for schedule in all_schedules:
-            if isinstance(schedule, dict) and schedule:
-                unique_course_ids_in_schedule = {
-                    course['course_id'] 
-                    for course in schedule.values() 
-                    if isinstance(course, dict) and 'course_id' in course
-                }
-                course_counts.update(unique_course_ids_in_schedule)
-        
-        # 🆕 計算彈性課程熱度
-        all_flexible = [item['flexible_courses'] for item in response.data if item and item.get('flexible_courses')]
-        for flexible_list in all_flexible:
-            if isinstance(flexible_list, list):
-                unique_flexible_ids = {
-                    course['course_id']
-                    for course in flexible_list
-                    if isinstance(course, dict) and 'course_id' in course
-                }
-                course_counts.update(unique_flexible_ids)
-                
-        return jsonify(dict(course_counts))
+        # 🆕 序列化結果短暫快取；本 worker 有人存課表時立即失效
+        payload = response_cache.get_or_build(HOTNESS_CACHE_KEY, None, compute_course_hotness,
+                                              max_age_seconds=HOTNESS_CACHE_SECONDS)
+        return payload.to_response(request)
     except Exception as e:
         print(f"ERROR in get_course_hotness: {e}")
         return jsonify({"error": "An error occurred while calculating course hotness."}), 500
 
+MAX_SEARCH_PAGE_SIZE = 100
+
+@app.route("/api/courses/search")
+def search_courses():
+    """
+    🆕 伺服器端課程搜尋 (n-gram 索引)，前端不必下載整份開課資訊
+    參數: q (課名/英文課名/教師), course_name, teacher, department, division, faculty, page, page_size
+    """
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', 20))
+    except ValueError:
+        return jsonify({"error": "page and page_size must be integers"}), 400
+    if page < 1 or not 1 <= page_size <= MAX_SEARCH_PAGE_SIZE:
+        return jsonify({"error": f"page must be >= 1 and page_size between 1 and {MAX_SEARCH_PAGE_SIZE}"}), 400
+
+    result = get_catalog().search(
+        query=request.args.get('q', ''),
+        field_queries={
+            'course_cname': request.args.get('course_name', ''),
+            'teacher': request.args.get('teacher', ''),
+        },
+        filters={field: request.args.get(field, '') for field in KEYED_FIELDS},
+        page=page,
+        page_size=page_size,
+    )
+    return jsonify(result)
+
+@app.route("/api/courses/history")
+def get_course_history():
+    """
+    🆕 歷年開課紀錄 (欄式封存，只讀取需要的欄位)
+    參數: teacher 或 course_id 二擇一
+    """
+    teacher = request.args.get('teacher', '').strip()
+    course_id = request.args.get('course_id', '').strip()
+    if not teacher and not course_id:
+        return jsonify({"error": "teacher or course_id is required"}), 400
+    try:
+        archive = get_archive()
+        history = archive.teacher_history(teacher) if teacher else archive.course_history(course_id)
+        return jsonify({"semesters": archive.semesters(), "history": history})
+    except Exception as e:
+        print(f"Error in /api/courses/history: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def static_json_response(dataset: str):
+    """🆕 靜態資料集的快取回應（ETag / 壓縮），資料重新載入後自動失效"""
+    load_static_data_if_needed()
+    data, version = static_store.get_with_version(dataset, [])
+    return response_cache.get_or_build(dataset, version, lambda: data).to_response(request)
+
 @app.route('/api/departments')
 def get_departments():
-    load_static_data_if_needed()
-    return jsonify(STATIC_DATA.get('course_deptId', []))
+    return static_json_response('course_deptId')
 
 @app.route('/api/contacts')
 def get_contacts():
-    load_static_data_if_needed()
-    contacts = STATIC_DATA.get('contact_ncnu', [])
-    unit_info = STATIC_DATA.get('unitId_ncnu', [])
-    if contacts and unit_info:
-        for contact in contacts:
-            matching_unit = next((unit for unit in unit_info if unit['中文名稱'] == contact['title']), None)
-            if matching_unit: contact['web'] = matching_unit.get('網站網址', contact.get('web'))
-    return jsonify(contacts)
+    # 🆕 聯絡資訊與單位網址的合併已在資料載入時完成，這裡直接回傳
+    return static_json_response(CONTACTS_DATASET)
 
 @app.route('/api/calendar')
 def get_calendar():
+    return static_json_response(CALENDAR_DATASET)
+
+@app.route('/api/data/status')
+def get_data_status():
+    """🆕 回傳各靜態資料集的年齡，方便確認背景更新是否正常"""
     load_static_data_if_needed()
-    return jsonify(CALENDAR_EVENTS)
+    return jsonify({
+        "ttl_seconds": static_store.ttl_seconds,
+        "datasets": static_store.dataset_status()
+    })
+
+# --- 畢業進度 API ---
+@app.route('/api/graduation/progress')
+def get_graduation_progress():
+    """
+    🆕 以已儲存的課表計算畢業必修進度
+    參數: user_id, dept_id (開課單位代碼), class (B/G/P，預設 B), year (預設為該系所最新學年)
+    """
+    try:
+        query = parse_progress_params(request.args)
+        return jsonify(progress_body(query, get_user_schedule(query['user_id'])[0]))
+    except RequestError as e:
+        return jsonify(e.body()), e.status
+    except Exception as e:
+        print(f"ERROR in get_graduation_progress: {e}")
+        return jsonify({"error": str(e)}), 500
 
 # --- Semester Wrapped API ---
 @app.route('/api/wrapped/<user_google_id>')
 def get_user_wrapped(user_google_id):
+    # 🆕 優先讀取批次快照 (wrapped.py --refresh)，快照後才加入的使用者改為即時計算
     try:
-        # 1. 驗證使用者是否存在 & 獲取加入時間
-        user_res = supabase.table('users').select('created_at, full_name').eq('google_id', user_google_id).execute()
-        if not user_res.data:
+        payload = get_wrapped_payload(supabase, user_google_id)
+        if payload is None:
             return jsonify({"error": "User not found"}), 404
-        
-        current_user = user_res.data[0]
-        join_date = current_user['created_at'] # ISO format string
-        
-        # 2. 計算加入順序 (Rank)
-        # 計算有多少人的 created_at 比這位使用者早 (或者直接用 count)
-        # 注意：supabase 若無 created_at 欄位需確認 schema，假設有。若無，暫時用 id 排序模擬。
-        # 這裡假設 users 表有 created_at，如果原本沒有，可能需要 fallback。
-        # 由於 users 表結構未知，我們保守使用 'created_at' 欄位，若出錯則用假資料或 id 排序。
-        
-        try:
-            rank_res = supabase.table('users').select('google_id', count='exact').lt('created_at', join_date).execute()
-            user_rank = rank_res.count + 1
-        except Exception:
-            # Fallback if created_at doesn't exist or other error, assume based on row count roughly
-             user_rank = 999 
-
-        # 3. 獲取該使用者課表與計算學分
-        schedule_res = supabase.table('schedules').select('schedule_data, flexible_courses').eq('user_id', user_google_id).execute()
-        
-        my_total_credits = 0.0
-        my_dept_counts = Counter()
-        
-        if schedule_res.data:
-            data = schedule_res.data[0]
-            sch = data.get('schedule_data', {})
-            flex = data.get('flexible_courses', [])
-            
-            # 去重計算固定課程
-            unique_fixed = {
-                v['course_id']: v for v in sch.values() 
-                if isinstance(v, dict) and 'course_id' in v
-            }
-            
-            # 彈性課程
-            unique_flex = {
-                v['course_id']: v for v in flex
-                if isinstance(v, dict) and 'course_id' in v
-            }
-            
-            # 合併計算學分與科系
-            all_courses = list(unique_fixed.values()) + list(unique_flex.values())
-            for c in all_courses:
-                try:
-                    cred = float(c.get('course_credit', 0))
-                    my_total_credits += cred
-                except:
-                    pass
-                
-                dept = c.get('department', '')
-                if dept: my_dept_counts[dept] += 1
-                
-        # 4. 全校數據分析 (Percentile)
-        # 為了效能，不要拉全部 data，只拉有 schedule 的 user_id 
-        # 但目前 supabase-py 無法直接做 aggregation query 回傳 array of credits.
-        # 暫時拉取 limited 數量 (例如 1000 筆) 來做統計樣本，或者若 user 少則全拉。
-        all_schedules_res = supabase.table('schedules').select('schedule_data, flexible_courses').limit(1000).execute()
-        
-        all_credits = []
-        for row in all_schedules_res.data:
-            s_data = row.get('schedule_data', {})
-            f_data = row.get('flexible_courses', [])
-            
-            u_fixed = {v['course_id']: v for v in s_data.values() if isinstance(v, dict) and 'course_id' in v}
-            u_flex = {v['course_id']: v for v in f_data if isinstance(v, dict) and 'course_id' in v}
-            
-            total = 0.0
-            for c in list(u_fixed.values()) + list(u_flex.values()):
-                try:
-                    total += float(c.get('course_credit', 0))
-                except:
-                    pass
-            all_credits.append(total)
-            
-        # 計算落在前百分之幾
-        # 贏過多少人 => (小於我的學分的人數 / 總人數) * 100
-        if not all_credits:
-            percentile = 0
-        else:
-            wins = sum(1 for c in all_credits if c < my_total_credits)
-            percentile = int((wins / len(all_credits)) * 100)
-            
-        # 5. 最愛科系
-        fav_dept = my_dept_counts.most_common(1)
-        favorite_dept = fav_dept[0][0] if fav_dept else "尚未分析"
-        
-        # 6. 生成評語
-        tags = []
-        if my_total_credits >= 20: tags.append("卷哥卷姐\n候選人")
-        elif my_total_credits >= 18: tags.append("充實的\n大學生")
-        elif my_total_credits >= 16: tags.append("Work-Life\nBalance")
-        elif my_total_credits >= 12: tags.append("佛系\n大學生")
-        else: tags.append("還在\n探索中...")
-        
-        return jsonify({
-            "join_date": join_date.split('T')[0] if 'T' in join_date else join_date,
-            "user_name": current_user.get('full_name', 'Student'),
-            "user_rank": user_rank,
-            "total_credits": round(my_total_credits, 1),
-            "percentile": percentile,
-            "favorite_dept": favorite_dept,
-            "tag": tags[0]
-        })
-
+        return jsonify(payload)
     except Exception as e:
         print(f"ERROR in get_user_wrapped: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/metrics')
+def get_metrics():
+    # 🆕 Prometheus 抓取端點；設定 METRICS_TOKEN 時需帶 Bearer token
+    if metrics.METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {metrics.METRICS_TOKEN}":
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 # --- 應用程式啟動區塊 ---
 with app.app_context():
     initialize_app()
+    get_requirement_index()
+
+MAX_EVENT_RANGE_DAYS = 400
+
+def get_calendar_index() -> CalendarIndex:
+    load_static_data_if_needed()
+    return static_store.get(CALENDAR_INDEX) or CalendarIndex([])
 
 @app.route('/api/events/today')
 def get_today_events():
     """
     篩選並回傳今天的行事曆活動。
+    🆕 使用日期索引，跨多天的活動 (考試週、連假) 在期間內每天都會出現。
     """
-    from datetime import datetime
-    load_static_data_if_needed()
-    
-    today_str = datetime.now().strftime('%Y-%m-%d')
-    today_events = []
-
-    for event in CALENDAR_EVENTS:
-        # 確保 event['start'] 是字串且至少有10個字元 (YYYY-MM-DD)
-        if isinstance(event.get('start'), str) and len(event['start']) >= 10:
-            event_date_str = event['start'][:10]
-            if event_date_str == today_str:
-                today_events.append(event)
-    
-    return jsonify(today_events)
+    return jsonify(get_calendar_index().events_on(today_local()))
+
+@app.route('/api/events')
+def get_events_in_range():
+    """
+    🆕 回傳與 [from, to] 日期區間 (YYYY-MM-DD，皆包含) 有交集的行事曆活動。
+    省略 to 時只查 from 當天。
+    """
+    try:
+        start_day = date.fromisoformat(request.args.get('from', ''))
+        end_day = date.fromisoformat(request.args.get('to') or request.args['from'])
+    except (KeyError, ValueError):
+        return jsonify({"error": "Query parameters 'from' and 'to' must be dates in YYYY-MM-DD format"}), 400
+    if end_day < start_day:
+        return jsonify({"error": "'to' must not be earlier than 'from'"}), 400
+    if (end_day - start_day).days > MAX_EVENT_RANGE_DAYS:
+        return jsonify({"error": f"Date range must not exceed {MAX_EVENT_RANGE_DAYS} days"}), 400
+
+    return jsonify(get_calendar_index().events_between(start_day, end_day))
 
 # --- Flask 應用程式啟動 ---
 if __name__ == '__main__':
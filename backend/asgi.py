@@ -0,0 +1,247 @@
+# backend/asgi.py
+"""
+非同步 (ASGI) 服務模式
+
+啟動：
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker -w 2
+    (本機) uvicorn asgi:app --port 5000
+
+- 等待 Supabase 的高流量端點 (登入、課表讀寫、衝堂檢查、畢業進度) 以 async 實作，
+  使用 supabase AsyncClient；等待資料庫時不佔用 worker，一個 worker 可同時處理大量請求
+- 其他端點原封不動交給 Flask app (a2wsgi 在執行緒池中執行)，回應格式與同步模式相同
+- 與 Flask app 共用同一個 process 內的狀態：課表快取、write-behind 緩衝、熱門度快取、靜態資料
+- 請求解析、驗證與回應內容和 Flask 端點共用 schedule_requests.py / schedule_store.py，這裡只有 await 的 I/O
+- NCNU API / Google 行事曆的抓取已由 StaticDataStore 在背景執行緒完成，不在請求路徑上
+- 課表還原 / 精簡、衝堂檢查與畢業進度會讀取課程目錄、封存與必修索引 (第一次使用時才從檔案載入)，
+  以 run_in_threadpool 在執行緒中執行，載入期間不阻塞 event loop
+- 效能指標 (metrics.py) 由 RequestMetricsMiddleware 記錄，交給 Flask 的請求不會重複計算
+
+同步模式 (gunicorn app:app) 仍可照常使用；兩者的吞吐量比較見 bench/async_throughput.py
+"""
+import os
+import json
+import asyncio
+import contextlib
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+
+import app as flask_app
+import metrics
+from response_cache import CachedPayload
+from schedule_requests import (RequestError, require_user_id, parse_save_body, parse_patch_body, patched_schedule,
+                               saved_body, queued_body, patched_body, conflicts_schedule_data, conflicts_body,
+                               parse_progress_params, progress_body)
+from schedule_store import save_schedule_async, pending_schedule, schedule_query, schedule_from_rows
+
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", "16"))
+
+async_supabase: AsyncClient = None
+
+
+def json_response(obj, status: int = 200) -> Response:
+    """與 Flask jsonify 相同的序列化方式 (key 排序、ASCII 跳脫)，兩種模式的回應位元組一致"""
+    body = json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(',', ':')) + "\n"
+    return Response(body, status_code=status, media_type='application/json')
+
+
+def payload_response(request: Request, payload: CachedPayload, cache_control: str = 'no-cache') -> Response:
+    status, body, headers = payload.render(
+        request.headers.get('if-none-match'), request.headers.get('accept-encoding'), cache_control
+    )
+    if status == 304:
+        return Response(status_code=304, headers=headers)
+    return Response(body, status_code=status, headers=headers, media_type='application/json')
+
+
+async def read_json(request: Request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def get_user_schedule(user_id) -> tuple:
+    """app.get_user_schedule 的 async 版本：緩衝 → 快取 → 資料庫"""
+    pending = pending_schedule(flask_app.schedule_write_buffer, user_id)
+    if pending is not None:
+        return pending
+
+    cache = flask_app.schedule_cache
+    cached = cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    generation = cache.generation(user_id)
+    rows = (await schedule_query(async_supabase, user_id).execute()).data
+    schedule = await run_in_threadpool(schedule_from_rows, rows)
+    return schedule, cache.put(user_id, schedule, generation)
+
+
+def error_response(error: RequestError) -> Response:
+    return json_response(error.body(), error.status)
+
+
+class RequestMetricsMiddleware:
+    """記錄每個請求的延遲與狀態碼；路由樣板取自 Starlette 路由，交給 Flask 的請求由 Flask 填入"""
+
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        trace = metrics.begin_request(scope['method'], scope['path'])
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if trace is not None and trace.route is None and isinstance(scope.get('route'), Route):
+                trace.route = scope['route'].path
+            metrics.end_request(trace, status)
+
+
+# --- async 端點 (與 app.py 中同名端點的行為相同) ---
+async def google_auth(request: Request):
+    user_info = await read_json(request)
+    if not user_info or 'google_id' not in user_info:
+        return json_response({"error": "Invalid user info"}, 400)
+    try:
+        await async_supabase.table('users').upsert({
+            'google_id': user_info['google_id'], 'email': user_info.get('email'),
+            'full_name': user_info.get('full_name'), 'avatar_url': user_info.get('avatar_url')
+        }, on_conflict='google_id').execute()
+        return json_response(user_info)
+    except Exception as e:
+        print(f"ERROR in google_auth: {e}")
+        return json_response({"error": str(e)}, 500)
+
+
+async def handle_schedule(request: Request):
+    user_id = request.query_params.get('user_id')
+    if not user_id:
+        return json_response({"error": "User ID is required"}, 400)
+
+    if request.method == 'GET':
+        try:
+            _, payload = await get_user_schedule(user_id)
+            return payload_response(request, payload, cache_control='private, no-cache')
+        except Exception as e:
+            return json_response({"error": str(e)}, 500)
+
+    try:
+        schedule_data, flexible_courses = parse_save_body(await read_json(request))
+    except RequestError as e:
+        return error_response(e)
+
+    buffer = flask_app.schedule_write_buffer
+    if buffer is not None:
+        pending_row = buffer.put(user_id, schedule_data, flexible_courses)
+        flask_app.schedule_cache.invalidate(user_id)
+        return json_response(queued_body(pending_row))
+
+    try:
+        saved = await save_schedule_async(async_supabase, user_id, schedule_data, flexible_courses)
+    except Exception as e:
+        flask_app.schedule_cache.invalidate(user_id)
+        print(f"!!!!!! FATAL ERROR during POST /api/schedule for user {user_id}: {e} !!!!!!")
+        return json_response({"error": str(e)}, 500)
+
+    flask_app.on_schedule_saved(user_id, saved)
+    return json_response(saved_body(saved))
+
+
+async def patch_schedule(request: Request):
+    """app.patch_schedule 的 async 版本"""
+    user_id = request.query_params.get('user_id')
+    try:
+        require_user_id(user_id)
+        base_version, ops = parse_patch_body(await read_json(request))
+        buffer = flask_app.schedule_write_buffer
+        if buffer is not None:
+            await asyncio.to_thread(buffer.flush, user_ids={user_id})
+        schedule, _ = await get_user_schedule(user_id)
+        schedule_data, flexible_courses = await run_in_threadpool(patched_schedule, schedule, base_version, ops)
+        saved = await save_schedule_async(async_supabase, user_id, schedule_data, flexible_courses,
+                                          base_version=base_version)
+    except RequestError as e:
+        return error_response(e)
+    except Exception as e:
+        flask_app.schedule_cache.invalidate(user_id)
+        print(f"ERROR in patch_schedule for user {user_id}: {e}")
+        return json_response({"error": str(e)}, 500)
+
+    flask_app.on_schedule_saved(user_id, saved)
+    return json_response(patched_body(saved))
+
+
+async def check_schedule_conflicts(request: Request):
+    user_id = request.query_params.get('user_id')
+    try:
+        schedule_data = conflicts_schedule_data(await read_json(request), user_id)
+        if schedule_data is None:
+            schedule_data = (await get_user_schedule(user_id))[0]['schedule_data']
+        return json_response(await run_in_threadpool(conflicts_body, schedule_data))
+    except RequestError as e:
+        return error_response(e)
+    except Exception as e:
+        print(f"ERROR in check_schedule_conflicts: {e}")
+        return json_response({"error": str(e)}, 500)
+
+
+async def get_graduation_progress(request: Request):
+    try:
+        query = parse_progress_params(request.query_params)
+        schedule, _ = await get_user_schedule(query['user_id'])
+        return json_response(await run_in_threadpool(progress_body, query, schedule))
+    except RequestError as e:
+        return error_response(e)
+    except Exception as e:
+        print(f"ERROR in get_graduation_progress: {e}")
+        return json_response({"error": str(e)}, 500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    global async_supabase
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        raise ValueError("FATAL: SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
+    async_supabase = await acreate_client(
+        url, key, options=AsyncClientOptions(httpx_client=metrics.async_timed_http_client())
+    )
+    print("Async Supabase client initialized.")
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/api/auth/google", google_auth, methods=['POST']),
+        Route("/api/schedule", handle_schedule, methods=['GET', 'POST']),
+        Route("/api/schedule", patch_schedule, methods=['PATCH']),
+        Route("/api/schedule/conflicts", check_schedule_conflicts, methods=['POST']),
+        Route("/api/graduation/progress", get_graduation_progress, methods=['GET']),
+        # 其餘端點交給原本的 Flask app
+        Mount("/", app=WSGIMiddleware(flask_app.app, workers=ASGI_WSGI_THREADS)),
+    ],
+    middleware=[
+        Middleware(RequestMetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=flask_app.ALLOWED_ORIGINS,
+                   allow_methods=['*'], allow_headers=['*']),
+    ],
+    lifespan=lifespan,
+)
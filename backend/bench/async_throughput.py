@@ -0,0 +1,113 @@
+# backend/bench/async_throughput.py
+"""
+同步 (gunicorn app:app) 與非同步 (gunicorn asgi:app + UvicornWorker) 服務模式的並行吞吐量比較
+
+以 fake_postgrest.py 模擬 Supabase (獨立 process，每個請求固定延遲)，兩種模式各啟動一個 gunicorn，
+再以 httpx.AsyncClient 開 --concurrency 個並行客戶端，在 --duration 秒內交錯送出
+GET /api/schedule 與 POST /api/schedule (課表快取關閉，每個請求都會查資料庫)。
+
+用法 (在 backend/ 執行)：
+    python bench/async_throughput.py [--workers 2] [--concurrency 64] [--duration 10] [--latency 0.03]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+from harness import (BACKEND_DIR, FAKE_SUPABASE_KEY, free_port, wait_ready, start_fake_postgrest, stop,
+                     summarize)
+
+MODES = {
+    "sync": ["app:app"],
+    "async": ["asgi:app", "-k", "uvicorn.workers.UvicornWorker"],
+}
+
+
+def start_server(mode: str, port: int, workers: int, supabase_url: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        SUPABASE_URL=supabase_url,
+        SUPABASE_KEY=FAKE_SUPABASE_KEY,
+        SCHEDULE_CACHE_TTL_SECONDS="0",
+        SCHEDULE_WRITE_BEHIND_SECONDS="0",
+    )
+    command = [sys.executable, "-m", "gunicorn", *MODES[mode], "-w", str(workers),
+               "-b", f"127.0.0.1:{port}", "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+
+
+async def run_load(port: int, concurrency: int, duration: float, users: int) -> dict:
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        async def worker(worker_id: int):
+            nonlocal errors
+            i = 0
+            while time.monotonic() < deadline:
+                user_id = f"bench-user-{(worker_id * 7919 + i) % users}"
+                started = time.perf_counter()
+                try:
+                    if i % 2:
+                        response = await client.post("/api/schedule", params={"user_id": user_id}, json={
+                            "schedule_data": {"1a": {"course_id": str(900000 + i % 50), "class": "0"}},
+                            "flexible_courses": [],
+                        })
+                    else:
+                        response = await client.get("/api/schedule", params={"user_id": user_id})
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+                i += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(w) for w in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    return {**summarize(latencies, elapsed), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同步 / 非同步服務模式吞吐量比較")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker 數 (兩種模式相同)")
+    parser.add_argument("--concurrency", type=int, default=64, help="並行客戶端數")
+    parser.add_argument("--duration", type=float, default=10.0, help="每種模式的壓測秒數")
+    parser.add_argument("--latency", type=float, default=0.03, help="模擬資料庫每次往返的延遲秒數")
+    parser.add_argument("--users", type=int, default=1000, help="模擬的使用者數")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    results = {}
+    fake_port = free_port()
+    fake = start_fake_postgrest(fake_port, args.latency)
+    try:
+        wait_ready(fake_port, "/rest/v1/schedules?limit=1", process=fake)
+        for mode in args.modes:
+            port = free_port()
+            server = start_server(mode, port, args.workers, f"http://127.0.0.1:{fake_port}")
+            try:
+                wait_ready(port, process=server)
+                asyncio.run(run_load(port, args.concurrency, 1.0, args.users))  # 暖機
+                results[mode] = asyncio.run(run_load(port, args.concurrency, args.duration, args.users))
+            finally:
+                stop(server)
+    finally:
+        stop(fake)
+
+    print(f"\nworkers={args.workers} concurrency={args.concurrency} duration={args.duration}s "
+          f"db_latency={args.latency * 1000:.0f}ms")
+    print(f"{'mode':<6} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<6} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.1f} "
+              f"{r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# backend/bench/fake_postgrest.py
+"""
+效能測試用的記憶體版 PostgREST (Supabase REST API 替身)
+
+只實作後端實際用到的部分：
+- GET    /rest/v1/<table>?select=&<col>=eq.|gt.|lt.|in.()&order=&limit=&offset=
+- POST   /rest/v1/<table>            insert；Prefer: resolution=merge-duplicates + on_conflict 為 upsert
+- PATCH  /rest/v1/<table>?<filters>  update
+- DELETE /rest/v1/<table>?<filters>
+- POST   /rest/v1/rpc/<name>         以 Python 重現 sql/ 中的 RPC (save_schedule 含熱門度增量、replace_course_hotness)；
+                                     改動 sql/ 中的函式時需同步修改這裡
+- POST   /rest/v1/rpc/bench_drop_table  替身專用：移除資料表，之後的讀取回 404 (模擬尚未執行 migration)
+
+每個請求可加上固定延遲 (latency)，模擬真實資料庫的網路往返；伺服器以執行緒處理並行請求。
+"""
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qsl
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from hotness import extract_course_ids  # noqa: E402
+from population import ERAS, PopulationGenerator  # noqa: E402
+
+RESERVED_PARAMS = ('select', 'order', 'limit', 'offset', 'on_conflict', 'columns')
+
+
+def _coerce(value: str, sample):
+    """把查詢字串中的值轉成與欄位相同的型別再比較"""
+    if isinstance(sample, bool):
+        return value == 'true'
+    if isinstance(sample, int):
+        return int(value)
+    if isinstance(sample, float):
+        return float(value)
+    return value
+
+
+def _matches(row: dict, column: str, expression: str) -> bool:
+    operator, _, raw = expression.partition('.')
+    value = row.get(column)
+    if operator == 'is':
+        return value is None if raw == 'null' else str(value).lower() == raw
+    if value is None:
+        return False
+    if operator == 'in':
+        return str(value) in [v.strip('"') for v in raw.strip('()').split(',')]
+    target = _coerce(raw, value)
+    return {
+        'eq': value == target, 'neq': value != target, 'gt': value > target,
+        'gte': value >= target, 'lt': value < target, 'lte': value <= target,
+    }.get(operator, False)
+
+
+class FakeDatabase:
+    """table => 資料列列表；每張表可指定自動遞增的 id 欄位與唯一鍵"""
+
+    def __init__(self):
+        self.tables = {}
+        self.unique_keys = {'users': 'google_id', 'schedules': 'user_id', 'course_hotness': 'course_id',
+                            'wrapped_stats': 'user_id', 'wrapped_snapshot_meta': 'id'}
+        self.lock = threading.RLock()
+        self._next_id = {}
+        self._indexes = {}  # table => {唯一鍵的值: 資料列}
+        self.dropped = set()
+        self.request_count = 0
+
+    def load(self, table: str, rows: list):
+        with self.lock:
+            self.dropped.discard(table)
+            self.tables[table] = []
+            self._indexes.pop(table, None)
+            for row in rows:
+                self.insert(table, dict(row))
+
+    def insert(self, table: str, row: dict) -> dict:
+        with self.lock:
+            rows = self.tables.setdefault(table, [])
+            if table == 'schedules' and 'id' not in row:
+                self._next_id[table] = self._next_id.get(table, 0) + 1
+                row['id'] = self._next_id[table]
+            elif 'id' in row and isinstance(row['id'], int):
+                self._next_id[table] = max(self._next_id.get(table, 0), row['id'])
+            rows.append(row)
+            if table in self.unique_keys:
+                self._indexes.setdefault(table, {})[row.get(self.unique_keys[table])] = row
+            return row
+
+    def find(self, table: str, column: str, value):
+        if self.unique_keys.get(table) == column:
+            return self._indexes.get(table, {}).get(value)
+        for row in self.tables.get(table, []):
+            if row.get(column) == value:
+                return row
+        return None
+
+    def upsert(self, table: str, row: dict, conflict_column: str = None) -> dict:
+        with self.lock:
+            conflict_column = conflict_column or self.unique_keys.get(table)
+            existing = self.find(table, conflict_column, row.get(conflict_column)) if conflict_column else None
+            if existing is not None:
+                existing.update(row)
+                return existing
+            return self.insert(table, dict(row))
+
+    def select(self, table: str, params: list) -> list:
+        if table in self.dropped:
+            raise KeyError(table)
+        options = {k: v for k, v in params if k in RESERVED_PARAMS}
+        with self.lock:
+            rows = self._filtered(table, params)
+        for part in reversed([p for p in options.get('order', '').split(',') if p]):
+            column, _, direction = part.partition('.')
+            rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=direction.startswith('desc'))
+        offset = int(options.get('offset', 0))
+        rows = rows[offset:offset + int(options['limit'])] if 'limit' in options else rows[offset:]
+        columns = [c.strip() for c in options.get('select', '*').split(',')]
+        if columns == ['*']:
+            return [dict(r) for r in rows]
+        return [{c: r.get(c) for c in columns} for r in rows]
+
+    def _filtered(self, table: str, params: list) -> list:
+        filters = [(k, v) for k, v in params if k not in RESERVED_PARAMS]
+        unique = self.unique_keys.get(table)
+        for column, expression in filters:
+            # 以唯一鍵 eq 查詢時直接走索引
+            if column == unique and expression.startswith('eq.'):
+                row = self.find(table, column, _coerce(expression[3:], next(iter(self._indexes.get(table, {})), '')))
+                rest = [(k, v) for k, v in filters if (k, v) != (column, expression)]
+                return [row] if row is not None and all(_matches(row, k, v) for k, v in rest) else []
+        return [r for r in self.tables.get(table, []) if all(_matches(r, k, v) for k, v in filters)]
+
+    def update(self, table: str, params: list, values: dict) -> list:
+        with self.lock:
+            rows = self._filtered(table, params)
+            for row in rows:
+                row.update(values)
+            return [dict(r) for r in rows]
+
+    def delete(self, table: str, params: list) -> list:
+        with self.lock:
+            rows = self._filtered(table, params)
+            deleted = {id(r) for r in rows}
+            self.tables[table] = [r for r in self.tables.get(table, []) if id(r) not in deleted]
+            index = self._indexes.get(table, {})
+            for row in rows:
+                index.pop(row.get(self.unique_keys.get(table)), None)
+            return [dict(r) for r in rows]
+
+    # ───────── RPC (對應 sql/ 中的函式) ─────────
+    def rpc(self, name: str, args: dict):
+        with self.lock:
+            if name == 'save_schedule':
+                return self._save_schedule(args['p_user_id'], args.get('p_schedule_data'), args.get('p_flexible_courses'),
+                                           args.get('p_base_version'))
+            if name == 'bench_drop_table':
+                self.tables.pop(args['table'], None)
+                self._indexes.pop(args['table'], None)
+                self.dropped.add(args['table'])
+                return None
+            if name == 'replace_course_hotness':
+                self.load('course_hotness', [])
+                for course_id, count in (args.get('counts') or {}).items():
+                    self.insert('course_hotness', {'course_id': course_id, 'count': int(count)})
+                return None
+        raise KeyError(name)
+
+    @staticmethod
+    def _hotness_deltas(old_ids: set, new_ids: set) -> dict:
+        """sql/004 save_schedule 中 EXCEPT 差集的 Python 版本 => {course_id: +1 / -1}，未變動的課程不出現"""
+        deltas = {course_id: 1 for course_id in new_ids - old_ids}
+        deltas.update({course_id: -1 for course_id in old_ids - new_ids})
+        return deltas
+
+    def _apply_hotness(self, deltas: dict):
+        """sql/001 apply_course_hotness_deltas 的 Python 版本：累加後不低於 0"""
+        for course_id, delta in deltas.items():
+            row = self.find('course_hotness', 'course_id', course_id)
+            if row is None:
+                self.insert('course_hotness', {'course_id': course_id, 'count': max(int(delta), 0)})
+            else:
+                row['count'] = max(row['count'] + int(delta), 0)
+
+    def _save_schedule(self, user_id, schedule_data, flexible_courses, base_version=None) -> dict:
+        old = self.find('schedules', 'user_id', user_id)
+        old_version = old.get('version', 0) if old else 0
+        if base_version is not None and old_version != base_version:
+            return {'conflict': True, 'version': old_version}
+        old_ids = extract_course_ids(old.get('schedule_data'), old.get('flexible_courses')) if old else set()
+        row = self.upsert('schedules', {
+            'user_id': user_id,
+            'schedule_data': schedule_data if schedule_data is not None else {},
+            'flexible_courses': flexible_courses if flexible_courses is not None else [],
+            'version': old_version + 1,
+        })
+        deltas = self._hotness_deltas(old_ids, extract_course_ids(row['schedule_data'], row['flexible_courses']))
+        self._apply_hotness(deltas)
+        return {'action': 'updated' if old else 'inserted', 'data': dict(row), 'hotness_changed': bool(deltas),
+                'version': row['version']}
+
+
+def make_handler(db: FakeDatabase, latency: float):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive，避免每個請求都重新連線
+        disable_nagle_algorithm = True  # header 與 body 分兩次送出，避免 Nagle + delayed ACK 多等 40ms
+
+        def _send(self, status: int, payload=None):
+            body = b'' if payload is None and status == 204 else json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length)) if length else None
+
+        def _route(self):
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+            if parts[:2] != ['rest', 'v1'] or len(parts) < 3:
+                return None, None, None
+            return parts[2:], parse_qsl(url.query, keep_blank_values=True), self._body()
+
+        def _handle(self, method: str):
+            with db.lock:
+                db.request_count += 1
+            if latency:
+                time.sleep(latency)
+            target, params, body = self._route()
+            if target is None:
+                return self._send(404, {"message": "not found"})
+            try:
+                if target[0] == 'rpc':
+                    return self._send(200, db.rpc(target[1], body or {}))
+                table = target[0]
+                if method == 'GET':
+                    return self._send(200, db.select(table, params))
+                if method == 'POST':
+                    options = dict(params)
+                    rows = body if isinstance(body, list) else [body]
+                    merge = 'merge-duplicates' in (self.headers.get('Prefer') or '')
+                    saved = [db.upsert(table, r, options.get('on_conflict')) if merge else db.insert(table, dict(r))
+                             for r in rows]
+                    return self._send(201, [dict(r) for r in saved])
+                if method == 'PATCH':
+                    return self._send(200, db.update(table, params, body or {}))
+                if method == 'DELETE':
+                    return self._send(200, db.delete(table, params))
+            except KeyError as e:
+                return self._send(404, {"message": f"unknown function or table: {e}"})
+            except Exception as e:
+                return self._send(400, {"message": str(e)})
+            return self._send(405, {"message": "method not allowed"})
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def do_PATCH(self):
+            self._handle('PATCH')
+
+        def do_DELETE(self):
+            self._handle('DELETE')
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512  # 預設 5，高並行時新連線會被丟棄並在 1 秒後重送
+
+
+class FakePostgrest:
+    """在背景執行緒啟動的替身伺服器：with FakePostgrest(db, latency=0.02) as server: server.url"""
+
+    def __init__(self, db: FakeDatabase = None, latency: float = 0.0, port: int = 0):
+        self.db = db or FakeDatabase()
+        self.server = _Server(('127.0.0.1', port), make_handler(self.db, latency))
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="記憶體版 PostgREST 替身")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求的固定延遲秒數")
+    parser.add_argument("--users", type=int, default=0, help="預先載入的合成使用者數 (見 population.py)")
+    parser.add_argument("--era", choices=ERAS, default='mixed', help="合成課表的資料格式時期")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db = FakeDatabase()
+    if args.users:
+        users, schedules = PopulationGenerator(args.era, args.seed).population(args.users)
+        db.load('users', users)
+        db.load('schedules', schedules)
+    server = FakePostgrest(db, latency=args.latency, port=args.port)
+    print(f"Fake PostgREST on {server.url} (latency {args.latency * 1000:.0f}ms, {args.users} users)", flush=True)
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
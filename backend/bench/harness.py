@@ -0,0 +1,64 @@
+# backend/bench/harness.py
+"""效能測試共用：啟動替身伺服器、等待就緒、統計延遲分位數"""
+import sys
+import time
+import socket
+import subprocess
+from pathlib import Path
+
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+REPO_DIR = BACKEND_DIR.parent
+FAKE_SUPABASE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port: int, path: str = "/", timeout: float = 30.0, process: subprocess.Popen = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"server on port {port} exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}{path}", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start within {timeout}s")
+
+
+def start_fake_postgrest(port: int, latency: float, users: int = 0, era: str = 'mixed',
+                         seed: int = 0) -> subprocess.Popen:
+    """替身放在獨立 process，不與壓測端搶 GIL，記憶體量測也不會算到替身的資料"""
+    command = [sys.executable, str(BENCH_DIR / "fake_postgrest.py"), "--port", str(port), "--latency", str(latency),
+               "--users", str(users), "--era", era, "--seed", str(seed)]
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+
+def start_upstream_stub(port: int, delay: float) -> subprocess.Popen:
+    """NCNU API / Google 行事曆替身 (專案根目錄的 ncnu_api_stub.py)"""
+    command = [sys.executable, str(REPO_DIR / "ncnu_api_stub.py"), "--port", str(port), "--delay", str(delay)]
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    """延遲 (秒) 列表 => requests、req/s 與 p50 / p95 / p99 (毫秒)"""
+    latencies = sorted(latencies)
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+    return {"requests": len(latencies), "rps": len(latencies) / elapsed if elapsed else 0.0,
+            "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
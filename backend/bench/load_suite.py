@@ -0,0 +1,293 @@
+# backend/bench/load_suite.py
+"""
+後端效能測試套件：在本機替身上量測各端點的延遲、吞吐量與記憶體
+
+- Supabase：fake_postgrest.py (記憶體版 PostgREST)，預先載入 population.py 產生的合成使用者
+- NCNU API / Google 行事曆：ncnu_api_stub.py，以 frontend/public/data 的檔案回應
+- 每個使用者數各在一個子 process 中匯入 app.py 並以 Flask test client 送出請求，彼此的快取與記憶體互不影響
+
+每個情境依序量測：
+1. 延遲：逐一送出 --requests 個請求的 p50 / p95 / p99
+2. 吞吐量：--concurrency 個執行緒同時送出 --requests 個請求的 req/s
+3. 記憶體：tracemalloc 追蹤 20 個請求期間的配置高峰 (不含替身)
+全表掃描的情境 (hotness_scan、wrapped_live) 只送 --heavy-requests 個請求。
+
+用法 (在 backend/ 執行)：
+    python bench/load_suite.py --users 1000 10000 [--era mixed] [--output result.json]
+    python bench/load_suite.py --users 1000 --baseline result.json   # 與先前結果比較，退步時 exit 1
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import resource
+import subprocess
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import (BACKEND_DIR, FAKE_SUPABASE_KEY, free_port, wait_ready, start_fake_postgrest,
+                     start_upstream_stub, stop, summarize)
+from population import ERAS, PopulationGenerator, user_id
+
+RESULT_MARKER = "LOAD_SUITE_RESULT "
+MEMORY_SAMPLE_REQUESTS = 20
+COMPARED_METRICS = {"p95": 1, "rps": -1, "peak_kib": 1}  # 1 表示越大越差，-1 表示越小越差
+
+
+class Scenario:
+    """一種請求；setup 在量測前執行一次 (準備資料表狀態)，request(rng) 回傳 (method, path, json)"""
+
+    def __init__(self, name: str, request, setup=None, heavy: bool = False, call=None):
+        self.name, self.request, self.setup, self.heavy, self.call = name, request, setup, heavy, call
+
+
+def build_scenarios(app_module, size: int, generator: PopulationGenerator) -> list:
+    import wrapped
+    from hotness import rebuild_course_hotness
+
+    supabase = app_module.supabase
+    random_user = lambda rng: user_id(rng.randrange(size))
+
+    def without_hotness_table():
+        supabase.rpc('bench_drop_table', {'table': 'course_hotness'}).execute()
+
+    def without_wrapped_snapshot():
+        supabase.table(wrapped.WRAPPED_META_TABLE).delete().eq('id', 1).execute()
+        wrapped._meta_cache.update(loaded_at=0.0, meta=None)
+
+    def with_wrapped_snapshot():
+        wrapped.build_wrapped_snapshot(supabase)
+        wrapped._meta_cache.update(loaded_at=0.0, meta=None)
+
+    def schedule_post(rng):
+        schedule_data, flexible_courses = generator.schedule()
+        return 'POST', f"/api/schedule?user_id={random_user(rng)}", {
+            'schedule_data': schedule_data, 'flexible_courses': flexible_courses}
+
+    def schedule_patch(rng):
+        # 移除再加回課表中的一門課：課表內容不變，但請求只帶這門課
+        # 延遲包含這裡取得版本號的讀取；並行時兩個執行緒抽到同一使用者會得到 409 (計為錯誤)
+        uid = random_user(rng)
+        schedule = app_module.get_user_schedule(uid)[0]
+        slots_by_course = {}
+        for slot, course in schedule['schedule_data'].items():
+            slots_by_course.setdefault(course['course_id'], (course, []))[1].append(slot)
+        ops = []
+        if slots_by_course:
+            course, slots = slots_by_course[rng.choice(sorted(slots_by_course))]
+            ops = [{'op': 'remove', 'course_id': course['course_id']},
+                   {'op': 'add', 'course': course, 'slots': slots}]
+        return 'PATCH', f"/api/schedule?user_id={uid}", {'base_version': schedule['version'] or 0, 'ops': ops}
+
+    return [
+        Scenario('departments', lambda rng: ('GET', '/api/departments', None)),
+        Scenario('contacts', lambda rng: ('GET', '/api/contacts', None)),
+        Scenario('calendar', lambda rng: ('GET', '/api/calendar', None)),
+        Scenario('events_today', lambda rng: ('GET', '/api/events/today', None)),
+        Scenario('courses_search', lambda rng: ('GET', f"/api/courses/search?q={rng.choice('經濟管理資訊英文')}", None)),
+        Scenario('static_refresh', None, call=lambda rng: app_module.static_store.refresh()),
+        Scenario('schedule_get', lambda rng: ('GET', f"/api/schedule?user_id={random_user(rng)}", None)),
+        Scenario('schedule_post', schedule_post),
+        Scenario('schedule_patch', schedule_patch),
+        Scenario('hotness_scan', lambda rng: ('GET', '/api/courses/hotness', None),
+                 setup=without_hotness_table, heavy=True),
+        Scenario('hotness', lambda rng: ('GET', '/api/courses/hotness', None),
+                 setup=lambda: rebuild_course_hotness(supabase)),
+        Scenario('wrapped_live', lambda rng: ('GET', f"/api/wrapped/{random_user(rng)}", None),
+                 setup=without_wrapped_snapshot, heavy=True),
+        Scenario('wrapped', lambda rng: ('GET', f"/api/wrapped/{random_user(rng)}", None),
+                 setup=with_wrapped_snapshot),
+    ]
+
+
+def make_sender(app_module, scenario: Scenario):
+    """回傳 send(rng) => 狀態碼；每個執行緒使用自己的 test client"""
+    local = threading.local()
+
+    def send(rng) -> int:
+        if scenario.call is not None:
+            scenario.call(rng)
+            return 200
+        if not hasattr(local, 'client'):
+            local.client = app_module.app.test_client()
+        method, path, body = scenario.request(rng)
+        return local.client.open(path, method=method, json=body).status_code
+
+    return send
+
+
+def measure(app_module, scenario: Scenario, args, seed: int) -> dict:
+    send = make_sender(app_module, scenario)
+    count = args.heavy_requests if scenario.heavy else args.requests
+    rng = random.Random(seed)
+    errors = 0
+
+    if scenario.setup is not None:
+        scenario.setup()
+    if not scenario.heavy:
+        send(rng)  # 暖機 (靜態資料載入、索引建立)
+
+    # 1. 延遲
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(count):
+        request_started = time.perf_counter()
+        errors += send(rng) >= 400
+        latencies.append(time.perf_counter() - request_started)
+    result = summarize(latencies, time.perf_counter() - started)
+
+    # 2. 吞吐量
+    def worker(worker_seed):
+        worker_rng, failed = random.Random(worker_seed), 0
+        for _ in range(count // args.concurrency + (worker_seed % args.concurrency < count % args.concurrency)):
+            failed += send(worker_rng) >= 400
+        return failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        errors += sum(pool.map(worker, range(seed, seed + args.concurrency)))
+    result["rps"] = count / (time.perf_counter() - started)
+
+    # 3. 記憶體高峰
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for _ in range(min(count, MEMORY_SAMPLE_REQUESTS)):
+        send(rng)
+    result["peak_kib"] = (tracemalloc.get_traced_memory()[1] - baseline) / 1024
+    tracemalloc.stop()
+
+    result["errors"] = errors
+    result["max_rss_mib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def run_population(size: int, args) -> dict:
+    """子 process：啟動替身、匯入 app、量測所有情境"""
+    fake_port, stub_port = free_port(), free_port()
+    fake = start_fake_postgrest(fake_port, args.db_latency, size, args.era, args.seed)
+    stub = start_upstream_stub(stub_port, args.upstream_delay)
+    try:
+        wait_ready(fake_port, "/rest/v1/users?limit=1", timeout=600, process=fake)
+        wait_ready(stub_port, "/API/get.aspx?json=unitId_ncnu", process=stub)
+        snapshot_dir = tempfile.mkdtemp(prefix="load-suite-")
+        os.environ.update(
+            SUPABASE_URL=f"http://127.0.0.1:{fake_port}",
+            SUPABASE_KEY=FAKE_SUPABASE_KEY,
+            NCNU_API_BASE=f"http://127.0.0.1:{stub_port}/API/get.aspx",
+            CALENDAR_ICS_URL=f"http://127.0.0.1:{stub_port}/calendar.ics",
+            STATIC_DATA_SNAPSHOT_PATH=os.path.join(snapshot_dir, "static_data_snapshot.json"),
+            STATIC_DATA_TTL_SECONDS="0",
+            SCHEDULE_CACHE_TTL_SECONDS="60" if args.warm_cache else "0",
+            HOTNESS_CACHE_SECONDS="30" if args.warm_cache else "0",
+            SCHEDULE_WRITE_BEHIND_SECONDS="0",
+            SLOW_REQUEST_MS="0",
+        )
+        sys.path.insert(0, str(BACKEND_DIR))
+        import app as app_module
+
+        generator = PopulationGenerator(args.era, args.seed + 1)
+        results = {}
+        for index, scenario in enumerate(build_scenarios(app_module, size, generator)):
+            if args.scenarios and scenario.name not in args.scenarios:
+                continue
+            results[scenario.name] = measure(app_module, scenario, args, seed=args.seed + index * 1000)
+            print(f"  [{size} users] {scenario.name} done", file=sys.stderr, flush=True)
+        results["_process"] = {"max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+        return results
+    finally:
+        stop(fake)
+        stop(stub)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> tuple:
+    """與基準結果比較，回傳 (比較過的情境數, 退步超過 tolerance 的項目說明)"""
+    compared, regressions = 0, []
+    for size, scenarios in results.items():
+        for name, metrics in scenarios.items():
+            base = baseline.get(size, {}).get(name)
+            if not base or name.startswith('_'):
+                continue
+            compared += 1
+            for metric, direction in COMPARED_METRICS.items():
+                old, new = base.get(metric), metrics.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old * direction
+                if change > tolerance:
+                    regressions.append(f"{size} users / {name}: {metric} {old:.1f} -> {new:.1f} ({change:+.0%})")
+    return compared, regressions
+
+
+def print_table(size: str, scenarios: dict):
+    process = scenarios.get("_process", {})
+    print(f"\n{size} users (max RSS {process.get('max_rss_mib', 0):.0f} MiB)")
+    print(f"{'scenario':<16} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'req/s':>8} {'peak KiB':>9}")
+    for name, r in scenarios.items():
+        if name.startswith('_'):
+            continue
+        print(f"{name:<16} {r['requests']:>8} {r['errors']:>6} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} "
+              f"{r['rps']:>8.1f} {r['peak_kib']:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="後端效能測試套件")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000], help="合成使用者數 (可多個)")
+    parser.add_argument("--era", choices=ERAS, default='mixed', help="合成課表的資料格式時期")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=200, help="每個情境的請求數")
+    parser.add_argument("--heavy-requests", type=int, default=5, help="全表掃描情境的請求數")
+    parser.add_argument("--concurrency", type=int, default=8, help="吞吐量量測的並行執行緒數")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="模擬資料庫每次往返的延遲秒數")
+    parser.add_argument("--upstream-delay", type=float, default=0.05, help="模擬 NCNU API 每次回應的延遲秒數")
+    parser.add_argument("--warm-cache", action="store_true", help="保留課表與熱門度快取 (預設關閉，量測資料庫路徑)")
+    parser.add_argument("--scenarios", nargs="+", help="只執行指定的情境")
+    parser.add_argument("--output", help="把結果寫成 JSON，可作為之後的 --baseline")
+    parser.add_argument("--baseline", help="先前 --output 的結果；任一指標退步超過 --tolerance 時 exit 1")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(RESULT_MARKER + json.dumps(run_population(args.child, args)), flush=True)
+        return
+
+    results = {}
+    for size in args.users:
+        # 每個使用者數在獨立的子 process 中執行，app 的快取、索引與 RSS 不互相影響
+        child = subprocess.run([sys.executable, __file__, *sys.argv[1:], "--child", str(size)],
+                               cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True)
+        lines = [line for line in child.stdout.splitlines() if line.startswith(RESULT_MARKER)]
+        if child.returncode != 0 or not lines:
+            print(f"✘ {size} users: run failed (exit code {child.returncode})")
+            sys.exit(1)
+        results[str(size)] = json.loads(lines[-1][len(RESULT_MARKER):])
+
+    print(f"\nera={args.era} db_latency={args.db_latency * 1000:.0f}ms concurrency={args.concurrency} "
+          f"cache={'warm' if args.warm_cache else 'off'}")
+    for size, scenarios in results.items():
+        print_table(size, scenarios)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            compared, regressions = compare(results, json.load(f), args.tolerance)
+        if not compared:
+            print(f"\n✘ No scenario in common with {args.baseline} (different --users?)")
+            sys.exit(1)
+        if regressions:
+            print(f"\n✘ {len(regressions)} regressions beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\n✔ {compared} scenarios, no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# backend/bench/population.py
+"""
+合成使用者資料 (users / schedules)，供效能測試使用
+
+以本學期開課資訊為課程來源，依「少數熱門課、多數冷門課」的分佈替每位使用者排 4~10 門不衝堂的課，
+與前端相同地把課程物件存在每個上課節次的 key 底下 (三節課的課程存三份)，
+另有部分使用者帶沒有固定時間的彈性課程。課程物件有兩種時期的格式
+(見專案根目錄的 舊時期 / 新時期資料庫儲存資料範例.txt)：
+- old: class 為數字、faculty 為空字串、沒有英文欄位、course_credit 為數字
+- new: class 為字串、含 eteacher / edivision / edepartment、course_credit 為 "2.0" 字串
+- compact: 只存課程主鍵、學年期與顯示欄位的精簡格式 (見 schedule_format.py)
+
+用法：
+    python bench/population.py --users 1000 --era mixed > population.json
+"""
+import sys
+import json
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from catalog import CATALOG_PATH  # noqa: E402
+from timeslots import parse_time_mask, mask_to_slots  # noqa: E402
+
+ERAS = ('old', 'new', 'mixed', 'compact')
+EDIVISIONS = {'學士班': 'Bachelor', '碩士班': 'Master', '博士班': 'Doctor', '碩士在職專班': 'Master (In-service)'}
+POPULARITY_EXPONENT = 0.9  # 課程被選機率 ∝ 1 / 名次^exponent
+EMPTY_SCHEDULE_RATIO = 0.1  # 登入過但還沒排課的使用者比例
+FLEXIBLE_RATIO = 0.3  # 有彈性課程的使用者比例
+POPULATION_START = datetime(2024, 9, 1, tzinfo=timezone.utc)
+POPULATION_SPAN_DAYS = 400
+
+
+def load_catalog_courses(path: Path = CATALOG_PATH) -> list:
+    with open(path, 'r', encoding='utf-8') as f:
+        content = json.load(f)
+    return [c for c in content[next(iter(content))].get('item', []) if isinstance(c, dict) and c.get('course_id')]
+
+
+def stored_course(course: dict, era: str) -> dict:
+    """目錄中的課程 => 存進 schedule_data 的課程物件 (依時期格式)"""
+    if era == 'compact':
+        return {'course_id': course['course_id'], 'class': str(course.get('class', '')),
+                'year': str(course.get('year', '')), 'semester': str(course.get('semester', '')),
+                'course_cname': course.get('course_cname', ''), 'teacher': course.get('teacher', ''),
+                'time': course.get('time', ''), 'course_credit': course.get('course_credit', '')}
+    if era == 'old':
+        course_class = course.get('class', '')
+        return {
+            'time': course.get('time', ''),
+            'year': course.get('year', ''),
+            'class': int(course_class) if str(course_class).isdigit() else course_class,
+            'faculty': '',
+            'teacher': course.get('teacher', ''),
+            'division': course.get('division', ''),
+            'location': course.get('location', ''),
+            'semester': course.get('semester', ''),
+            'course_id': course['course_id'],
+            'department': course.get('department', ''),
+            'course_cname': course.get('course_cname', ''),
+            'course_ename': course.get('course_ename', ''),
+            'course_credit': int(float(course.get('course_credit') or 0)),
+        }
+    return {
+        'time': course.get('time', ''),
+        'year': course.get('year', ''),
+        'class': str(course.get('class', '')),
+        'faculty': course.get('faculty', ''),
+        'teacher': course.get('teacher', ''),
+        'division': course.get('division', ''),
+        # 目錄沒有英文教師名，以長度相近的 ASCII 字串代替
+        'eteacher': f"Instructor {course['course_id']}" if course.get('teacher') else '',
+        'location': course.get('location', ''),
+        'semester': course.get('semester', ''),
+        'course_id': course['course_id'],
+        'edivision': EDIVISIONS.get(course.get('division'), ''),
+        'department': course.get('department', ''),
+        'edepartment': '0',
+        'course_cname': course.get('course_cname', ''),
+        'course_ename': course.get('course_ename', ''),
+        'course_credit': f"{float(course.get('course_credit') or 0):.1f}",
+    }
+
+
+class PopulationGenerator:
+    """同一個 seed 產生相同的使用者；課程物件依時期預先建好，各使用者共用 (只用於記憶體內的替身)"""
+
+    def __init__(self, era: str = 'mixed', seed: int = 0, courses: list = None):
+        if era not in ERAS:
+            raise ValueError(f"era must be one of {', '.join(ERAS)}")
+        self.era = era
+        self.rng = random.Random(seed)
+        courses = courses if courses is not None else load_catalog_courses()
+        timed = [c for c in courses if parse_time_mask(c.get('time'))]
+        untimed = [c for c in courses if not parse_time_mask(c.get('time'))]
+        self.rng.shuffle(timed)  # 打散後的順序即熱門度名次
+        self.timed = [(c, parse_time_mask(c['time'])) for c in timed]
+        self.untimed = untimed
+        self.timed_weights = [1 / (rank + 1) ** POPULARITY_EXPONENT for rank in range(len(timed))]
+        self._stored = {}
+
+    def _stored_course(self, course: dict, era: str) -> dict:
+        key = (course['course_id'], course.get('class'), era)
+        if key not in self._stored:
+            self._stored[key] = stored_course(course, era)
+        return self._stored[key]
+
+    def pick_era(self) -> str:
+        return self.rng.choice(('old', 'new')) if self.era == 'mixed' else self.era
+
+    def schedule(self, era: str = None) -> tuple:
+        """一位使用者的 (schedule_data, flexible_courses)"""
+        era = era or self.pick_era()
+        schedule_data, flexible_courses = {}, []
+        if self.rng.random() < EMPTY_SCHEDULE_RATIO:
+            return schedule_data, flexible_courses
+
+        target = self.rng.randint(4, 10)
+        occupied, chosen = 0, set()
+        for course, mask in self.rng.choices(self.timed, weights=self.timed_weights, k=target * 3):
+            if len(chosen) >= target:
+                break
+            if course['course_id'] in chosen or occupied & mask:
+                continue
+            occupied |= mask
+            chosen.add(course['course_id'])
+            stored = self._stored_course(course, era)
+            for slot in mask_to_slots(mask):
+                schedule_data[slot] = stored
+
+        if self.untimed and self.rng.random() < FLEXIBLE_RATIO:
+            for course in self.rng.sample(self.untimed, k=min(len(self.untimed), self.rng.randint(1, 2))):
+                flexible_courses.append(self._stored_course(course, era))
+        return schedule_data, flexible_courses
+
+    def user(self, index: int) -> dict:
+        created = POPULATION_START + timedelta(seconds=self.rng.randrange(POPULATION_SPAN_DAYS * 86400))
+        return {
+            'google_id': user_id(index),
+            'email': f"s{index:06d}@mail1.ncnu.edu.tw",
+            'full_name': f"測試使用者{index}",
+            'avatar_url': None,
+            'created_at': created.isoformat(),
+        }
+
+    def population(self, size: int) -> tuple:
+        """(users 資料列, schedules 資料列)；約九成的使用者有課表資料列"""
+        users, schedules = [], []
+        for index in range(size):
+            users.append(self.user(index))
+            if index % 10 == 9 and self.rng.random() < 0.5:
+                continue  # 只登入過、沒有存過課表
+            schedule_data, flexible_courses = self.schedule()
+            schedules.append({'user_id': user_id(index), 'schedule_data': schedule_data,
+                              'flexible_courses': flexible_courses})
+        return users, schedules
+
+
+def user_id(index: int) -> str:
+    return f"bench-{index:06d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="產生合成使用者資料")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--era", choices=ERAS, default='mixed')
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    users, schedules = PopulationGenerator(args.era, args.seed).population(args.users)
+    json.dump({'users': users, 'schedules': schedules}, sys.stdout, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
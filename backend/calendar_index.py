@@ -0,0 +1,74 @@
+# backend/calendar_index.py
+"""
+行事曆日期索引
+
+載入行事曆時把每個事件展開到它涵蓋的每一天 (date bucket)，
+並保留排序後的日期鍵，範圍查詢以 bisect 找出區間再合併各天的事件：
+- 單日查詢 O(1 + k)，範圍查詢 O(log n + k)
+- 多日事件 (考試週、連假) 在每一天都查得到，不會只出現在第一天
+- 全天事件的 DTEND 為「不含」的隔天，與 iCalendar 規範一致
+"""
+import os
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+CALENDAR_TIMEZONE = ZoneInfo(os.environ.get("CALENDAR_TIMEZONE", "Asia/Taipei"))
+
+
+def today_local() -> date:
+    """行事曆時區 (預設台灣) 的今天；伺服器本身可能在 UTC"""
+    return datetime.now(CALENDAR_TIMEZONE).date()
+
+
+def _to_local_date(value: str, is_end: bool) -> date:
+    """ISO 日期或日期時間字串 => 行事曆時區的日期；結束時間為「不含」邊界，需往前推"""
+    if len(value) == 10:
+        parsed = date.fromisoformat(value)
+        return parsed - timedelta(days=1) if is_end else parsed
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(CALENDAR_TIMEZONE)
+    if is_end:
+        parsed -= timedelta(microseconds=1)
+    return parsed.date()
+
+
+def event_date_span(event: dict):
+    """回傳事件涵蓋的 (第一天, 最後一天)，皆包含；無法解析時回傳 None"""
+    try:
+        first_day = _to_local_date(event['start'], is_end=False)
+        last_day = _to_local_date(event.get('end') or event['start'], is_end=True)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return first_day, max(first_day, last_day)
+
+
+class CalendarIndex:
+    """以日期分桶的事件索引；建立後唯讀，可在多執行緒間共用"""
+
+    def __init__(self, events: list):
+        self.events = events
+        buckets = {}
+        for position, event in enumerate(events):
+            span = event_date_span(event)
+            if span is None:
+                continue
+            day, last_day = span
+            while day <= last_day:
+                buckets.setdefault(day, []).append(position)
+                day += timedelta(days=1)
+        self._buckets = buckets
+        self._days = sorted(buckets)
+
+    def events_on(self, day: date) -> list:
+        return [self.events[i] for i in self._buckets.get(day, [])]
+
+    def events_between(self, start_day: date, end_day: date) -> list:
+        """回傳與 [start_day, end_day] (皆包含) 有交集的事件，依原始順序 (開始時間) 排列"""
+        lo = bisect_left(self._days, start_day)
+        hi = bisect_right(self._days, end_day)
+        positions = set()
+        for day in self._days[lo:hi]:
+            positions.update(self._buckets[day])
+        return [self.events[i] for i in sorted(positions)]
@@ -0,0 +1,173 @@
+# backend/calendar_ingest.py
+"""
+學期行事曆 ICS 匯入
+
+- 先以文字切出每個 VEVENT 區塊，依 (UID, RECURRENCE-ID) + (LAST-MODIFIED, SEQUENCE) 判斷是否變動，
+  只有新的或改過的事件才交給 icalendar 解析；Google 每次匯出都會更新 DTSTAMP，因此不以整段內容比對
+- RRULE 週期事件在有限時間窗內展開成個別事件，並處理 EXDATE 與 RECURRENCE-ID 覆寫
+- 所有時間統一轉為行事曆時區的 aware datetime 後再排序，不再拿日期字串與日期時間字串互相比較
+"""
+import os
+import re
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+import icalendar
+from dateutil.rrule import rrulestr
+
+from calendar_index import CALENDAR_TIMEZONE
+
+# 週期事件展開的時間窗 (相對於今天) 與單一事件的展開上限
+RECURRENCE_PAST_DAYS = int(os.environ.get("CALENDAR_RECURRENCE_PAST_DAYS", "365"))
+RECURRENCE_FUTURE_DAYS = int(os.environ.get("CALENDAR_RECURRENCE_FUTURE_DAYS", "400"))
+MAX_OCCURRENCES_PER_EVENT = 500
+
+VEVENT_BLOCK = re.compile(r'BEGIN:VEVENT\r?\n.*?END:VEVENT(?:\r?\n|$)', re.S)
+FOLDED_LINE = re.compile(r'\r?\n[ \t]')
+DTSTAMP_LINE = re.compile(r'^DTSTAMP[;:].*$', re.M)
+
+
+def _property(unfolded: str, name: str):
+    match = re.search(rf'^{name}(?:;[^:\r\n]*)?:(.*?)\r?$', unfolded, re.M)
+    return match.group(1).strip() if match else None
+
+
+def normalize_time(value) -> datetime:
+    """date / naive datetime / aware datetime => 行事曆時區的 aware datetime"""
+    if not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day, tzinfo=CALENDAR_TIMEZONE)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=CALENDAR_TIMEZONE)
+    return value.astimezone(CALENDAR_TIMEZONE)
+
+
+def _format_time(value: datetime, all_day: bool) -> str:
+    return value.date().isoformat() if all_day else value.isoformat()
+
+
+class ParsedEvent:
+    """單一 VEVENT 解析後的結果 (時間已正規化)"""
+
+    __slots__ = ('summary', 'start', 'end', 'all_day', 'rrule', 'exdates', 'recurrence_id')
+
+    def __init__(self, component):
+        dtstart = component.get('dtstart').dt
+        dtend_prop = component.get('dtend')
+        if dtend_prop is not None:
+            dtend = dtend_prop.dt
+        elif component.get('duration') is not None:
+            dtend = dtstart + component.get('duration').dt
+        else:
+            raise ValueError("VEVENT has neither DTEND nor DURATION")
+
+        self.summary = str(component.get('summary'))
+        self.all_day = not isinstance(dtstart, datetime)
+        self.start = normalize_time(dtstart)
+        self.end = normalize_time(dtend)
+        rrule = component.get('rrule')
+        self.rrule = rrule.to_ical().decode('utf-8') if rrule is not None else None
+
+        exdates = set()
+        exdate_props = component.get('exdate') or []
+        if not isinstance(exdate_props, list):
+            exdate_props = [exdate_props]
+        for prop in exdate_props:
+            exdates.update(normalize_time(item.dt) for item in prop.dts)
+        self.exdates = exdates
+
+        recurrence_id = component.get('recurrence-id')
+        self.recurrence_id = normalize_time(recurrence_id.dt) if recurrence_id is not None else None
+
+    def to_event(self, start: datetime = None) -> dict:
+        start = start or self.start
+        end = start + (self.end - self.start)
+        return {
+            "summary": self.summary,
+            "start": _format_time(start, self.all_day),
+            "end": _format_time(end, self.all_day),
+        }
+
+
+def _expand_rrule(parsed: ParsedEvent, window_start: datetime, window_end: datetime) -> list:
+    """展開時間窗內的週期事件開始時間；UNTIL 與 DTSTART 時區形式不一致時改用本地 naive 時間重試"""
+    for aware in (True, False):
+        dtstart = parsed.start if aware else parsed.start.replace(tzinfo=None)
+        lo = window_start if aware else window_start.replace(tzinfo=None)
+        hi = window_end if aware else window_end.replace(tzinfo=None)
+        try:
+            rule = rrulestr(parsed.rrule, dtstart=dtstart)
+            occurrences = []
+            for occurrence in rule.xafter(lo, count=MAX_OCCURRENCES_PER_EVENT, inc=True):
+                if occurrence > hi:
+                    break
+                occurrences.append(normalize_time(occurrence))
+            return occurrences
+        except ValueError:
+            continue
+    print(f"Warning: Failed to expand RRULE '{parsed.rrule}' for '{parsed.summary}'")
+    return []
+
+
+class CalendarIngestor:
+    """保留上一次的解析結果，重新匯入時只解析有變動的 VEVENT"""
+
+    def __init__(self):
+        self._cache = {}  # (uid, recurrence_id) -> (版本鍵, ParsedEvent 或 None)
+        self._lock = threading.Lock()
+        self.last_reparsed = 0
+
+    def _parse_blocks(self, text: str):
+        new_cache = {}
+        reparsed = 0
+        for block in VEVENT_BLOCK.findall(text):
+            unfolded = FOLDED_LINE.sub('', block)
+            uid = _property(unfolded, 'UID') or hashlib.sha1(block.encode('utf-8')).hexdigest()
+            cache_key = (uid, _property(unfolded, 'RECURRENCE-ID'))
+            last_modified = _property(unfolded, 'LAST-MODIFIED')
+            if last_modified:
+                version = (last_modified, _property(unfolded, 'SEQUENCE'))
+            else:
+                version = hashlib.sha1(DTSTAMP_LINE.sub('', unfolded).encode('utf-8')).hexdigest()
+
+            cached = self._cache.get(cache_key)
+            if cached and cached[0] == version:
+                new_cache[cache_key] = cached
+                continue
+
+            reparsed += 1
+            try:
+                parsed = ParsedEvent(icalendar.Event.from_ical(block))
+            except Exception as e:
+                print(f"Warning: Skipping unparsable VEVENT {uid}. Error: {e}")
+                parsed = None
+            new_cache[cache_key] = (version, parsed)
+        return new_cache, reparsed
+
+    def ingest(self, ics_content: bytes) -> list:
+        """ICS 內容 => 依開始時間排序的事件列表 (週期事件已展開)"""
+        text = ics_content.decode('utf-8') if isinstance(ics_content, bytes) else ics_content
+        with self._lock:
+            self._cache, self.last_reparsed = self._parse_blocks(text)
+            parsed_events = [(key[0], parsed) for key, (_, parsed) in self._cache.items() if parsed is not None]
+
+        today = datetime.now(CALENDAR_TIMEZONE).replace(hour=0, minute=0, second=0, microsecond=0)
+        window_start = today - timedelta(days=RECURRENCE_PAST_DAYS)
+        window_end = today + timedelta(days=RECURRENCE_FUTURE_DAYS)
+
+        # 被 RECURRENCE-ID 覆寫的單次事件，母事件展開時要跳過
+        overridden = {(uid, parsed.recurrence_id) for uid, parsed in parsed_events if parsed.recurrence_id is not None}
+
+        timed_events = []
+        for uid, parsed in parsed_events:
+            if not parsed.rrule or parsed.recurrence_id is not None:
+                timed_events.append((parsed.start, parsed.to_event()))
+                continue
+            starts = {parsed.start} | set(_expand_rrule(parsed, window_start, window_end))
+            for start in starts:
+                if start in parsed.exdates or (uid, start) in overridden:
+                    continue
+                timed_events.append((start, parsed.to_event(start)))
+
+        timed_events.sort(key=lambda item: (item[0], item[1]['summary']))
+        return [event for _, event in timed_events]
@@ -0,0 +1,267 @@
+# backend/catalog.py
+"""
+本學期課程目錄與搜尋索引
+
+載入 frontend/public/data/本學期開課資訊API.json 後建立記憶體索引：
+- course_cname / course_ename / teacher 的字元 n-gram 倒排索引 (單字用 unigram，其餘用 bigram)，
+  先以 n-gram 交集縮小候選，再做子字串確認，不會有誤判
+- department / division / faculty 的精確值索引
+- (course_id, class) 的主鍵索引，供其他模組查詢單門課程
+- 每門課上課時間的 bitmask (見 timeslots.py)，衝堂檢查只需位元運算
+
+系所與學制的正規化規則與前端 CoursePlanner 相同，篩選值可直接沿用前端下拉選單的值。
+檔案更新 (重新部署或同步腳本寫入) 後，下一次查詢會依 mtime 自動重建索引。
+同步腳本 (scripts/fetch_course_data.py) 同時寫出 course_catalog_changeset.json；
+其 base_hash 與目前載入的目錄相同時直接套用變更，不必重新解析整份目錄。
+"""
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+from timeslots import parse_time_mask
+
+CATALOG_PATH = Path(os.environ.get(
+    "COURSE_CATALOG_PATH",
+    Path(__file__).parent.parent / "frontend" / "public" / "data" / "本學期開課資訊API.json"
+))
+CHANGESET_FILENAME = "course_catalog_changeset.json"
+CHANGESET_FORMAT = "course_catalog_changeset/v1"
+CHANGESET_PATH = CATALOG_PATH.parent / CHANGESET_FILENAME
+SEARCH_FIELDS = ('course_cname', 'course_ename', 'teacher')
+KEYED_FIELDS = ('department', 'division', 'faculty')
+
+
+def course_key(course_id, course_class) -> str:
+    """課程主鍵：課號 + 班別 (班別在新舊資料中可能是 0 或 "0")"""
+    return f"{str(course_id).strip()}-{str(course_class).strip()}"
+
+
+def index_courses(items) -> dict:
+    """API 的課程列表 => {主鍵: 課程}；同一主鍵重複時保留第一筆"""
+    if isinstance(items, dict):
+        items = [items]
+    index = {}
+    for course in items or []:
+        if isinstance(course, dict):
+            index.setdefault(course_key(course.get('course_id', ''), course.get('class', '')), course)
+    return index
+
+
+def catalog_hash(index: dict) -> str:
+    """依主鍵排序後的目錄內容雜湊，與 API 回傳順序無關 (同步腳本與 changeset 的 base_hash / hash)"""
+    canonical = json.dumps([index[key] for key in sorted(index)], ensure_ascii=False,
+                           sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def apply_changeset(index: dict, changeset: dict) -> dict:
+    """把 changeset 套用到 {主鍵: 課程} 上，回傳新的索引 (不修改傳入的索引)"""
+    updated = dict(index)
+    for key in changeset.get('removed', []):
+        updated.pop(key, None)
+    for course in changeset.get('added', []) + changeset.get('modified', []):
+        updated[course_key(course.get('course_id', ''), course.get('class', ''))] = course
+    return updated
+
+
+def normalize_course(course: dict) -> dict:
+    """與前端 normalizeCourseDepartment 相同的系所 / 學制正規化"""
+    course = dict(course)
+    course_name = course.get('course_cname') or ''
+    department = course.get('department')
+    if '中文思辨與表達' in course_name:
+        course['department'] = '通識領域課程'
+    elif not department or not str(department).strip():
+        if '通識' in course_name or '中文思辨' in course_name or '跨域專業學術英文' in course_name:
+            course['department'] = '通識領域課程'
+        elif '服務學習' in course_name or '全校' in course_name or '共同' in course_name:
+            course['department'] = '全校共同課程'
+        else:
+            course['department'] = '其他課程'
+    if not course.get('division') or not str(course['division']).strip():
+        course['division'] = '一般班'
+    return course
+
+
+def _ngrams(text: str, n: int) -> set:
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class CourseCatalog:
+    """
+    不可變的課程目錄與索引；重新載入時建立新物件整批替換
+    source_index 保留 API 原始資料 ({主鍵: 課程})，供下一次以 changeset 增量更新
+    """
+
+    def __init__(self, courses: list, source_mtime: float = None):
+        self.courses = [normalize_course(c) for c in courses if isinstance(c, dict)]
+        self.source_mtime = source_mtime
+        self.source_index = index_courses(courses)
+        self.content_hash = catalog_hash(self.source_index)
+        self._search_text = []
+        self._field_text = {field: [] for field in SEARCH_FIELDS}
+        self._unigram_index = {}
+        self._bigram_index = {}
+        self._keyed_index = {field: {} for field in KEYED_FIELDS}
+        self._by_key = {}
+        self.keys = [course_key(c.get('course_id', ''), c.get('class', '')) for c in self.courses]
+        self.time_masks = [parse_time_mask(c.get('time')) for c in self.courses]
+
+        for position, course in enumerate(self.courses):
+            for field in SEARCH_FIELDS:
+                self._field_text[field].append(str(course.get(field) or '').lower())
+            text = '\n'.join(self._field_text[field][position] for field in SEARCH_FIELDS)
+            self._search_text.append(text)
+            for gram in _ngrams(text, 1):
+                self._unigram_index.setdefault(gram, []).append(position)
+            for gram in _ngrams(text, 2):
+                self._bigram_index.setdefault(gram, []).append(position)
+            for field in KEYED_FIELDS:
+                value = course.get(field)
+                if value:
+                    self._keyed_index[field].setdefault(value, []).append(position)
+            self._by_key.setdefault(self.keys[position], position)
+
+    @classmethod
+    def from_file(cls, path: Path = CATALOG_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            content = json.load(f)
+        return cls(content.get('course_ncnu', {}).get('item') or [], path.stat().st_mtime)
+
+    def with_changeset(self, changeset: dict, source_mtime: float = None):
+        """
+        套用同步腳本輸出的 changeset，回傳新的目錄；不適用時回傳 None (呼叫端改為整份重新載入)：
+        格式不符、需要整份重新載入、base_hash 不是目前的版本，或套用後的雜湊與 changeset 不符
+        """
+        if changeset.get('format') != CHANGESET_FORMAT or changeset.get('full_reload') \
+                or changeset.get('base_hash') != self.content_hash:
+            return None
+        index = apply_changeset(self.source_index, changeset)
+        if catalog_hash(index) != changeset.get('hash'):
+            return None
+        # 同步腳本依主鍵排序輸出目錄，順序與整份重新載入相同
+        return CourseCatalog([index[key] for key in sorted(index)], source_mtime)
+
+    def get(self, course_id, course_class):
+        position = self._by_key.get(course_key(course_id, course_class))
+        return self.courses[position] if position is not None else None
+
+    def classify_conflicts(self, occupied: int, own_masks: dict) -> dict:
+        """
+        一次走過所有課程的 bitmask，分成衝堂 / 可排 / 無固定時間三類 (回傳課程主鍵)
+        occupied 與 own_masks 來自 timeslots.schedule_masks()；課表中同一門課佔用的節次不算衝堂
+        """
+        conflicting, fitting, no_time = [], [], []
+        for key, course, mask in zip(self.keys, self.courses, self.time_masks):
+            if not mask:
+                no_time.append(key)
+            elif mask & occupied & ~own_masks.get(course.get('course_id'), 0):
+                conflicting.append(key)
+            else:
+                fitting.append(key)
+        return {"conflicting": conflicting, "fitting": fitting, "no_time": no_time}
+
+    def keyed_values(self, field: str) -> list:
+        return sorted(self._keyed_index[field])
+
+    def _text_candidates(self, token: str, field: str = None):
+        """單一關鍵字的候選位置 (已排序)，以 n-gram 交集後再子字串確認；field 指定只比對某個欄位"""
+        if len(token) == 1:
+            candidates = self._unigram_index.get(token, [])
+        else:
+            postings = [self._bigram_index.get(gram) for gram in _ngrams(token, 2)]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    return []
+        texts = self._field_text[field] if field else self._search_text
+        return sorted(p for p in candidates if token in texts[p])
+
+    def search(self, query: str = '', field_queries: dict = None, filters: dict = None,
+               page: int = 1, page_size: int = 20) -> dict:
+        """
+        組合查詢，所有條件取交集，結果依目錄原始順序分頁
+        - query: 以空白分隔的每個關鍵字都須出現在課名 / 英文課名 / 教師其中之一
+        - field_queries: {course_cname|course_ename|teacher: 關鍵字}，只比對該欄位
+        - filters: {department|division|faculty: 值} 的精確比對
+        """
+        candidate_sets = []
+        for field, value in (filters or {}).items():
+            if value:
+                candidate_sets.append(self._keyed_index[field].get(value, []))
+        for token in (query or '').lower().split():
+            candidate_sets.append(self._text_candidates(token))
+        for field, value in (field_queries or {}).items():
+            for token in (value or '').lower().split():
+                candidate_sets.append(self._text_candidates(token, field))
+
+        if candidate_sets:
+            candidate_sets.sort(key=len)
+            matched = set(candidate_sets[0])
+            for positions in candidate_sets[1:]:
+                matched.intersection_update(positions)
+            matched = sorted(matched)
+        else:
+            matched = range(len(self.courses))
+
+        start = (page - 1) * page_size
+        return {
+            "total": len(matched),
+            "page": page,
+            "page_size": page_size,
+            "items": [self.courses[p] for p in matched[start:start + page_size]],
+        }
+
+
+_catalog_lock = threading.Lock()
+_catalog = None
+
+
+def _load_changeset(current, mtime):
+    """
+    目錄檔更新時先嘗試套用 changeset；changeset 必須在目錄檔之後寫出 (同一次同步)，
+    避免手動修改目錄檔後誤用上一次同步留下的 changeset
+    """
+    if current is None or mtime is None:
+        return None
+    try:
+        if CHANGESET_PATH.stat().st_mtime < mtime:
+            return None
+        with open(CHANGESET_PATH, 'r', encoding='utf-8') as f:
+            changeset = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return current.with_changeset(changeset, mtime)
+
+
+def get_catalog() -> CourseCatalog:
+    """取得目前的課程目錄；檔案 mtime 改變時重建 (single-flight)"""
+    global _catalog
+    try:
+        mtime = CATALOG_PATH.stat().st_mtime
+    except OSError:
+        mtime = None
+    current = _catalog
+    if current is not None and (mtime is None or current.source_mtime == mtime):
+        return current
+    with _catalog_lock:
+        if _catalog is None or (mtime is not None and _catalog.source_mtime != mtime):
+            try:
+                updated = _load_changeset(_catalog, mtime)
+                if updated is not None:
+                    _catalog = updated
+                    print(f"Course catalog updated from changeset: {len(_catalog.courses)} courses")
+                    return _catalog
+                _catalog = CourseCatalog.from_file(CATALOG_PATH)
+                print(f"Course catalog loaded: {len(_catalog.courses)} courses from {CATALOG_PATH}")
+            except Exception as e:
+                print(f"Warning: Failed to load course catalog {CATALOG_PATH}. Error: {e}")
+                if _catalog is None:
+                    _catalog = CourseCatalog([], mtime)
+        return _catalog
@@ -0,0 +1,299 @@
+# backend/course_archive.py
+"""
+歷年課程目錄的欄式 (columnar) 壓縮封存
+
+每個學年期的開課資訊 (本學期開課資訊API.json) 依 (year, semester) 存成一個資料夾，
+每個欄位一個 gzip 壓縮的 JSON 檔：
+
+    course_archive/
+        manifest.json                 各學年期的筆數、欄位、內容雜湊
+        114_2/course_id.json.gz       {"values": [...不重複值], "codes": [...每列對應的索引]}
+        114_2/teacher.json.gz
+        ...
+
+- 字串欄位以字典編碼 (dictionary encoding) 儲存，重複的系所、教師、學制只存一次
+- 讀取時只開啟需要的欄位與學年期，查「某位教師開過哪些學期」只需讀 teacher 欄
+- 新舊兩種課表格式 (class 為 0 或 "0"、學分為 2 或 "2.0") 寫入前統一正規化，
+  舊課表中的課程可以用 (year, semester, course_id, class) 直接解析回完整資料
+- 同一學年期再次封存時以 (course_id, class) 合併：有變動的課程更新，學期中從 API 消失的課程保留，
+  已存進課表的課程永遠解析得到
+
+只使用標準函式庫，同步腳本 (scripts/) 也可以直接 import。
+用法：
+    python course_archive.py --append ../frontend/public/data/本學期開課資訊API.json
+    python course_archive.py --list
+"""
+import os
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+ARCHIVE_FORMAT = "course_archive/v1"
+ARCHIVE_DIR = Path(os.environ.get(
+    "COURSE_ARCHIVE_DIR",
+    Path(__file__).parent / "data" / "course_archive"
+))
+COLUMNS = (
+    'faculty', 'year', 'semester', 'department', 'course_id', 'class', 'course_cname', 'course_ename',
+    'time', 'location', 'teacher', 'division', 'course_credit', 'edepartment', 'eteacher', 'edivision',
+)
+NUMERIC_COLUMNS = ('course_credit',)
+COLUMN_SUFFIX = ".json.gz"
+
+
+def semester_key(year, semester) -> str:
+    return f"{str(year).strip()}_{str(semester).strip()}"
+
+
+def _to_credit(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def normalize_row(course: dict) -> dict:
+    """新舊格式統一：字串欄位去空白轉字串 (class 0 => "0")、學分轉 float"""
+    row = {}
+    for column in COLUMNS:
+        value = course.get(column)
+        if column in NUMERIC_COLUMNS:
+            row[column] = _to_credit(value)
+        else:
+            row[column] = '' if value is None else str(value).strip()
+    return row
+
+
+def split_teachers(value: str) -> list:
+    return [name.strip() for name in (value or '').replace('、', ',').split(',') if name.strip()]
+
+
+def encode_column(values: list) -> dict:
+    if not values or isinstance(values[0], float):
+        return {"values": values}
+    dictionary, codes, positions = [], [], {}
+    for value in values:
+        code = positions.get(value)
+        if code is None:
+            code = positions[value] = len(dictionary)
+            dictionary.append(value)
+        codes.append(code)
+    return {"values": dictionary, "codes": codes}
+
+
+def decode_column(encoded: dict) -> list:
+    if "codes" not in encoded:
+        return encoded["values"]
+    dictionary = encoded["values"]
+    return [dictionary[code] for code in encoded["codes"]]
+
+
+class CourseArchive:
+    """封存資料夾的讀寫；讀取過的欄位會快取在記憶體，寫入後自動失效"""
+
+    def __init__(self, root: Path = ARCHIVE_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._columns = {}   # (semester_key, column) => list
+        self._positions = {}  # semester_key => {"課號-班別": 列位置}
+        self._manifest = None
+
+    # ───────── manifest ─────────
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            path = self.root / "manifest.json"
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+            else:
+                self._manifest = {"format": ARCHIVE_FORMAT, "semesters": {}}
+        return self._manifest
+
+    def semesters(self) -> list:
+        """已封存的學年期，由舊到新"""
+        return sorted(self.manifest["semesters"], key=lambda k: tuple(int(p) for p in k.split('_')))
+
+    # ───────── 寫入 ─────────
+    def append(self, year, semester, courses: list) -> bool:
+        """
+        封存一個學年期的目錄，回傳是否有寫入；合併後內容雜湊與已封存的相同時不寫入
+        學期中仍可能更新：同一 (course_id, class) 以新資料為準，新資料中沒有的既有課程保留不刪除
+        """
+        key = semester_key(year, semester)
+        merged = {}
+        for course in courses:
+            if isinstance(course, dict):
+                row = normalize_row(course)
+                merged.setdefault((row['course_id'], row['class']), row)
+        incoming = len(merged)
+
+        with self._lock:
+            existing = self.manifest["semesters"].get(key)
+            if existing:
+                for row in self.rows(key):
+                    merged.setdefault((row['course_id'], row['class']), row)
+            rows = [merged[pair] for pair in sorted(merged)]
+            content_hash = hashlib.sha256(
+                json.dumps(rows, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+            ).hexdigest()
+            if existing and existing.get("hash") == content_hash:
+                return False
+
+            semester_dir = self.root / key
+            semester_dir.mkdir(parents=True, exist_ok=True)
+            for column in COLUMNS:
+                encoded = encode_column([row[column] for row in rows])
+                tmp_path = semester_dir / f"{column}{COLUMN_SUFFIX}.tmp"
+                # mtime=0 讓相同內容產生相同位元組，封存檔放進 git 時不會產生假的差異
+                with open(tmp_path, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+                    f.write(json.dumps(encoded, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+                os.replace(tmp_path, semester_dir / f"{column}{COLUMN_SUFFIX}")
+
+            self.manifest["semesters"][key] = {
+                "year": str(year), "semester": str(semester), "rows": len(rows),
+                "retained": len(rows) - incoming,  # 已不在最新目錄中、為舊課表保留的課程數
+                "columns": list(COLUMNS), "hash": content_hash,
+                "archived_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            }
+            manifest_path = self.root / "manifest.json"
+            tmp_path = manifest_path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(self.manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+            os.replace(tmp_path, manifest_path)
+            self._columns = {k: v for k, v in self._columns.items() if k[0] != key}
+            self._positions.pop(key, None)
+            return True
+
+    def append_catalog_file(self, path: Path) -> tuple:
+        """由開課資訊 JSON 檔封存，學年期取自資料本身；回傳 (學年期, 是否有寫入)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            content = json.load(f)
+        items = content.get('course_ncnu', {}).get('item') or []
+        if isinstance(items, dict):
+            items = [items]
+        if not items:
+            raise ValueError(f"{path} has no course items")
+        year, semester = str(items[0].get('year', '')).strip(), str(items[0].get('semester', '')).strip()
+        if not year or not semester:
+            raise ValueError(f"{path} has no year/semester on its courses")
+        return semester_key(year, semester), self.append(year, semester, items)
+
+    # ───────── 讀取 ─────────
+    def load_column(self, key: str, column: str) -> list:
+        cached = self._columns.get((key, column))
+        if cached is not None:
+            return cached
+        with gzip.open(self.root / key / f"{column}{COLUMN_SUFFIX}", 'rb') as f:
+            values = decode_column(json.loads(f.read()))
+        self._columns[(key, column)] = values
+        return values
+
+    def load(self, columns=None, semesters=None) -> dict:
+        """只讀取指定欄位與學年期：{學年期: {欄位: [...]}}"""
+        columns = list(columns or COLUMNS)
+        wanted = None if semesters is None else set(semesters)
+        keys = [k for k in self.semesters() if wanted is None or k in wanted]
+        return {key: {column: self.load_column(key, column) for column in columns} for key in keys}
+
+    def rows(self, key: str, columns=None) -> list:
+        columns = list(columns or COLUMNS)
+        data = {column: self.load_column(key, column) for column in columns}
+        return [dict(zip(columns, values)) for values in zip(*(data[c] for c in columns))]
+
+    # ───────── 歷史查詢 ─────────
+    def teacher_history(self, teacher: str) -> list:
+        """某位教師開課的學年期與課程 (只讀 teacher / course_id / class / course_cname 欄)"""
+        teacher = teacher.strip()
+        history = []
+        for key in self.semesters():
+            teachers = self.load_column(key, 'teacher')
+            positions = [i for i, value in enumerate(teachers) if teacher in split_teachers(value)]
+            if positions:
+                history.append(self._history_entry(key, positions))
+        return history
+
+    def course_history(self, course_id: str) -> list:
+        """某個課號開課的學年期、班別與授課教師"""
+        course_id = str(course_id).strip()
+        history = []
+        for key in self.semesters():
+            positions = [i for i, value in enumerate(self.load_column(key, 'course_id')) if value == course_id]
+            if positions:
+                history.append(self._history_entry(key, positions, with_teacher=True))
+        return history
+
+    def _history_entry(self, key: str, positions: list, with_teacher: bool = False) -> dict:
+        meta = self.manifest["semesters"][key]
+        columns = ['course_id', 'class', 'course_cname'] + (['teacher'] if with_teacher else [])
+        data = {column: self.load_column(key, column) for column in columns}
+        return {
+            "year": meta["year"],
+            "semester": meta["semester"],
+            "courses": [{column: data[column][i] for column in columns} for i in positions],
+        }
+
+    def resolve(self, year, semester, course_id, course_class):
+        """(學年期, 課號, 班別) => 完整課程資料；新舊課表格式的班別 (0 / "0") 皆可"""
+        key = semester_key(year, semester)
+        if key not in self.manifest["semesters"]:
+            return None
+        positions = self._positions.get(key)
+        if positions is None:
+            positions = {}
+            for i, pair in enumerate(zip(self.load_column(key, 'course_id'), self.load_column(key, 'class'))):
+                positions.setdefault(f"{pair[0]}-{pair[1]}", i)
+            self._positions[key] = positions
+        i = positions.get(f"{str(course_id).strip()}-{str(course_class).strip()}")
+        if i is None:
+            return None
+        return {column: self.load_column(key, column)[i] for column in COLUMNS}
+
+    def resolve_entry(self, entry: dict):
+        """課表中的一筆課程 (新舊格式皆可) => 封存中的完整資料"""
+        if not isinstance(entry, dict) or 'course_id' not in entry:
+            return None
+        return self.resolve(entry.get('year', ''), entry.get('semester', ''),
+                            entry['course_id'], entry.get('class', ''))
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> CourseArchive:
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = CourseArchive(ARCHIVE_DIR)
+    return _archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description="歷年課程目錄封存")
+    parser.add_argument("--append", type=Path, nargs='+', metavar="CATALOG_JSON", help="封存開課資訊 JSON 檔")
+    parser.add_argument("--list", action="store_true", help="列出已封存的學年期")
+    parser.add_argument("--root", type=Path, default=ARCHIVE_DIR, help="封存資料夾")
+    args = parser.parse_args()
+
+    archive = CourseArchive(args.root)
+    for path in args.append or []:
+        try:
+            key, written = archive.append_catalog_file(path)
+        except Exception as e:
+            print(f"❌ 封存 {path} 失敗: {e}")
+            sys.exit(1)
+        print(f"✔ {key}: {'已封存' if written else '內容未變更，略過'} ({path})")
+    if args.list or not args.append:
+        for key in archive.semesters():
+            meta = archive.manifest["semesters"][key]
+            print(f"{key}: {meta['rows']} 門課，封存於 {meta['archived_at']}")
+
+
+if __name__ == "__main__":
+    main()
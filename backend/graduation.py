@@ -0,0 +1,165 @@
+# backend/graduation.py
+"""
+畢業必修進度
+
+啟動時把必修資料載入成以 (year, deptId, class) 為鍵的索引：標題列 (" 必修課程" / "合計:") 已濾除、
+學分已轉成 float。優先讀取合併檔 course_require_bundle.json (見根目錄 course_require_bundle.py)，
+沒有合併檔時才逐一讀取 course_require_{YEAR}_{deptId}_{class}.json。
+/api/graduation/progress 再拿使用者已儲存的課表比對，一次算出已修 / 未修的必修學分。
+"""
+import os
+import re
+import json
+import threading
+from pathlib import Path
+
+from hotness import extract_course_ids
+
+COURSE_REQUIRE_DIR = Path(os.environ.get(
+    "COURSE_REQUIRE_DIR",
+    Path(__file__).parent.parent / "frontend" / "public" / "data"
+))
+# 合併檔格式與檔名規則；根目錄的 course_require_bundle.py 產生合併檔時也匯入這些定義
+BUNDLE_FORMAT = "course_require_bundle/v1"
+BUNDLE_FILENAME = "course_require_bundle.json"
+COURSE_REQUIRE_BUNDLE = COURSE_REQUIRE_DIR / BUNDLE_FILENAME
+COURSE_REQUIRE_FILE = re.compile(r'^course_require_(\d+)_([0-9A-Za-z]+)_([A-Za-z])\.json$')
+CLASS_TYPES = ('B', 'G', 'P')
+
+
+def is_header_row(course: dict) -> bool:
+    """必修課程標題列與合計列 (與 clean_frontend_course_files.py 的判斷一致)"""
+    course_id = str(course.get('course_id', '')).strip()
+    course_cname = course.get('course_cname', '') or ''
+    return course_id == '必修課程' or '合計:' in course_cname or not course_cname
+
+
+def _to_credit(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def normalize_requirements(items) -> list:
+    """API 原始 item (可能是單一物件或陣列) => 去除標題列、學分轉 float 的課程列表"""
+    if isinstance(items, dict):
+        items = [items]
+    courses = []
+    for course in items or []:
+        if not isinstance(course, dict) or is_header_row(course):
+            continue
+        courses.append({
+            "course_id": str(course.get('course_id', '')).strip(),
+            "course_cname": course.get('course_cname', ''),
+            "course_credit": _to_credit(course.get('course_credit')),
+            "department": course.get('department', ''),
+        })
+    return courses
+
+
+def load_requirement_files(directory: Path = COURSE_REQUIRE_DIR) -> dict:
+    """掃描資料夾中的所有 course_require 檔案，空的組合不放進索引"""
+    index = {}
+    for file_path in sorted(directory.glob("course_require_*.json")):
+        match = COURSE_REQUIRE_FILE.match(file_path.name)
+        if not match:
+            continue
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+        except Exception as e:
+            print(f"Warning: Failed to read {file_path.name}. Error: {e}")
+            continue
+        courses = normalize_requirements(content.get('course_require_ncnu', {}).get('item'))
+        if courses:
+            index[match.groups()] = courses
+    return index
+
+
+def load_requirement_bundle(bundle_path: Path = COURSE_REQUIRE_BUNDLE) -> dict:
+    """讀取合併檔並還原成 {(year, deptId, class): 課程列表}；合併檔已去除標題列與空組合"""
+    with open(bundle_path, 'r', encoding='utf-8') as f:
+        bundle = json.load(f)
+    if bundle.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format: {bundle.get('format')}")
+
+    strings, records, entries = bundle['strings'], bundle['records'], bundle['entries']
+    index = {}
+    for key, (offset, count) in bundle['index'].items():
+        year, dept_id, class_type = key.split('_')
+        index[(year, dept_id, class_type)] = [
+            {
+                "course_id": strings[records[record_id][0]],
+                "course_cname": strings[records[record_id][1]],
+                "course_credit": float(records[record_id][2]),
+                "department": strings[records[record_id][3]],
+            }
+            for record_id in entries[offset:offset + count]
+        ]
+    return index
+
+
+def load_requirements(directory: Path = COURSE_REQUIRE_DIR) -> dict:
+    """合併檔優先，讀取失敗或不存在時退回逐檔讀取"""
+    bundle_path = directory / COURSE_REQUIRE_BUNDLE.name
+    if bundle_path.exists():
+        try:
+            return load_requirement_bundle(bundle_path)
+        except Exception as e:
+            print(f"Warning: Failed to read {bundle_path.name}, falling back to per-file data. Error: {e}")
+    return load_requirement_files(directory)
+
+
+class RequirementIndex:
+    """(year, deptId, class) => 必修課程列表"""
+
+    def __init__(self, entries: dict):
+        self._entries = entries
+        self._years = {}
+        for year, dept_id, class_type in entries:
+            self._years.setdefault((dept_id, class_type), []).append(year)
+        for years in self._years.values():
+            years.sort(key=int)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def latest_year(self, dept_id: str, class_type: str):
+        years = self._years.get((dept_id, class_type))
+        return years[-1] if years else None
+
+    def get(self, year: str, dept_id: str, class_type: str):
+        return self._entries.get((year, dept_id, class_type))
+
+
+def compute_progress(requirements: list, schedule_data, flexible_courses) -> dict:
+    """比對課表中的課號，算出已修 / 未修的必修課程與學分"""
+    taken = extract_course_ids(schedule_data, flexible_courses)
+    completed = [c for c in requirements if c['course_id'] in taken]
+    missing = [c for c in requirements if c['course_id'] not in taken]
+    total_credits = sum(c['course_credit'] for c in requirements)
+    completed_credits = sum(c['course_credit'] for c in completed)
+    return {
+        "total_credits": round(total_credits, 1),
+        "completed_credits": round(completed_credits, 1),
+        "missing_credits": round(total_credits - completed_credits, 1),
+        "progress": round(completed_credits / total_credits * 100, 1) if total_credits else 0.0,
+        "completed": completed,
+        "missing": missing,
+    }
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_requirement_index() -> RequirementIndex:
+    """第一次呼叫時載入索引 (single-flight)，之後直接回傳"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RequirementIndex(load_requirements(COURSE_REQUIRE_DIR))
+                print(f"Course requirement index loaded: {len(_index)} dept/class combinations")
+    return _index
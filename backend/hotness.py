@@ -0,0 +1,83 @@
+# backend/hotness.py
+"""
+課程熱門度計數器
+
+- /api/schedule POST 儲存時，依新舊課表的課程 ID 差集算出 ±1 的增量並寫入 course_hotness 表
+  (由 RPC save_schedule 在同一交易中完成，見 sql/004_schedule_version.sql)
+- /api/courses/hotness 直接讀取 course_hotness 表，複雜度只與課程數有關
+- 計數若有漂移（例如寫入途中失敗），執行 `python hotness.py --reconcile` 全量重建
+
+資料表與 RPC 定義見 sql/001_course_hotness.sql
+"""
+import sys
+from collections import Counter
+
+from table_scan import iter_table_rows
+
+HOTNESS_TABLE = 'course_hotness'
+
+
+def extract_course_ids(schedule_data, flexible_courses) -> set:
+    """取出一份課表中所有不重複的課程 ID（固定課程 + 彈性課程）"""
+    course_ids = set()
+    if isinstance(schedule_data, dict):
+        course_ids.update(
+            course['course_id']
+            for course in schedule_data.values()
+            if isinstance(course, dict) and 'course_id' in course
+        )
+    if isinstance(flexible_courses, list):
+        course_ids.update(
+            course['course_id']
+            for course in flexible_courses
+            if isinstance(course, dict) and 'course_id' in course
+        )
+    return course_ids
+
+
+def fetch_hotness_map(client) -> dict:
+    """讀取預先計算好的熱門度 {course_id: count}，只回傳 count > 0 的課程"""
+    rows = iter_table_rows(
+        client, HOTNESS_TABLE, 'course_id, count', key_column='course_id',
+        apply_filters=lambda query: query.gt('count', 0),
+    )
+    return {row['course_id']: row['count'] for row in rows}
+
+
+def count_course_hotness(rows) -> Counter:
+    """由 schedules 資料列（可為 generator）從頭計算熱門度，每位使用者每門課只算一次"""
+    course_counts = Counter()
+    for row in rows:
+        if not row:
+            continue
+        course_counts.update(extract_course_ids(row.get('schedule_data'), row.get('flexible_courses')))
+    return course_counts
+
+
+def rebuild_course_hotness(client) -> Counter:
+    """全量重建 course_hotness 表，用於修正計數漂移"""
+    rows = iter_table_rows(client, 'schedules', 'schedule_data, flexible_courses')
+    course_counts = count_course_hotness(rows)
+    client.rpc('replace_course_hotness', {'counts': dict(course_counts)}).execute()
+    return course_counts
+
+
+if __name__ == '__main__':
+    if '--reconcile' not in sys.argv[1:]:
+        print("用法: python hotness.py --reconcile")
+        sys.exit(1)
+
+    import os
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        print("FATAL: SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
+        sys.exit(1)
+
+    print("開始全量重建課程熱門度計數...")
+    counts = rebuild_course_hotness(create_client(url, key))
+    print(f"✔ 重建完成，共 {len(counts)} 門課程、{sum(counts.values())} 筆選課紀錄")
@@ -0,0 +1,286 @@
+# backend/metrics.py
+"""
+內建效能指標 (Prometheus 文字格式，GET /metrics)
+
+- 各端點延遲直方圖與請求數 (依路由樣板、method、狀態碼)
+- 每次 Supabase 查詢 (PostgREST HTTP 請求) 的延遲與錯誤數，依 method 與資料表 / RPC 區分
+- load_static_data_if_needed 各上游資料來源 (NCNU API、Google 行事曆) 的抓取延遲與錯誤數
+- 精簡課表中查不到完整資料的課程數 (見 schedule_format.py)，依學年期區分
+- 慢請求記錄：請求超過 SLOW_REQUEST_MS 毫秒時印出明細 (每次資料庫 / 上游呼叫的耗時，
+  以及剩下的 Python 處理時間)，用來判斷慢的是哪一段
+
+指標存在各 worker process 的記憶體中 (與課表快取相同)，多 worker 部署時每次抓取只會看到其中一個 worker 的數字。
+一次請求內的呼叫以 contextvars 追蹤，Flask (執行緒) 與 asgi.py (asyncio) 兩種模式都適用。
+"""
+import os
+import time
+import threading
+import contextlib
+import contextvars
+from urllib.parse import urlparse
+
+import httpx
+
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "1000"))  # 0 表示不記錄
+SLOW_REQUEST_MAX_SPANS = 20  # 慢請求記錄最多列出幾次呼叫
+SUPABASE_TIMEOUT_SECONDS = 120  # 與 postgrest 預設的逾時相同
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")  # 設定後 /metrics 需帶 Authorization: Bearer <token>
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+_families = []
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value) -> str:
+    """整數照原樣輸出；浮點數用 repr 保留完整精度 (:g 只有 6 位有效數字，超過 1e6 的計數會失真)"""
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name, self.help_text, self.labelnames = name, help_text, tuple(labelnames)
+        self._values = {}
+        _families.append(self)
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help_text, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels => [各 bucket 的計數..., 總和, 總數]
+        _families.append(self)
+
+    def observe(self, value: float, *labels):
+        with _lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, entry in sorted(self._values.items()):
+            running = 0
+            for bound, count in zip(self.buckets, entry):
+                running += count
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {running}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {entry[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {entry[-2]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {entry[-1]}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'API request latency by route template.',
+                            ('route', 'method'))
+REQUESTS_TOTAL = Counter('http_requests_total', 'API requests by route template and status code.',
+                         ('route', 'method', 'status'))
+SLOW_REQUESTS_TOTAL = Counter('http_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS.',
+                              ('route', 'method'))
+SUPABASE_SECONDS = Histogram('supabase_query_duration_seconds', 'Supabase (PostgREST) query latency.',
+                             ('method', 'target'))
+SUPABASE_ERRORS = Counter('supabase_query_errors_total',
+                          'Supabase queries that failed or returned HTTP status >= 400.', ('method', 'target'))
+UPSTREAM_SECONDS = Histogram('upstream_fetch_duration_seconds',
+                             'Static data upstream fetch latency (NCNU API, Google Calendar).', ('source',))
+UPSTREAM_ERRORS = Counter('upstream_fetch_errors_total', 'Static data upstream fetches that failed.', ('source',))
+SCHEDULE_HYDRATION_MISSES = Counter('schedule_hydration_misses_total',
+                                    'Stored compact courses not found in the catalog or archive.', ('semester',))
+
+
+def render() -> str:
+    """所有指標的 Prometheus 文字格式"""
+    with _lock:
+        lines = [line for family in _families for line in family.render()]
+    return '\n'.join(lines) + '\n'
+
+
+# --- 單次請求的明細 ---
+class RequestTrace:
+    """一次請求中每次資料庫 / 上游呼叫的 (種類, 名稱, 秒數, 是否失敗)"""
+
+    def __init__(self, method: str, path: str):
+        self.method, self.path = method, path
+        self.route = None  # 路由樣板，由框架在比對到路由後填入
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def describe(self, elapsed: float, status: int) -> str:
+        parts = [f"SLOW REQUEST {self.method} {self.path} -> {status} in {elapsed * 1000:.1f}ms"]
+        spent = 0.0
+        for kind in ('supabase', 'upstream'):
+            spans = [s for s in self.spans if s[0] == kind]
+            if not spans:
+                continue
+            total = sum(s[2] for s in spans)
+            spent += total
+            shown = ', '.join(f"{name} {seconds * 1000:.1f}ms{' ERROR' if error else ''}"
+                              for _, name, seconds, error in spans[:SLOW_REQUEST_MAX_SPANS])
+            more = f", +{len(spans) - SLOW_REQUEST_MAX_SPANS} more" if len(spans) > SLOW_REQUEST_MAX_SPANS else ''
+            parts.append(f"{kind} {len(spans)} calls {total * 1000:.1f}ms ({shown}{more})")
+        # 上游資料來源是平行抓取，總和可能超過請求時間
+        parts.append(f"other {max(0.0, elapsed - spent) * 1000:.1f}ms")
+        return ' | '.join(parts)
+
+
+_current_trace = contextvars.ContextVar('request_trace', default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def begin_request(method: str, path: str):
+    """開始追蹤一次請求；已在外層 (asgi.py 的 middleware) 追蹤時回傳 None，由外層負責結束"""
+    if _current_trace.get() is not None:
+        return None
+    trace = RequestTrace(method, path)
+    _current_trace.set(trace)
+    return trace
+
+
+def end_request(trace, status: int):
+    """記錄請求延遲；超過 SLOW_REQUEST_MS 時印出明細"""
+    if trace is None:
+        return
+    _current_trace.set(None)
+    elapsed = time.perf_counter() - trace.started
+    route = trace.route or '<unmatched>'
+    REQUEST_SECONDS.observe(elapsed, route, trace.method)
+    REQUESTS_TOTAL.inc(route, trace.method, str(status))
+    if SLOW_REQUEST_MS > 0 and elapsed * 1000 >= SLOW_REQUEST_MS:
+        SLOW_REQUESTS_TOTAL.inc(route, trace.method)
+        print(trace.describe(elapsed, status))
+
+
+def _record_span(kind: str, name: str, seconds: float, error: bool):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append((kind, name, seconds, error))
+
+
+# --- 上游資料來源 ---
+@contextlib.contextmanager
+def timed_upstream(source: str):
+    """計時一次上游抓取；例外照常拋出並計入錯誤數"""
+    started = time.perf_counter()
+    error = True
+    try:
+        yield
+        error = False
+    finally:
+        seconds = time.perf_counter() - started
+        UPSTREAM_SECONDS.observe(seconds, source)
+        if error:
+            UPSTREAM_ERRORS.inc(source)
+        _record_span('upstream', source, seconds, error)
+
+
+# --- Supabase 查詢 ---
+def _query_target(url) -> str:
+    """/rest/v1/schedules => schedules；/rest/v1/rpc/save_schedule => rpc/save_schedule"""
+    path = urlparse(str(url)).path
+    marker = '/rest/v1/'
+    return path.split(marker, 1)[1] if marker in path else path
+
+
+def _record_query(request: httpx.Request, seconds: float, error: bool):
+    method, target = request.method, _query_target(request.url)
+    SUPABASE_SECONDS.observe(seconds, method, target)
+    if error:
+        SUPABASE_ERRORS.inc(method, target)
+    # 明細中標出計數查詢 (例如 wrapped 的排名)，與同一張表的一般查詢區分
+    counted = ' (count)' if 'count=' in request.headers.get('prefer', '') else ''
+    _record_span('supabase', f"{method} {target}{counted}", seconds, error)
+
+
+def _is_query(request: httpx.Request) -> bool:
+    # 同一個 httpx client 也會被 supabase 的 auth / storage 使用，只計時 PostgREST 查詢
+    return '/rest/v1/' in request.url.path
+
+
+class _TimedTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request):
+        if not _is_query(request):
+            return self._transport.handle_request(request)
+        started = time.perf_counter()
+        try:
+            response = self._transport.handle_request(request)
+            response.read()
+        except Exception:
+            _record_query(request, time.perf_counter() - started, True)
+            raise
+        _record_query(request, time.perf_counter() - started, response.status_code >= 400)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class _AsyncTimedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request):
+        if not _is_query(request):
+            return await self._transport.handle_async_request(request)
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+            await response.aread()
+        except Exception:
+            _record_query(request, time.perf_counter() - started, True)
+            raise
+        _record_query(request, time.perf_counter() - started, response.status_code >= 400)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def timed_http_client(transport: httpx.BaseTransport = None) -> httpx.Client:
+    """
+    建立 supabase client 時傳入的 httpx client (ClientOptions(httpx_client=...))，替每次 PostgREST 查詢計時；
+    查詢程式碼不需修改，計時包含讀完回應內容。連線設定與 postgrest 預設建立的 session 相同
+    """
+    return httpx.Client(transport=_TimedTransport(transport or httpx.HTTPTransport(http2=True)),
+                        timeout=SUPABASE_TIMEOUT_SECONDS, follow_redirects=True)
+
+
+def async_timed_http_client(transport: httpx.AsyncBaseTransport = None) -> httpx.AsyncClient:
+    """timed_http_client 的 AsyncClient 版本 (asgi.py 使用)"""
+    return httpx.AsyncClient(transport=_AsyncTimedTransport(transport or httpx.AsyncHTTPTransport(http2=True)),
+                             timeout=SUPABASE_TIMEOUT_SECONDS, follow_redirects=True)
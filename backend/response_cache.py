@@ -0,0 +1,128 @@
+# backend/response_cache.py
+"""
+讀多寫少端點的回應快取
+
+每份資料只序列化一次：保存 JSON bytes、gzip / brotli 壓縮版本與內容雜湊 (ETag)。
+- 客戶端帶 If-None-Match 且內容未變 => 304，不回傳 body
+- 依 Accept-Encoding 回傳 br > gzip > 原始內容；壓縮版本在第一次有請求要求該編碼時才產生並保留，
+  沒有人要求的編碼不花 CPU 壓縮 (課表快取的每份課表多半只會以其中一種編碼送出)
+- 以「版本號」判斷是否失效：資料重新載入後版本號改變，下一次請求就會重建；
+  同一個 key 同時只有一個請求執行 producer()，不同 key 互不阻塞
+"""
+import gzip
+import json
+import time
+import hashlib
+import threading
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # brotli 為選用套件，沒有安裝時只提供 gzip
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024
+
+
+class CachedPayload:
+    """一份已序列化的 JSON 回應與其壓縮版本"""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.encoded = {}  # 已產生的壓縮版本 {encoding: bytes}
+
+    def _available_encodings(self) -> tuple:
+        if len(self.body) < MIN_COMPRESS_BYTES:
+            return ()
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def encode(self, encoding: str) -> bytes:
+        """取得壓縮版本，第一次要求時才壓縮；同時要求時可能重複壓縮一次，結果相同"""
+        body = self.encoded.get(encoding)
+        if body is None:
+            if encoding == 'br':
+                body = brotli.compress(self.body, quality=5)
+            else:
+                body = gzip.compress(self.body, compresslevel=6, mtime=0)
+            self.encoded[encoding] = body
+        return body
+
+    @classmethod
+    def from_object(cls, obj):
+        return cls(json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    def _matches(self, if_none_match: str) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        weak_self = self.etag[2:]
+        return '*' in candidates or any(tag.removeprefix('W/') == weak_self for tag in candidates)
+
+    def _negotiate(self, accept_encoding: str):
+        accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+        for encoding in self._available_encodings():
+            if encoding in accepted:
+                return encoding
+        return None
+
+    def render(self, if_none_match: str, accept_encoding: str, cache_control: str = 'no-cache') -> tuple:
+        """與框架無關的回應內容 => (status, body, headers)；Flask 與 ASGI 模式共用"""
+        headers = {
+            'ETag': self.etag,
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': cache_control,  # 預設每次都以 ETag 重新驗證，內容未變時只回 304
+        }
+        if self._matches(if_none_match):
+            return 304, b'', headers
+
+        encoding = self._negotiate(accept_encoding)
+        if encoding:
+            headers['Content-Encoding'] = encoding
+            return 200, self.encode(encoding), headers
+        return 200, self.body, headers
+
+    def to_response(self, request, cache_control: str = 'no-cache') -> Response:
+        status, body, headers = self.render(
+            request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding'), cache_control
+        )
+        if status == 304:
+            return Response(status=304, headers=headers)
+        return Response(body, status=status, headers=headers, mimetype='application/json')
+
+
+class ResponseCache:
+    """key -> (版本號, 建立時間, CachedPayload)"""
+
+    def __init__(self):
+        self._entries = {}
+        self._key_locks = {}  # key -> 重建用的鎖 (single-flight)
+        self._lock = threading.Lock()  # 只保護 _key_locks，不在持有時執行 producer()
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_or_build(self, key: str, version, producer, max_age_seconds: float = None) -> CachedPayload:
+        """版本號相同且未過期時直接回傳快取；否則呼叫 producer() 取得資料並重建"""
+        entry = self._entries.get(key)
+        if entry and self._is_fresh(entry, version, max_age_seconds):
+            return entry[2]
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry and self._is_fresh(entry, version, max_age_seconds):
+                return entry[2]
+            payload = CachedPayload.from_object(producer())
+            self._entries[key] = (version, time.monotonic(), payload)
+            return payload
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+    @staticmethod
+    def _is_fresh(entry, version, max_age_seconds) -> bool:
+        cached_version, built_at, _ = entry
+        if cached_version != version:
+            return False
+        return max_age_seconds is None or time.monotonic() - built_at < max_age_seconds
@@ -0,0 +1,241 @@
+# backend/schedule_format.py
+"""
+精簡課表儲存格式與課程資料還原 (hydration)
+
+舊做法在 schedule_data 的每個節次 key 底下存整份課程物件 (課名、教師、英文欄位…)，
+三節課的課程每位使用者要存三份。精簡格式每個節次只存課程主鍵、學年期與顯示用的欄位：
+
+    {"1e": {"course_id": "992062", "class": "0", "year": "114", "semester": "1",
+            "course_cname": "微積分", "teacher": "王小明", "time": "1efg", "course_credit": "3.0"}, "1f": {...}}
+
+flexible_courses 的每一項同樣只存這些欄位。仍以節次為 key，因此
+sql/003 的 schedule_course_ids、熱門度、衝堂檢查與畢業進度都不需修改。
+
+- compact_schedule(): 儲存前精簡 (schedule_store.save_schedule)；目錄與封存都查不到的課程保留完整物件，不會遺失資料
+- hydrate_schedule(): 讀取時以課程目錄 (catalog.py，本學期) 或歷年封存 (course_archive.py) 補回完整欄位。
+  查不到時 (封存未部署、學年期缺漏) 仍有課名、教師、時間、學分可顯示，
+  並記入 schedule_hydration_misses_total 指標 (見 metrics.py)，每門課第一次查不到時印出警告
+- 三種格式可以並存：舊時期 (class 為數字、無英文欄位)、新時期 (完整物件) 原樣回傳，精簡格式才需還原。
+  既有資料在使用者下次儲存時自動轉為精簡格式 (lazy migration)，也可執行
+  `python schedule_format.py --migrate` 一次轉換全部
+- apply_schedule_ops(): PATCH /api/schedule 的增量操作 (加入 / 移除課程)
+"""
+import sys
+import json
+import threading
+
+import metrics
+from catalog import get_catalog, normalize_course
+from course_archive import get_archive
+from timeslots import parse_time_mask, mask_to_slots, slot_key_mask
+
+COMPACT_FIELDS = ('course_id', 'class', 'year', 'semester')
+DISPLAY_FIELDS = ('course_cname', 'teacher', 'time', 'course_credit')  # 查不到完整資料時仍可顯示
+_COMPACT_KEYS = frozenset(COMPACT_FIELDS + DISPLAY_FIELDS)
+
+_reported_misses = set()
+_reported_lock = threading.Lock()
+
+
+def is_compact(course) -> bool:
+    """精簡格式的課程只有主鍵與顯示欄位 (早期的精簡格式只有主鍵)；完整物件還有系所、地點等欄位"""
+    return isinstance(course, dict) and 'course_id' in course and course.keys() <= _COMPACT_KEYS
+
+
+def _course_ref(course: dict) -> dict:
+    return {field: str(course.get(field, '')).strip() for field in COMPACT_FIELDS}
+
+
+def resolve_course(course: dict):
+    """(course_id, class, year, semester) => 完整課程資料 (與前端相同的系所正規化)；查不到時回傳 None"""
+    ref = _course_ref(course)
+    if not ref['course_id'] or not ref['year'] or not ref['semester']:
+        return None
+    current = get_catalog().get(ref['course_id'], ref['class'])
+    if current is not None and str(current.get('year')) == ref['year'] \
+            and str(current.get('semester')) == ref['semester']:
+        return current
+    archived = get_archive().resolve(ref['year'], ref['semester'], ref['course_id'], ref['class'])
+    return normalize_course(archived) if archived is not None else None
+
+
+def compact_course(course):
+    """
+    課程物件 => 主鍵 + 顯示欄位；缺學年期或查不到的課程原樣回傳 (完整物件不會被精簡)
+    只有主鍵的早期精簡格式在這裡補上顯示欄位
+    """
+    if not isinstance(course, dict) or 'course_id' not in course:
+        return course
+    resolved = resolve_course(course)
+    if resolved is None:
+        return course
+    compacted = _course_ref(course)
+    for field in DISPLAY_FIELDS:
+        compacted[field] = course.get(field, resolved.get(field, ''))
+    return compacted
+
+
+def _report_miss(course: dict):
+    ref = _course_ref(course)
+    metrics.SCHEDULE_HYDRATION_MISSES.inc(f"{ref['year']}_{ref['semester']}")
+    key = tuple(ref.values())
+    with _reported_lock:
+        if key in _reported_misses:
+            return
+        _reported_misses.add(key)
+    print(f"Warning: Cannot resolve stored course {ref['course_id']}-{ref['class']} "
+          f"({ref['year']}-{ref['semester']}) from the catalog or archive, serving stored fields only.")
+
+
+def hydrate_course(course):
+    """精簡格式 => 完整課程資料；其他格式原樣回傳，查不到時回傳精簡物件本身 (含顯示欄位)"""
+    if not is_compact(course):
+        return course
+    resolved = resolve_course(course)
+    if resolved is None:
+        _report_miss(course)
+        return course
+    return resolved
+
+
+def compact_schedule(schedule_data, flexible_courses) -> tuple:
+    """
+    (schedule_data, flexible_courses) => 精簡格式；同一門課 (課號、班別、學年期相同) 在各節次共用一份精簡物件。
+    JSON 解析後各節次是各自的 dict，因此以主鍵而非物件本身判斷是否為同一門課；查不到而原樣保留的課程不共用
+    """
+    compacted = {}
+    if isinstance(schedule_data, dict):
+        by_key = {}
+        for slot, course in schedule_data.items():
+            key = tuple(_course_ref(course).values()) if isinstance(course, dict) else None
+            shared = by_key.get(key) if key is not None else None
+            if shared is None:
+                shared = compact_course(course)
+                if key is not None and shared is not course:
+                    by_key[key] = shared
+            compacted[slot] = shared
+    else:
+        compacted = schedule_data
+    if isinstance(flexible_courses, list):
+        flexible_courses = [compact_course(course) for course in flexible_courses]
+    return compacted, flexible_courses
+
+
+def hydrate_schedule(schedule_data, flexible_courses) -> tuple:
+    """讀取時還原：精簡格式的課程補回完整欄位，舊 / 新時期的完整物件原樣保留"""
+    if isinstance(schedule_data, dict):
+        schedule_data = {slot: hydrate_course(course) for slot, course in schedule_data.items()}
+    if isinstance(flexible_courses, list):
+        flexible_courses = [hydrate_course(course) for course in flexible_courses]
+    return schedule_data, flexible_courses
+
+
+def hydrate_row(row):
+    """RPC / 資料表回傳的課表資料列 => 還原後的新 dict"""
+    if not isinstance(row, dict):
+        return row
+    schedule_data, flexible_courses = hydrate_schedule(row.get('schedule_data'), row.get('flexible_courses'))
+    return {**row, 'schedule_data': schedule_data, 'flexible_courses': flexible_courses}
+
+
+class ScheduleOpError(ValueError):
+    """增量操作格式錯誤或無法套用 (例如節次已被其他課程佔用)"""
+
+
+def _course_slots(op: dict, course: dict) -> list:
+    """操作指定的節次；未指定時依課程時間 (請求中的 time，或目錄中的資料) 展開"""
+    slots = op.get('slots')
+    if slots is None:
+        time_string = course.get('time') or (resolve_course(course) or {}).get('time')
+        slots = mask_to_slots(parse_time_mask(time_string))
+    if not isinstance(slots, list) or not all(slot_key_mask(slot) for slot in slots):
+        raise ScheduleOpError(f"invalid slots for course {course.get('course_id')}: {slots}")
+    return slots
+
+
+def apply_schedule_ops(schedule_data, flexible_courses, ops: list) -> tuple:
+    """
+    依序套用增量操作，回傳新的 (schedule_data, flexible_courses)，不修改傳入的資料：
+        {"op": "add", "course": {...}, "slots": ["1e", "1f"]}   slots 省略時依課程時間展開
+        {"op": "add", "course": {...}, "flexible": true}        加入彈性課程
+        {"op": "remove", "course_id": "992062"}                 從課表與彈性課程中移除
+    """
+    schedule_data = dict(schedule_data) if isinstance(schedule_data, dict) else {}
+    flexible_courses = list(flexible_courses) if isinstance(flexible_courses, list) else []
+
+    for op in ops:
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind == 'remove':
+            course_id = str(op.get('course_id', '')).strip()
+            if not course_id:
+                raise ScheduleOpError("remove requires course_id")
+            schedule_data = {slot: course for slot, course in schedule_data.items()
+                             if not (isinstance(course, dict) and str(course.get('course_id')) == course_id)}
+            flexible_courses = [course for course in flexible_courses
+                                if not (isinstance(course, dict) and str(course.get('course_id')) == course_id)]
+        elif kind == 'add':
+            course = op.get('course')
+            if not isinstance(course, dict) or not str(course.get('course_id', '')).strip():
+                raise ScheduleOpError("add requires a course object with course_id")
+            course_id = str(course['course_id']).strip()
+            if op.get('flexible'):
+                if not any(isinstance(c, dict) and str(c.get('course_id')) == course_id for c in flexible_courses):
+                    flexible_courses.append(compact_course(course))
+                continue
+            stored = compact_course(course)
+            for slot in _course_slots(op, course):
+                existing = schedule_data.get(slot)
+                if isinstance(existing, dict) and str(existing.get('course_id')) != course_id:
+                    raise ScheduleOpError(f"slot {slot} is already occupied by course {existing.get('course_id')}")
+                schedule_data[slot] = stored
+        else:
+            raise ScheduleOpError(f"unknown op: {kind}")
+    return schedule_data, flexible_courses
+
+
+def migrate_schedules(client, dry_run: bool = False) -> dict:
+    """
+    掃描所有課表，把尚未精簡 (或只有主鍵的早期精簡格式) 的資料列改寫為目前的精簡格式
+    (課程 ID 不變，熱門度不受影響)
+    讀取與改寫之間使用者若剛好儲存，新課表會被覆蓋，請在離峰時段執行
+    """
+    from table_scan import iter_table_rows
+
+    stats = {'rows': 0, 'migrated': 0, 'bytes_before': 0, 'bytes_after': 0}
+    for row in iter_table_rows(client, 'schedules', 'user_id, schedule_data, flexible_courses'):
+        schedule_data, flexible_courses = compact_schedule(row.get('schedule_data'), row.get('flexible_courses'))
+        before = len(json.dumps([row.get('schedule_data'), row.get('flexible_courses')], ensure_ascii=False))
+        after = len(json.dumps([schedule_data, flexible_courses], ensure_ascii=False))
+        stats['rows'] += 1
+        stats['bytes_before'] += before
+        stats['bytes_after'] += after
+        if [schedule_data, flexible_courses] != [row.get('schedule_data'), row.get('flexible_courses')]:
+            stats['migrated'] += 1
+            if not dry_run:
+                client.table('schedules').update({
+                    'schedule_data': schedule_data, 'flexible_courses': flexible_courses,
+                }).eq('user_id', row['user_id']).execute()
+    return stats
+
+
+if __name__ == '__main__':
+    if '--migrate' not in sys.argv[1:]:
+        print("用法: python schedule_format.py --migrate [--dry-run]")
+        sys.exit(1)
+
+    import os
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        print("FATAL: SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
+        sys.exit(1)
+
+    dry_run = '--dry-run' in sys.argv[1:]
+    print("開始轉換課表為精簡格式..." + (" (dry run)" if dry_run else ""))
+    result = migrate_schedules(create_client(url, key), dry_run=dry_run)
+    print(f"✔ 完成：{result['rows']} 份課表，{result['migrated']} 份{'可' if dry_run else '已'}轉換，"
+          f"{result['bytes_before'] / 1e6:.1f} MB => {result['bytes_after'] / 1e6:.1f} MB")
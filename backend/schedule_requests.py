@@ -0,0 +1,113 @@
+# backend/schedule_requests.py
+"""
+課表相關端點的請求解析、驗證與回應內容
+
+同步模式 (app.py) 與 async 模式 (asgi.py) 的端點只負責 I/O：讀取請求、查詢 / 寫入資料庫、輸出回應。
+參數檢查、舊版前端格式相容、增量操作與版本檢查、衝堂分類、畢業進度的回應內容都集中在這裡，
+兩種模式的行為不會各自演變。
+
+錯誤以 RequestError 拋出，端點統一轉成 (e.body(), e.status) 回應。
+"""
+from catalog import get_catalog
+from graduation import get_requirement_index, compute_progress, CLASS_TYPES
+from schedule_format import apply_schedule_ops, ScheduleOpError
+from timeslots import schedule_masks
+
+
+class RequestError(Exception):
+    """請求無法處理；status 為 HTTP 狀態碼，extra 會一併放進錯誤回應"""
+
+    def __init__(self, message: str, status: int = 400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+    def body(self) -> dict:
+        return {"error": str(self), **self.extra}
+
+
+def require_user_id(user_id) -> str:
+    if not user_id:
+        raise RequestError("User ID is required")
+    return user_id
+
+
+# ───────── /api/schedule ─────────
+def parse_save_body(data) -> tuple:
+    """POST body => (schedule_data, flexible_courses)；兼容舊版前端 (直接傳 schedule_data 物件)"""
+    if not isinstance(data, dict):
+        raise RequestError("Request body must be a JSON object")
+    if 'schedule_data' not in data and 'flexible_courses' not in data:
+        return data, []
+    return data.get('schedule_data', {}), data.get('flexible_courses', [])
+
+
+def parse_patch_body(data) -> tuple:
+    """PATCH body => (base_version, ops)"""
+    base_version = data.get('base_version') if isinstance(data, dict) else None
+    if not isinstance(base_version, int) or isinstance(base_version, bool) or not isinstance(data.get('ops'), list):
+        raise RequestError("base_version (integer) and ops (list) are required")
+    return base_version, data['ops']
+
+
+def patched_schedule(schedule: dict, base_version: int, ops: list) -> tuple:
+    """
+    在目前的課表 (get_user_schedule 的結果，版本已與資料庫確認) 上套用增量操作
+    => 新的 (schedule_data, flexible_courses)；版本不符時回 409，操作無法套用時回 400
+    """
+    if schedule['version'] != base_version:
+        raise RequestError("Schedule version conflict", 409, version=schedule['version'])
+    try:
+        return apply_schedule_ops(schedule['schedule_data'], schedule['flexible_courses'], ops)
+    except ScheduleOpError as e:
+        raise RequestError(str(e)) from e
+
+
+def saved_body(saved: dict) -> dict:
+    return {"success": True, "action": saved['action'], "data": saved['data'], "version": saved.get('version')}
+
+
+def queued_body(pending_row: dict) -> dict:
+    return {"success": True, "action": "queued", "data": pending_row}
+
+
+def patched_body(saved: dict) -> dict:
+    return {"success": True, "action": saved['action'], "version": saved['version']}
+
+
+# ───────── /api/schedule/conflicts ─────────
+def conflicts_schedule_data(data, user_id):
+    """body 中的 schedule_data；未提供時回傳 None，由端點以 user_id 讀取已儲存的課表"""
+    schedule_data = data.get('schedule_data') if isinstance(data, dict) else None
+    if schedule_data is None and not user_id:
+        raise RequestError("schedule_data or user_id is required")
+    return schedule_data
+
+
+def conflicts_body(schedule_data) -> dict:
+    if not isinstance(schedule_data, dict):
+        raise RequestError("schedule_data must be an object")
+    occupied, own_masks = schedule_masks(schedule_data)
+    return get_catalog().classify_conflicts(occupied, own_masks)
+
+
+# ───────── /api/graduation/progress ─────────
+def parse_progress_params(params) -> dict:
+    """查詢參數 => {"user_id", "dept_id", "class", "year", "requirements"}；year 預設為該系所最新學年"""
+    user_id, dept_id, class_type = params.get('user_id'), params.get('dept_id'), params.get('class', 'B')
+    if not user_id or not dept_id:
+        raise RequestError("user_id and dept_id are required")
+    if class_type not in CLASS_TYPES:
+        raise RequestError(f"class must be one of {', '.join(CLASS_TYPES)}")
+
+    index = get_requirement_index()
+    year = params.get('year') or index.latest_year(dept_id, class_type)
+    requirements = index.get(year, dept_id, class_type) if year else None
+    if not requirements:
+        raise RequestError("No required course data for this department and class", 404)
+    return {"user_id": user_id, "dept_id": dept_id, "class": class_type, "year": year, "requirements": requirements}
+
+
+def progress_body(query: dict, schedule: dict) -> dict:
+    progress = compute_progress(query['requirements'], schedule.get('schedule_data'), schedule.get('flexible_courses'))
+    return {"year": query['year'], "dept_id": query['dept_id'], "class": query['class'], **progress}
@@ -0,0 +1,304 @@
+# backend/schedule_store.py
+"""
+課表讀寫
+
+- save_schedule(): 呼叫 RPC save_schedule (見 sql/003_save_schedule.sql)，
+  一次往返完成以 user_id upsert 與課程熱門度增量；課表先轉為精簡格式再寫入 (見 schedule_format.py)，
+  回傳的資料列已還原為完整課程資料。帶 base_version 時只在資料庫版本相同時寫入 (sql/004_schedule_version.sql)，
+  否則拋出 ScheduleVersionConflict
+- ScheduleWriteBuffer: 選用的 write-behind 緩衝。前端每點一次加 / 退選就儲存一次，
+  同一使用者在 SCHEDULE_WRITE_BEHIND_SECONDS 秒內的連續儲存只保留最後一份，合併成一次寫入；
+  背景執行緒定時寫出，程式結束 (atexit) 時全部寫出
+- ScheduleCache: 依 user_id 的 LRU / TTL 讀取快取，保存已序列化的回應與 ETag (見 response_cache.py)；
+  POST 成功後直接寫入新課表。命中 (含回 304) 時不查資料庫
+- ScheduleVersionBoard: 同一台主機上所有 worker 共用的課表變更計數 (記憶體映射檔)，跨 worker 的失效訊號。
+  寫入課表後把該使用者的計數 +1，其他 worker 的快取項目發現計數改變就重新讀取，不會回傳舊課表或舊 ETag 的 304
+- pending_schedule() / schedule_query() / schedule_from_rows(): 讀取課表的共用步驟；
+  app.py (同步) 與 asgi.py (async) 的 get_user_schedule 只負責執行查詢
+
+緩衝存在各 worker process 的記憶體中：同一個 worker 的 GET 會讀到尚未寫出的課表，
+其他 worker 在緩衝時間內可能讀到舊資料，因此預設關閉 (0)，只在選課尖峰時開啟。
+讀取快取同樣在各 worker 中；變更計數只在同一台主機內共用，多台主機部署時
+其他主機最多在 SCHEDULE_CACHE_TTL_SECONDS 秒內讀到舊課表，需要時調低此值。
+"""
+import os
+import mmap
+import asyncio
+import time
+import zlib
+import atexit
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows 開發環境：只有單一 process，以執行緒鎖即可
+    fcntl = None
+
+from response_cache import CachedPayload
+from schedule_format import compact_schedule, hydrate_row
+from schedule_requests import RequestError
+
+SCHEDULE_WRITE_BEHIND_SECONDS = float(os.environ.get("SCHEDULE_WRITE_BEHIND_SECONDS", "0"))
+SCHEDULE_CACHE_TTL_SECONDS = float(os.environ.get("SCHEDULE_CACHE_TTL_SECONDS", "60"))
+SCHEDULE_CACHE_MAX_ENTRIES = int(os.environ.get("SCHEDULE_CACHE_MAX_ENTRIES", "5000"))
+SCHEDULE_VERSION_BOARD_PATH = os.environ.get(
+    "SCHEDULE_VERSION_BOARD_PATH", os.path.join(tempfile.gettempdir(), "ncnu_schedule_versions.bin")
+)
+SCHEDULE_VERSION_BOARD_SLOTS = 1 << 16
+SCHEDULE_COLUMNS = 'schedule_data, flexible_courses, version'
+
+
+class ScheduleVersionConflict(RequestError):
+    """base_version 與資料庫中的版本不同 (回傳 409)；current_version 為資料庫目前的版本"""
+
+    def __init__(self, current_version: int):
+        super().__init__("Schedule version conflict", 409, version=current_version)
+        self.current_version = current_version
+
+
+# ───────── 讀取 (同步與 async 共用，呼叫端只負責 execute) ─────────
+def pending_schedule(buffer, user_id: str):
+    """write-behind 緩衝中尚未寫出的課表 => (課表, CachedPayload)；沒有版本號 (version 為 None)"""
+    pending = buffer.get(user_id) if buffer is not None else None
+    if pending is None:
+        return None
+    schedule = {'schedule_data': pending[0], 'flexible_courses': pending[1], 'version': None}
+    return schedule, CachedPayload.from_object(schedule)
+
+
+def schedule_query(client, user_id: str):
+    """單一使用者課表的查詢 (尚未 execute)"""
+    return client.table('schedules').select(SCHEDULE_COLUMNS).eq('user_id', user_id).limit(1)
+
+
+def schedule_from_rows(rows) -> dict:
+    """查詢結果 => 回應用的課表 (精簡格式已還原)；還沒有課表時為空課表、版本 0"""
+    row = hydrate_row(rows[0]) if rows else {}
+    return {
+        'schedule_data': row.get('schedule_data') or {},
+        'flexible_courses': row.get('flexible_courses') or [],
+        'version': row.get('version') or 0,
+    }
+
+
+# ───────── 寫入 ─────────
+def _rpc_params(user_id: str, schedule_data, flexible_courses, base_version) -> dict:
+    schedule_data, flexible_courses = compact_schedule(schedule_data, flexible_courses)
+    return {
+        'p_user_id': user_id,
+        'p_schedule_data': schedule_data,
+        'p_flexible_courses': flexible_courses,
+        'p_base_version': base_version,
+    }
+
+
+def _saved_result(result: dict) -> dict:
+    if result.get('conflict'):
+        raise ScheduleVersionConflict(result.get('version') or 0)
+    return {**result, 'data': hydrate_row(result.get('data'))}
+
+
+def save_schedule(client, user_id: str, schedule_data, flexible_courses, base_version: int = None) -> dict:
+    """單次 RPC 儲存課表，回傳 {"action", "data", "hotness_changed", "version"}"""
+    params = _rpc_params(user_id, schedule_data, flexible_courses, base_version)
+    return _saved_result(client.rpc('save_schedule', params).execute().data)
+
+
+async def save_schedule_async(client, user_id: str, schedule_data, flexible_courses,
+                              base_version: int = None) -> dict:
+    """save_schedule 的 async 版本 (supabase AsyncClient，ASGI 模式使用)"""
+    # 精簡格式會查課程目錄 / 封存，第一次使用時從檔案載入，在執行緒中進行以免阻塞 event loop
+    params = await asyncio.to_thread(_rpc_params, user_id, schedule_data, flexible_courses, base_version)
+    return _saved_result((await client.rpc('save_schedule', params).execute()).data)
+
+
+class ScheduleWriteBuffer:
+    """依 user_id 合併短時間內的多次儲存；window 秒後由背景執行緒寫出最後一份"""
+
+    def __init__(self, writer, window_seconds: float, on_flushed=None):
+        self._writer = writer            # (user_id, schedule_data, flexible_courses) -> dict
+        self._on_flushed = on_flushed    # 寫出成功後的回呼 (user_id, result)
+        self.window_seconds = window_seconds
+        self._pending = {}               # user_id => (schedule_data, flexible_courses, 到期時間)
+        self._inflight = {}              # 正在寫出的項目，寫完前 GET 仍要讀得到
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="schedule-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, user_id: str, schedule_data, flexible_courses) -> dict:
+        """排入緩衝；同一使用者已有待寫資料時取代內容但不延後寫出時間"""
+        with self._lock:
+            existing = self._pending.get(user_id)
+            due = existing[2] if existing else time.monotonic() + self.window_seconds
+            self._pending[user_id] = (schedule_data, flexible_courses, due)
+        self._wakeup.set()
+        return {"user_id": user_id, "schedule_data": schedule_data, "flexible_courses": flexible_courses}
+
+    def get(self, user_id: str):
+        """尚未寫出的課表 (schedule_data, flexible_courses)，沒有則回傳 None"""
+        with self._lock:
+            pending = self._pending.get(user_id) or self._inflight.get(user_id)
+        return pending[:2] if pending else None
+
+    def flush(self, only_due: bool = False, user_ids=None):
+        """寫出待寫資料；only_due 時只寫出已到期的，user_ids 指定時只寫出這些使用者。寫入失敗的項目放回緩衝下次重試"""
+        now = time.monotonic()
+        with self._lock:
+            ready = {
+                user_id: entry for user_id, entry in self._pending.items()
+                if (not only_due or entry[2] <= now) and (user_ids is None or user_id in user_ids)
+            }
+            for user_id in ready:
+                del self._pending[user_id]
+            self._inflight.update(ready)
+
+        for user_id, (schedule_data, flexible_courses, due) in ready.items():
+            try:
+                result = self._writer(user_id, schedule_data, flexible_courses)
+            except Exception as e:
+                print(f"Warning: Write-behind save failed for user {user_id}, will retry. Error: {e}")
+                with self._lock:
+                    self._inflight.pop(user_id, None)
+                    # 期間若已有更新的課表，以新的為準
+                    self._pending.setdefault(user_id, (schedule_data, flexible_courses, now + self.window_seconds))
+                continue
+            with self._lock:
+                self._inflight.pop(user_id, None)
+            if self._on_flushed:
+                self._on_flushed(user_id, result)
+
+    def _next_due(self):
+        with self._lock:
+            return min((entry[2] for entry in self._pending.values()), default=None)
+
+    def _run(self):
+        while not self._stopped:
+            due = self._next_due()
+            timeout = None if due is None else max(0.0, due - time.monotonic())
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            self.flush(only_due=True)
+
+    def close(self):
+        """停止背景執行緒並寫出所有待寫資料"""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+class ScheduleVersionBoard:
+    """
+    user_id 雜湊到固定數量的 64 位元計數；讀取只是一次記憶體存取。
+    雜湊碰撞只會讓另一位使用者多讀一次資料庫，不會回傳舊課表。
+    記憶體映射檔無法建立時退回 process 內的計數 (只有同一個 worker 內的失效)
+    """
+    SLOT_FORMAT = '<Q'
+
+    def __init__(self, path: str = SCHEDULE_VERSION_BOARD_PATH, slots: int = SCHEDULE_VERSION_BOARD_SLOTS):
+        self.slots = slots
+        self._slot_size = struct.calcsize(self.SLOT_FORMAT)
+        self._lock = threading.Lock()
+        self._fd = None
+        size = slots * self._slot_size
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            # 多個 worker 同時建立時都 truncate 成相同大小，已寫入的計數不受影響
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._counters = mmap.mmap(fd, size)
+            self._fd = fd
+        except (OSError, ValueError) as e:
+            print(f"Warning: Schedule version board {path} unavailable, invalidation stays within this worker. "
+                  f"Error: {e}")
+            self._counters = bytearray(size)
+
+    def _offset(self, user_id: str) -> int:
+        # 不能用 hash()：每個 process 的字串雜湊種子不同
+        return zlib.crc32(str(user_id).encode('utf-8')) % self.slots * self._slot_size
+
+    def generation(self, user_id: str) -> int:
+        return struct.unpack_from(self.SLOT_FORMAT, self._counters, self._offset(user_id))[0]
+
+    def bump(self, user_id: str):
+        """計數 +1；以檔案鎖保護讀取-寫回，多個 worker 同時寫入不會少算"""
+        offset = self._offset(user_id)
+        with self._lock:
+            locked = fcntl is not None and self._fd is not None
+            if locked:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, self._slot_size, offset)
+            try:
+                value = struct.unpack_from(self.SLOT_FORMAT, self._counters, offset)[0]
+                struct.pack_into(self.SLOT_FORMAT, self._counters, offset, value + 1)
+            finally:
+                if locked:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, self._slot_size, offset)
+
+
+class ScheduleCache:
+    """
+    user_id => (到期時間, 變更計數, 課表, CachedPayload)，超過 max_entries 時淘汰最久未使用的項目；ttl 為 0 時不快取。
+    項目記下放入時的變更計數 (ScheduleVersionBoard)，任一 worker 寫入後計數改變，命中檢查即失效。
+    讀取資料庫前先以 generation() 取得計數再查詢，查詢期間其他 worker 寫入時，放入的項目會在下次命中時失效
+    """
+
+    def __init__(self, ttl_seconds: float = SCHEDULE_CACHE_TTL_SECONDS,
+                 max_entries: int = SCHEDULE_CACHE_MAX_ENTRIES, board: ScheduleVersionBoard = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.board = board if board is not None else ScheduleVersionBoard()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def generation(self, user_id: str) -> int:
+        return self.board.generation(user_id)
+
+    def get(self, user_id: str):
+        """回傳 (課表, CachedPayload)；未快取、已過期或其他 worker 已寫入時回傳 None"""
+        generation = self.board.generation(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic() or entry[1] != generation:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[2], entry[3]
+
+    def put(self, user_id: str, schedule: dict, generation: int) -> CachedPayload:
+        """
+        序列化並快取一份課表 ({'schedule_data', 'flexible_courses', 'version'})，回傳 CachedPayload
+        generation 為讀取資料庫之前的 generation(user_id)
+        """
+        payload = CachedPayload.from_object(schedule)
+        if self.ttl_seconds <= 0:
+            return payload
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, generation, schedule, payload)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return payload
+
+    def saved(self, user_id: str, schedule: dict) -> CachedPayload:
+        """課表已寫入資料庫：通知其他 worker 失效，再以寫入結果更新本 worker 的快取"""
+        self.board.bump(user_id)
+        return self.put(user_id, schedule, self.board.generation(user_id))
+
+    def invalidate(self, user_id: str):
+        """課表可能已改變 (排入緩衝、寫入結果不明)：所有 worker 的快取項目都失效"""
+        self.board.bump(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,38 @@
+-- ===========================================
+-- 課程熱門度計數表 (course_hotness)
+-- ===========================================
+-- 由 /api/schedule POST 依「新舊課表的課程差集」增量維護，
+-- /api/courses/hotness 直接讀取此表，不再全表掃描 schedules。
+-- 計數若有漂移，執行 `python hotness.py --reconcile` 全量重建。
+-- 請在 Supabase SQL Editor 執行本檔案。
+
+CREATE TABLE IF NOT EXISTS course_hotness (
+    course_id TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- 增量更新：deltas 形如 {"992062": 1, "410096": -1}
+-- 以單一語句原子地累加，多個 gunicorn worker 同時寫入也不會互相覆蓋
+CREATE OR REPLACE FUNCTION apply_course_hotness_deltas(deltas JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO course_hotness AS h (course_id, count, updated_at)
+    SELECT key, GREATEST(value::INTEGER, 0), now()
+    FROM jsonb_each_text(deltas)
+    ON CONFLICT (course_id) DO UPDATE
+        SET count = GREATEST(h.count + (deltas ->> EXCLUDED.course_id)::INTEGER, 0),
+            updated_at = now();
+$$;
+
+-- 全量重建：counts 形如 {"992062": 35, ...}，在同一交易中取代整張表
+CREATE OR REPLACE FUNCTION replace_course_hotness(counts JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    DELETE FROM course_hotness WHERE TRUE;
+    INSERT INTO course_hotness (course_id, count, updated_at)
+    SELECT key, value::INTEGER, now()
+    FROM jsonb_each_text(counts);
+$$;
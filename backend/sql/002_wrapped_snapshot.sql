@@ -0,0 +1,22 @@
+-- ===========================================
+-- Semester Wrapped 快照 (wrapped_stats / wrapped_snapshot_meta)
+-- ===========================================
+-- 由 `python wrapped.py --refresh` 批次產生（每日排程），
+-- /api/wrapped/<user_google_id> 直接讀取；快照後才註冊的使用者改走即時計算。
+-- 請在 Supabase SQL Editor 執行本檔案。
+
+-- 每位使用者預先算好的 wrapped 回應
+CREATE TABLE IF NOT EXISTS wrapped_stats (
+    user_id TEXT PRIMARY KEY,
+    payload JSONB NOT NULL,
+    generated_at TIMESTAMPTZ NOT NULL
+);
+
+-- 全校學分分佈（排序後的直方圖），供即時計算時以 bisect 查百分位
+CREATE TABLE IF NOT EXISTS wrapped_snapshot_meta (
+    id INTEGER PRIMARY KEY,
+    generated_at TIMESTAMPTZ NOT NULL,
+    credit_values JSONB NOT NULL DEFAULT '[]'::jsonb,
+    credit_counts JSONB NOT NULL DEFAULT '[]'::jsonb,
+    user_count INTEGER NOT NULL DEFAULT 0
+);
@@ -0,0 +1,69 @@
+-- ===========================================
+-- 單次往返儲存課表 (save_schedule)
+-- ===========================================
+-- /api/schedule POST 原本要 select → update/insert → 熱門度 RPC 三次往返，
+-- 改為呼叫 save_schedule()：在同一個交易中以 user_id upsert 課表、
+-- 比對新舊課程 ID 並累加 course_hotness (見 001_course_hotness.sql)。
+-- 請在 001 之後於 Supabase SQL Editor 執行本檔案。
+
+-- upsert 的衝突目標；若 schedules 已有同一 user_id 的重複資料，需先清理才能建立
+CREATE UNIQUE INDEX IF NOT EXISTS schedules_user_id_key ON schedules (user_id);
+
+-- 一份課表中不重複的課程 ID (固定課程 + 彈性課程)，與 hotness.extract_course_ids 相同
+CREATE OR REPLACE FUNCTION schedule_course_ids(schedule_data JSONB, flexible_courses JSONB)
+RETURNS SETOF TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT value ->> 'course_id'
+    FROM jsonb_each(CASE WHEN jsonb_typeof(schedule_data) = 'object' THEN schedule_data ELSE '{}'::jsonb END)
+    WHERE jsonb_typeof(value) = 'object' AND value ->> 'course_id' IS NOT NULL
+    UNION
+    SELECT value ->> 'course_id'
+    FROM jsonb_array_elements(CASE WHEN jsonb_typeof(flexible_courses) = 'array' THEN flexible_courses ELSE '[]'::jsonb END)
+    WHERE jsonb_typeof(value) = 'object' AND value ->> 'course_id' IS NOT NULL;
+$$;
+
+-- 回傳 {"action": "inserted" | "updated", "data": 新資料列, "hotness_changed": bool}
+CREATE OR REPLACE FUNCTION save_schedule(p_user_id TEXT, p_schedule_data JSONB, p_flexible_courses JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    old_row schedules%ROWTYPE;
+    new_row schedules%ROWTYPE;
+    deltas JSONB;
+BEGIN
+    -- 鎖住舊資料列，同一使用者的並行儲存依序計算熱門度增量
+    SELECT * INTO old_row FROM schedules WHERE user_id = p_user_id FOR UPDATE;
+
+    INSERT INTO schedules AS s (user_id, schedule_data, flexible_courses)
+    VALUES (p_user_id, COALESCE(p_schedule_data, '{}'::jsonb), COALESCE(p_flexible_courses, '[]'::jsonb))
+    ON CONFLICT (user_id) DO UPDATE
+        SET schedule_data = EXCLUDED.schedule_data,
+            flexible_courses = EXCLUDED.flexible_courses
+    RETURNING * INTO new_row;
+
+    WITH old_ids AS (
+        SELECT schedule_course_ids(old_row.schedule_data, old_row.flexible_courses) AS course_id
+    ), new_ids AS (
+        SELECT schedule_course_ids(new_row.schedule_data, new_row.flexible_courses) AS course_id
+    )
+    SELECT jsonb_object_agg(course_id, delta) INTO deltas
+    FROM (
+        SELECT course_id, 1 AS delta FROM (SELECT course_id FROM new_ids EXCEPT SELECT course_id FROM old_ids) AS added
+        UNION ALL
+        SELECT course_id, -1 AS delta FROM (SELECT course_id FROM old_ids EXCEPT SELECT course_id FROM new_ids) AS removed
+    ) AS changes;
+
+    IF deltas IS NOT NULL THEN
+        PERFORM apply_course_hotness_deltas(deltas);
+    END IF;
+
+    RETURN jsonb_build_object(
+        'action', CASE WHEN old_row.user_id IS NULL THEN 'inserted' ELSE 'updated' END,
+        'data', to_jsonb(new_row),
+        'hotness_changed', deltas IS NOT NULL
+    );
+END;
+$$;
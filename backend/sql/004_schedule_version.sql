@@ -0,0 +1,72 @@
+-- ===========================================
+-- 課表版本號 (樂觀並行控制)
+-- ===========================================
+-- 每次儲存課表 version + 1。PATCH /api/schedule 帶著讀取時的版本號 (base_version) 送出增量操作，
+-- 版本號與資料庫不同 (例如另一個分頁已經儲存過) 時拒絕寫入，避免互相覆蓋。
+-- 請在 003 之後於 Supabase SQL Editor 執行本檔案，並在部署新版後端之前執行。
+-- 效能測試的替身 bench/fake_postgrest.py 以 Python 重現本函式，修改時請一併更新。
+
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+
+-- 新增 p_base_version 參數；先移除三個參數的舊版本，避免 PostgREST 無法選擇多載函式
+DROP FUNCTION IF EXISTS save_schedule(TEXT, JSONB, JSONB);
+
+-- p_base_version 為 NULL 時無條件寫入 (POST)；否則只有資料庫版本相同時才寫入 (PATCH)
+-- 回傳 {"action", "data", "hotness_changed", "version"}，版本不符時回傳 {"conflict": true, "version": 目前版本}
+CREATE OR REPLACE FUNCTION save_schedule(
+    p_user_id TEXT, p_schedule_data JSONB, p_flexible_courses JSONB, p_base_version BIGINT DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    old_row schedules%ROWTYPE;
+    new_row schedules%ROWTYPE;
+    deltas JSONB;
+BEGIN
+    -- 鎖住舊資料列，同一使用者的並行儲存依序計算熱門度增量與版本號
+    SELECT * INTO old_row FROM schedules WHERE user_id = p_user_id FOR UPDATE;
+
+    IF p_base_version IS NOT NULL AND COALESCE(old_row.version, 0) <> p_base_version THEN
+        RETURN jsonb_build_object('conflict', true, 'version', COALESCE(old_row.version, 0));
+    END IF;
+
+    INSERT INTO schedules AS s (user_id, schedule_data, flexible_courses, version)
+    VALUES (p_user_id, COALESCE(p_schedule_data, '{}'::jsonb), COALESCE(p_flexible_courses, '[]'::jsonb), 1)
+    ON CONFLICT (user_id) DO UPDATE
+        SET schedule_data = EXCLUDED.schedule_data,
+            flexible_courses = EXCLUDED.flexible_courses,
+            version = s.version + 1
+        -- 兩個請求同時建立第一份課表時，後到的一方在這裡發現版本已改變
+        WHERE p_base_version IS NULL OR s.version = p_base_version
+    RETURNING * INTO new_row;
+
+    IF new_row.user_id IS NULL THEN
+        SELECT * INTO old_row FROM schedules WHERE user_id = p_user_id;
+        RETURN jsonb_build_object('conflict', true, 'version', old_row.version);
+    END IF;
+
+    WITH old_ids AS (
+        SELECT schedule_course_ids(old_row.schedule_data, old_row.flexible_courses) AS course_id
+    ), new_ids AS (
+        SELECT schedule_course_ids(new_row.schedule_data, new_row.flexible_courses) AS course_id
+    )
+    SELECT jsonb_object_agg(course_id, delta) INTO deltas
+    FROM (
+        SELECT course_id, 1 AS delta FROM (SELECT course_id FROM new_ids EXCEPT SELECT course_id FROM old_ids) AS added
+        UNION ALL
+        SELECT course_id, -1 AS delta FROM (SELECT course_id FROM old_ids EXCEPT SELECT course_id FROM new_ids) AS removed
+    ) AS changes;
+
+    IF deltas IS NOT NULL THEN
+        PERFORM apply_course_hotness_deltas(deltas);
+    END IF;
+
+    RETURN jsonb_build_object(
+        'action', CASE WHEN old_row.user_id IS NULL THEN 'inserted' ELSE 'updated' END,
+        'data', to_jsonb(new_row),
+        'hotness_changed', deltas IS NOT NULL,
+        'version', new_row.version
+    );
+END;
+$$;
@@ -0,0 +1,281 @@
+# backend/static_data.py
+"""
+靜態資料 (NCNU API + Google 行事曆) 的載入與背景更新
+
+- 第一次請求時載入一次 (single-flight：同時進來的請求只有一個會真的去抓，其餘等待結果)，
+  之後由背景執行緒每 STATIC_DATA_TTL_SECONDS 秒重新抓取
+- 四個資料來源平行抓取；新資料在旁邊建好後才整批替換 (stale-while-revalidate)，
+  請求永遠讀到最後一份成功的資料；單一資料來源抓取失敗時保留舊資料
+- 每次成功更新後寫入磁碟快照；冷啟動時優先從快照 (或 frontend/public/data 的種子檔) 載入，
+  不必等學校 API，再於背景更新
+"""
+import os
+import json
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+
+import requests
+
+from calendar_index import CalendarIndex
+from metrics import timed_upstream
+from calendar_ingest import CalendarIngestor
+
+# 上游位址可用環境變數改指向本機替身 (ncnu_api_stub.py，見 bench/load_suite.py)
+NCNU_API_BASE = os.environ.get("NCNU_API_BASE", "https://api.ncnu.edu.tw/API/get.aspx")
+NCNU_API_URLS = {
+    'unitId_ncnu': f'{NCNU_API_BASE}?json=unitId_ncnu',
+    'contact_ncnu': f'{NCNU_API_BASE}?json=contact_ncnu',
+    'course_deptId': f'{NCNU_API_BASE}?json=course_deptId'
+}
+CALENDAR_ICS_URL = os.environ.get(
+    "CALENDAR_ICS_URL", "https://www.google.com/calendar/ical/curricul%40mail.ncnu.edu.tw/public/basic.ics"
+)
+CALENDAR_DATASET = 'calendar_events'
+CONTACTS_DATASET = 'contacts_with_unit_web'  # 衍生資料：聯絡資訊併入單位網址
+CALENDAR_INDEX = 'calendar_index'  # 衍生資料：行事曆日期索引
+
+STATIC_DATA_TTL_SECONDS = int(os.environ.get("STATIC_DATA_TTL_SECONDS", "21600"))  # 預設 6 小時
+FETCH_TIMEOUT_SECONDS = 15
+
+BACKEND_DIR = Path(__file__).parent
+SNAPSHOT_PATH = Path(os.environ.get("STATIC_DATA_SNAPSHOT_PATH", BACKEND_DIR / ".cache" / "static_data_snapshot.json"))
+# 沒有快照時，以前端打包的同源資料作為種子
+SEED_DATA_DIR = Path(os.environ.get("STATIC_DATA_SEED_DIR", BACKEND_DIR.parent / "frontend" / "public" / "data"))
+SEED_FILES = {
+    'unitId_ncnu': '行政教學單位代碼API.json',
+    'contact_ncnu': '校園聯絡資訊API.json',
+    'course_deptId': '開課單位代碼API.json',
+    CALENDAR_DATASET: 'calendar.ics',
+}
+SOURCE_DATASETS = list(NCNU_API_URLS) + [CALENDAR_DATASET]
+
+calendar_ingestor = CalendarIngestor()
+
+
+def fetch_ncnu_dataset(data_url: str) -> list:
+    """抓取 NCNU API 並取出第一個 key 底下的 item 陣列"""
+    response = requests.get(data_url, timeout=FETCH_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    content = response.json()
+    data_key = list(content.keys())[0]
+    return content[data_key].get('item', [])
+
+
+def parse_calendar_events(ics_content: bytes) -> list:
+    """解析 ICS 內容為依開始時間排序的事件列表 (週期事件已展開，只重新解析有變動的 VEVENT)"""
+    return calendar_ingestor.ingest(ics_content)
+
+
+def fetch_calendar_events(ics_url: str = CALENDAR_ICS_URL) -> list:
+    response = requests.get(ics_url, timeout=FETCH_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return parse_calendar_events(response.content)
+
+
+def merge_contacts_with_units(contacts: list, unit_info: list) -> list:
+    """以單位中文名稱建立索引，一次 O(聯絡人 + 單位) 併入單位網址；產生新的 dict，不修改原始資料"""
+    unit_by_name = {}
+    for unit in unit_info:
+        # 與原本 next(...) 相同：同名單位以第一筆為準
+        unit_by_name.setdefault(unit.get('中文名稱'), unit)
+
+    merged = []
+    for contact in contacts:
+        matching_unit = unit_by_name.get(contact.get('title'))
+        if matching_unit:
+            contact = {**contact, 'web': matching_unit.get('網站網址', contact.get('web'))}
+        merged.append(contact)
+    return merged
+
+
+def build_derived_datasets(data: dict):
+    """由原始資料建立衍生資料，在新資料生效前呼叫 (只在載入時計算一次)"""
+    data[CONTACTS_DATASET] = merge_contacts_with_units(data.get('contact_ncnu') or [], data.get('unitId_ncnu') or [])
+    data[CALENDAR_INDEX] = CalendarIndex(data.get(CALENDAR_DATASET) or [])
+
+
+def load_snapshot(path: Path = SNAPSHOT_PATH):
+    """讀取磁碟快照，回傳 (資料, 載入時間)；不存在或損毀時回傳 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        return snapshot['data'], snapshot['loaded_at']
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Warning: Failed to read static data snapshot {path}. Error: {e}")
+        return None
+
+
+def save_snapshot(data: dict, loaded_at: dict, path: Path = SNAPSHOT_PATH):
+    """先寫暫存檔再 rename，避免其他 worker 讀到寫一半的檔案"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'saved_at': time.time(),
+            'data': {name: data[name] for name in SOURCE_DATASETS if name in data},
+            'loaded_at': {name: loaded_at[name] for name in SOURCE_DATASETS if name in loaded_at},
+        }, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_seed_files(seed_dir: Path = SEED_DATA_DIR):
+    """從 frontend/public/data 讀取種子資料，載入時間以檔案 mtime 計"""
+    data, loaded_at = {}, {}
+    for name, filename in SEED_FILES.items():
+        file_path = seed_dir / filename
+        try:
+            if name == CALENDAR_DATASET:
+                data[name] = parse_calendar_events(file_path.read_bytes())
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = json.load(f)
+                data[name] = content[list(content.keys())[0]].get('item', [])
+            loaded_at[name] = file_path.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            print(f"Warning: Failed to read seed file {file_path}. Error: {e}")
+    if not data:
+        return None
+    return data, loaded_at
+
+
+class StaticDataStore:
+    """持有目前生效的靜態資料；讀取不加鎖，更新時整批替換參照"""
+
+    def __init__(self, ttl_seconds: int = STATIC_DATA_TTL_SECONDS, snapshot_path: Path = SNAPSHOT_PATH,
+                 seed_dir: Path = SEED_DATA_DIR):
+        self.ttl_seconds = ttl_seconds
+        self.snapshot_path = snapshot_path
+        self.seed_dir = seed_dir
+        # (資料, 各資料集最後成功載入時間, 版本號) 作為一個 tuple 一起替換，讀者不會看到一半新一半舊
+        self._state = ({}, {}, 0)
+        self._loaded = threading.Event()
+        self._load_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresher = None
+
+    def get(self, name: str, default=None):
+        return self._state[0].get(name, default)
+
+    def get_with_version(self, name: str, default=None):
+        """回傳 (資料, 版本號)；版本號在每次資料替換時遞增，可作為衍生快取的失效依據"""
+        data, _, version = self._state
+        return data.get(name, default), version
+
+    def _fetch_all(self, data: dict, loaded_at: dict) -> int:
+        """平行抓取所有資料來源，寫入傳入的 (尚未生效的) dict，回傳成功的來源數"""
+        sources = {key: partial(fetch_ncnu_dataset, data_url) for key, data_url in NCNU_API_URLS.items()}
+        sources[CALENDAR_DATASET] = fetch_calendar_events
+        succeeded = 0
+
+        def timed_fetch(name, fetch):
+            with timed_upstream(name):
+                return fetch()
+
+        with ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="static-data-fetch") as pool:
+            # 複製 context，首次載入時的抓取耗時會列入觸發它的請求明細
+            futures = {pool.submit(contextvars.copy_context().run, timed_fetch, name, fetch): name
+                       for name, fetch in sources.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    data[name] = future.result()
+                    loaded_at[name] = time.time()
+                    succeeded += 1
+                except Exception as e:
+                    print(f"Warning: Failed to fetch static data for '{name}'. Error: {e}")
+                    data.setdefault(name, [])
+        return succeeded
+
+    def refresh(self):
+        """在旁邊建立新資料後原子地替換；失敗的資料來源沿用上一份。同一時間只會有一個更新在跑"""
+        with self._refresh_lock:
+            current_data, current_loaded_at, version = self._state
+            new_data, new_loaded_at = dict(current_data), dict(current_loaded_at)
+            succeeded = self._fetch_all(new_data, new_loaded_at)
+            build_derived_datasets(new_data)
+            self._state = (new_data, new_loaded_at, version + 1)
+        if succeeded:
+            try:
+                save_snapshot(new_data, new_loaded_at, self.snapshot_path)
+            except Exception as e:
+                print(f"Warning: Failed to write static data snapshot. Error: {e}")
+
+    def _load_warm_start(self):
+        """冷啟動：磁碟快照優先，其次前端種子檔"""
+        warm = load_snapshot(self.snapshot_path)
+        if warm:
+            print(f"Static data warm-started from snapshot {self.snapshot_path}.")
+            return warm
+        warm = load_seed_files(self.seed_dir)
+        if warm:
+            print(f"Static data warm-started from seed files in {self.seed_dir}.")
+        return warm
+
+    def ensure_loaded(self):
+        """懶加載 (single-flight)：只有第一個請求負責載入，其他同時進來的請求等待它完成"""
+        if self._loaded.is_set():
+            return
+        with self._load_lock:
+            if self._loaded.is_set():
+                return
+            print("Static data not loaded yet. Loading now...")
+            warm = self._load_warm_start()
+            if warm:
+                build_derived_datasets(warm[0])
+                self._state = (*warm, self._state[2] + 1)
+                self._loaded.set()
+                # 磁碟資料可能已過時，立刻在背景抓一次新的
+                self.start_refresher(refresh_now=True)
+            else:
+                self.refresh()
+                self._loaded.set()
+                self.start_refresher()
+            print("Static data loading finished.")
+
+    def start_refresher(self, refresh_now: bool = False):
+        if self._refresher is not None:
+            return
+        if self.ttl_seconds <= 0 and not refresh_now:
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, args=(refresh_now,),
+                                           name="static-data-refresher", daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self, refresh_now: bool):
+        if refresh_now:
+            self._safe_refresh()
+        if self.ttl_seconds <= 0:
+            return
+        while True:
+            time.sleep(self.ttl_seconds)
+            self._safe_refresh()
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+            print("Static data refreshed in background.")
+        except Exception as e:
+            print(f"Warning: Background static data refresh failed. Error: {e}")
+
+    def dataset_status(self) -> dict:
+        """各資料集的筆數、最後成功載入時間與資料年齡 (秒)"""
+        data, loaded_at, _ = self._state
+        now = time.time()
+        status = {}
+        for name in SOURCE_DATASETS:
+            timestamp = loaded_at.get(name)
+            status[name] = {
+                "items": len(data.get(name) or []),
+                "loaded_at": datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None,
+                "age_seconds": round(now - timestamp, 1) if timestamp else None,
+            }
+        return status
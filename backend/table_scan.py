@@ -0,0 +1,41 @@
+# backend/table_scan.py
+"""
+分頁串流掃描 Supabase 資料表
+
+以 keyset pagination（`key > 上一頁最後一筆` + `ORDER BY key LIMIT n`）逐頁讀取，
+用 generator 逐筆產出資料列：記憶體只保留一頁，且不受 PostgREST 單次 1000 筆的上限影響。
+"""
+import os
+
+SCAN_PAGE_SIZE = int(os.environ.get("SCAN_PAGE_SIZE", "500"))
+
+
+def iter_table_rows(client, table: str, columns: str, key_column: str = 'id',
+                    page_size: int = SCAN_PAGE_SIZE, apply_filters=None):
+    """
+    逐筆產出 `table` 的所有資料列
+
+    Args:
+        columns: 要查詢的欄位（逗號分隔）；若未包含 key_column 會自動補上
+        key_column: 用來分頁的唯一且可排序欄位
+        apply_filters: 可選，接收並回傳 query builder，用來附加 .eq()/.gt() 等條件
+    """
+    selected = [c.strip() for c in columns.split(',') if c.strip()]
+    if key_column not in selected:
+        selected.insert(0, key_column)
+    select_clause = ', '.join(selected)
+
+    last_key = None
+    while True:
+        query = client.table(table).select(select_clause)
+        if apply_filters is not None:
+            query = apply_filters(query)
+        if last_key is not None:
+            query = query.gt(key_column, last_key)
+        rows = query.order(key_column).limit(page_size).execute().data or []
+
+        yield from rows
+
+        if len(rows) < page_size:
+            return
+        last_key = rows[-1][key_column]
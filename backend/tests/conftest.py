@@ -0,0 +1,101 @@
+# backend/tests/conftest.py
+"""
+後端純函式的回歸測試 (不需要 Supabase 或網路)
+
+後端模組以同層 import 彼此 (from catalog import ...)，因此把 backend/ 加入 sys.path；
+在 backend/ 執行 python -m pytest -q。
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from catalog import CourseCatalog  # noqa: E402
+from course_archive import CourseArchive  # noqa: E402
+import schedule_format  # noqa: E402
+
+
+def make_course(course_id, course_class='0', time='', credit='2.0', year='114', semester='2', **fields) -> dict:
+    """與開課資訊 API 相同欄位的課程"""
+    return {
+        'faculty': '', 'year': year, 'semester': semester, 'department': '資工系',
+        'course_id': course_id, 'class': course_class, 'course_cname': f"課程{course_id}",
+        'course_ename': f"Course {course_id}", 'time': time, 'location': '科一 101',
+        'teacher': '王小明', 'division': '學士班', 'course_credit': credit,
+        'edepartment': '', 'eteacher': '', 'edivision': '', **fields,
+    }
+
+
+@pytest.fixture
+def catalog_courses() -> list:
+    return [
+        make_course('100001', '0', '1ab'),
+        make_course('100001', '1', '3cd'),
+        make_course('100002', '0', '1b', credit='3.0'),
+        make_course('100003', '0', '2ef'),
+        make_course('100004', '0', ''),  # 無固定時間
+    ]
+
+
+@pytest.fixture
+def catalog(catalog_courses) -> CourseCatalog:
+    return CourseCatalog(catalog_courses)
+
+
+@pytest.fixture
+def lookup(monkeypatch, catalog, tmp_path):
+    """精簡課表的查詢來源：目錄 = 本學期 (114-2)，封存 = 113-1 的一門舊課"""
+    archive = CourseArchive(tmp_path / 'archive')
+    archive.append('113', '1', [make_course('090001', 0, '4cd', credit=3, year='113', semester='1')])
+    monkeypatch.setattr(schedule_format, 'get_catalog', lambda: catalog)
+    monkeypatch.setattr(schedule_format, 'get_archive', lambda: archive)
+    return catalog, archive
+
+
+class FakeQuery:
+    """supabase query builder 的最小替身：select / eq / gt / order / limit / execute"""
+
+    def __init__(self, rows: list, calls: list):
+        self._rows, self._calls = rows, calls
+        self._filters, self._order, self._limit = [], None, None
+
+    def select(self, columns: str):
+        self._columns = [c.strip() for c in columns.split(',')]
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self._filters.append(lambda row: row.get(column) > value)
+        return self
+
+    def order(self, column):
+        self._order = column
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def execute(self):
+        self._calls.append(self)
+        rows = [row for row in self._rows if all(match(row) for match in self._filters)]
+        if self._order:
+            rows.sort(key=lambda row: row[self._order])
+        rows = rows[:self._limit] if self._limit is not None else rows
+        self.data = [{column: row.get(column) for column in self._columns} for row in rows]
+        return self
+
+
+class FakeClient:
+    """記憶體中的資料表 {table: [row, ...]}；calls 記錄每次 execute 的查詢"""
+
+    def __init__(self, tables: dict):
+        self.tables, self.calls = tables, []
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self.tables.setdefault(name, []), self.calls)
@@ -0,0 +1,35 @@
+# backend/tests/test_calendar_index.py
+from datetime import date
+
+from calendar_index import CalendarIndex, event_date_span
+
+EVENTS = [
+    {'summary': '期中考週', 'start': '2026-04-13', 'end': '2026-04-18'},
+    {'summary': '校務會議', 'start': '2026-04-15T14:00:00+08:00', 'end': '2026-04-15T16:00:00+08:00'},
+    # UTC 表示的台灣時間 4/16 07:00 - 4/17 00:00 (不含)，只涵蓋 4/16
+    {'summary': '跨日活動', 'start': '2026-04-15T23:00:00+00:00', 'end': '2026-04-16T16:00:00+00:00'},
+    {'summary': '壞資料', 'start': 'not a date'},
+    {'summary': '春假', 'start': '2026-04-20', 'end': '2026-04-21'},
+]
+
+
+def test_all_day_end_is_exclusive_and_timed_events_use_local_dates():
+    assert event_date_span(EVENTS[0]) == (date(2026, 4, 13), date(2026, 4, 17))
+    assert event_date_span(EVENTS[2]) == (date(2026, 4, 16), date(2026, 4, 16))
+    assert event_date_span({'start': '2026-04-20'}) == (date(2026, 4, 20), date(2026, 4, 20))
+    assert event_date_span(EVENTS[3]) is None
+
+
+def test_multi_day_events_appear_on_every_day():
+    index = CalendarIndex(EVENTS)
+    assert [e['summary'] for e in index.events_on(date(2026, 4, 13))] == ['期中考週']
+    assert [e['summary'] for e in index.events_on(date(2026, 4, 16))] == ['期中考週', '跨日活動']
+    assert index.events_on(date(2026, 4, 18)) == []
+
+
+def test_range_query_dedupes_and_keeps_order():
+    index = CalendarIndex(EVENTS)
+    summaries = [e['summary'] for e in index.events_between(date(2026, 4, 14), date(2026, 4, 20))]
+    assert summaries == ['期中考週', '校務會議', '跨日活動', '春假']
+    assert index.events_between(date(2026, 4, 18), date(2026, 4, 19)) == []
+    assert index.events_between(date(2026, 5, 1), date(2026, 4, 1)) == []
@@ -0,0 +1,78 @@
+# backend/tests/test_calendar_ingest.py
+from datetime import datetime, timedelta
+
+from calendar_index import CALENDAR_TIMEZONE
+from calendar_ingest import CalendarIngestor
+
+# 週期事件只在相對於今天的時間窗內展開，測試日期以下週一為基準
+MONDAY = (datetime.now(CALENDAR_TIMEZONE) + timedelta(days=7 - datetime.now(CALENDAR_TIMEZONE).weekday())).date()
+
+
+def _stamp(day, hour=9) -> str:
+    return f"{day.strftime('%Y%m%d')}T{hour:02d}0000"
+
+
+def _event(uid, summary, lines, last_modified='20240101T000000Z') -> str:
+    body = '\r\n'.join(lines)
+    return (f"BEGIN:VEVENT\r\nUID:{uid}\r\nDTSTAMP:20990101T000000Z\r\nLAST-MODIFIED:{last_modified}\r\n"
+            f"SUMMARY:{summary}\r\n{body}\r\nEND:VEVENT\r\n")
+
+
+def _calendar(*events) -> str:
+    return "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//test//EN\r\n" + ''.join(events) + "END:VCALENDAR\r\n"
+
+
+def _weekly(last_modified='20240101T000000Z', summary='週會') -> str:
+    return _event('weekly@test', summary, [
+        f"DTSTART;TZID=Asia/Taipei:{_stamp(MONDAY)}",
+        f"DTEND;TZID=Asia/Taipei:{_stamp(MONDAY, 10)}",
+        "RRULE:FREQ=WEEKLY;COUNT=4",
+        f"EXDATE;TZID=Asia/Taipei:{_stamp(MONDAY + timedelta(days=7))}",
+    ], last_modified)
+
+
+def _override() -> str:
+    # 第三次改到下午，並改名
+    third = MONDAY + timedelta(days=14)
+    return _event('weekly@test', '週會 (改時間)', [
+        f"RECURRENCE-ID;TZID=Asia/Taipei:{_stamp(third)}",
+        f"DTSTART;TZID=Asia/Taipei:{_stamp(third, 14)}",
+        f"DTEND;TZID=Asia/Taipei:{_stamp(third, 15)}",
+    ])
+
+
+def test_rrule_expansion_with_exdate_and_override():
+    events = CalendarIngestor().ingest(_calendar(_weekly(), _override()).encode('utf-8'))
+    assert [(event['summary'], event['start'][:16]) for event in events] == [
+        ('週會', f"{MONDAY.isoformat()}T09:00"),
+        ('週會 (改時間)', f"{(MONDAY + timedelta(days=14)).isoformat()}T14:00"),
+        ('週會', f"{(MONDAY + timedelta(days=21)).isoformat()}T09:00"),
+    ]
+
+
+def test_all_day_and_timed_events_sort_together():
+    all_day = _event('holiday@test', '放假', [
+        f"DTSTART;VALUE=DATE:{MONDAY.strftime('%Y%m%d')}",
+        f"DTEND;VALUE=DATE:{(MONDAY + timedelta(days=1)).strftime('%Y%m%d')}",
+    ])
+    events = CalendarIngestor().ingest(_calendar(_weekly(), all_day))
+    assert events[0] == {'summary': '放假', 'start': MONDAY.isoformat(),
+                         'end': (MONDAY + timedelta(days=1)).isoformat()}
+    assert events[1]['summary'] == '週會'
+
+
+def test_only_changed_events_are_reparsed():
+    ingestor = CalendarIngestor()
+    ingestor.ingest(_calendar(_weekly(), _override()))
+    assert ingestor.last_reparsed == 2
+    ingestor.ingest(_calendar(_weekly(), _override()))
+    assert ingestor.last_reparsed == 0
+    events = ingestor.ingest(_calendar(_weekly('20240202T000000Z', summary='週會改名'), _override()))
+    assert ingestor.last_reparsed == 1
+    assert events[0]['summary'] == '週會改名'
+
+
+def test_unparsable_event_is_skipped():
+    broken = _event('broken@test', '壞掉', [f"DTSTART;TZID=Asia/Taipei:{_stamp(MONDAY)}"])
+    events = CalendarIngestor().ingest(_calendar(broken, _override()))
+    assert [event['summary'] for event in events] == ['週會 (改時間)']
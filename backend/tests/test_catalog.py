@@ -0,0 +1,86 @@
+# backend/tests/test_catalog.py
+import pytest
+
+from catalog import CourseCatalog, CHANGESET_FORMAT, apply_changeset, catalog_hash
+from conftest import make_course
+
+
+@pytest.fixture
+def search_catalog() -> CourseCatalog:
+    return CourseCatalog([
+        make_course('100001', course_cname='資料結構', course_ename='Data Structures', teacher='王小明'),
+        make_course('100002', course_cname='演算法', course_ename='Algorithms', teacher='李大華',
+                    division='碩士班'),
+        make_course('100003', course_cname='資料庫系統', course_ename='Database Systems', teacher='王大同',
+                    department='資管系'),
+        make_course('900001', course_cname='中文思辨與表達', course_ename='Chinese', teacher='陳老師', department=''),
+        make_course('900002', course_cname='服務學習', course_ename='Service Learning', teacher='林老師',
+                    department=' ', division=''),
+    ])
+
+
+def _ids(result) -> list:
+    return [course['course_id'] for course in result['items']]
+
+
+def test_keywords_match_any_search_field_and_all_must_match(search_catalog):
+    assert _ids(search_catalog.search('資料')) == ['100001', '100003']
+    assert _ids(search_catalog.search('資料 王大')) == ['100003']
+    assert _ids(search_catalog.search('STRUCT')) == ['100001']
+    assert _ids(search_catalog.search('王')) == ['100001', '100003']
+    assert search_catalog.search('資料 演算')['total'] == 0
+    # n-gram 都存在但不是連續子字串
+    assert search_catalog.search('料系')['total'] == 0
+
+
+def test_field_queries_and_filters(search_catalog):
+    assert _ids(search_catalog.search(field_queries={'teacher': '大'})) == ['100002', '100003']
+    assert _ids(search_catalog.search(field_queries={'course_cname': '大'})) == []
+    assert _ids(search_catalog.search('資料', filters={'department': '資工系'})) == ['100001']
+    assert _ids(search_catalog.search(filters={'division': '碩士班', 'faculty': ''})) == ['100002']
+
+
+def test_departments_and_divisions_are_normalized_like_the_frontend(search_catalog):
+    assert _ids(search_catalog.search(filters={'department': '通識領域課程'})) == ['900001']
+    assert _ids(search_catalog.search(filters={'department': '全校共同課程', 'division': '一般班'})) == ['900002']
+    assert '通識領域課程' in search_catalog.keyed_values('department')
+
+
+def test_paging_keeps_catalog_order(search_catalog):
+    first = search_catalog.search(page=1, page_size=2)
+    second = search_catalog.search(page=3, page_size=2)
+    assert first['total'] == 5 and _ids(first) == ['100001', '100002']
+    assert _ids(second) == ['900002']
+
+
+def test_lookup_by_course_id_and_class(search_catalog):
+    assert search_catalog.get('100002', 0)['course_cname'] == '演算法'
+    assert search_catalog.get(' 100002 ', '0') is search_catalog.get('100002', 0)
+    assert search_catalog.get('100002', '1') is None
+
+
+def _changeset(base: CourseCatalog, added=(), modified=(), removed=(), **fields) -> dict:
+    index = apply_changeset(base.source_index, {'added': list(added), 'modified': list(modified),
+                                                'removed': list(removed)})
+    return {'format': CHANGESET_FORMAT, 'base_hash': base.content_hash, 'hash': catalog_hash(index),
+            'added': list(added), 'modified': list(modified), 'removed': list(removed), **fields}
+
+
+def test_changeset_matches_full_reload(catalog_courses):
+    base = CourseCatalog(catalog_courses)
+    changeset = _changeset(base, added=[make_course('100005', time='5a')],
+                           modified=[make_course('100002', teacher='陳老師')], removed=['100003-0'])
+    updated = base.with_changeset(changeset)
+    assert updated.get('100003', '0') is None and updated.get('100002', '0')['teacher'] == '陳老師'
+    synced = [c for c in catalog_courses if c['course_id'] not in ('100002', '100003')]
+    reloaded = CourseCatalog(synced + [make_course('100002', teacher='陳老師'), make_course('100005', time='5a')])
+    assert updated.content_hash == changeset['hash'] == reloaded.content_hash
+    assert updated.search('課程')['total'] == 5
+
+
+@pytest.mark.parametrize('override', [
+    {'base_hash': 'stale'}, {'hash': 'corrupt'}, {'full_reload': True}, {'format': 'course_catalog_changeset/v0'},
+])
+def test_inapplicable_changeset_requires_full_reload(catalog_courses, override):
+    base = CourseCatalog(catalog_courses)
+    assert base.with_changeset(_changeset(base, removed=['100001-0'], **override)) is None
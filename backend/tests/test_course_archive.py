@@ -0,0 +1,59 @@
+# backend/tests/test_course_archive.py
+from datetime import datetime
+
+import pytest
+
+from course_archive import CourseArchive, encode_column, decode_column
+from conftest import make_course
+
+
+@pytest.fixture
+def archive(tmp_path) -> CourseArchive:
+    return CourseArchive(tmp_path)
+
+
+def test_column_encoding_round_trip():
+    values = ['資工系', '資管系', '資工系', '']
+    encoded = encode_column(values)
+    assert encoded['values'] == ['資工系', '資管系', '']
+    assert decode_column(encoded) == values
+    assert decode_column(encode_column([2.0, 3.0])) == [2.0, 3.0]
+
+
+def test_append_and_resolve_across_class_formats(archive, tmp_path):
+    assert archive.append('113', '1', [make_course('090001', 0, '4cd', credit=3, year='113', semester='1')])
+    # 另開一個實例，確認是從檔案讀回
+    reopened = CourseArchive(tmp_path)
+    for course_class in (0, '0'):
+        course = reopened.resolve('113', '1', '090001', course_class)
+        assert course['class'] == '0' and course['course_credit'] == 3.0
+        assert course['course_cname'] == '課程090001'
+    assert reopened.resolve('113', '1', '090001', '1') is None
+    assert reopened.resolve('112', '2', '090001', '0') is None
+
+
+def test_reappending_same_content_is_a_noop(archive):
+    courses = [make_course('100001'), make_course('100002')]
+    assert archive.append('114', '2', courses)
+    assert not archive.append('114', '2', list(reversed(courses)))
+
+
+def test_reappend_merges_instead_of_replacing(archive, tmp_path):
+    archive.append('114', '2', [make_course('100001'), make_course('100002'), make_course('100003')])
+    # 學期中 100002 從 API 消失、100003 換了教師
+    assert archive.append('114', '2', [make_course('100001'), make_course('100003', teacher='陳老師')])
+
+    reopened = CourseArchive(tmp_path)
+    assert reopened.resolve('114', '2', '100002', '0')['course_cname'] == '課程100002'
+    assert reopened.resolve('114', '2', '100003', '0')['teacher'] == '陳老師'
+    meta = reopened.manifest['semesters']['114_2']
+    assert meta['rows'] == 3 and meta['retained'] == 1
+    assert datetime.fromisoformat(meta['archived_at']).tzinfo is not None
+
+
+def test_history_queries(archive):
+    archive.append('113', '1', [make_course('100001', teacher='王小明、李大華', year='113', semester='1')])
+    archive.append('114', '2', [make_course('100001', '1', teacher='李大華')])
+    assert archive.semesters() == ['113_1', '114_2']
+    assert [entry['semester'] for entry in archive.teacher_history('李大華')] == ['1', '2']
+    assert [entry['courses'][0]['class'] for entry in archive.course_history('100001')] == ['0', '1']
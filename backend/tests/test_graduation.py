@@ -0,0 +1,80 @@
+# backend/tests/test_graduation.py
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from graduation import (normalize_requirements, load_requirement_files, load_requirement_bundle, load_requirements,
+                        RequirementIndex, compute_progress, BUNDLE_FILENAME)
+
+
+def _require_file(items) -> dict:
+    return {'course_require_ncnu': {'item': items}}
+
+
+HEADER = {'course_id': ' 必修課程', 'course_cname': '', 'course_credit': ''}
+TOTAL = {'course_id': '', 'course_cname': '合計: 6 學分', 'course_credit': '6'}
+REQUIRED = [
+    {'course_id': '100001 ', 'course_cname': '計算機概論', 'course_credit': '3', 'department': '資工系'},
+    {'course_id': '100002', 'course_cname': '微積分', 'course_credit': '3.0', 'department': '資工系'},
+    {'course_id': '100003', 'course_cname': '專題', 'course_credit': 'N/A', 'department': '資工系'},
+]
+
+
+@pytest.fixture
+def require_dir(tmp_path):
+    files = {
+        'course_require_112_12_B.json': _require_file([HEADER, *REQUIRED, TOTAL]),
+        'course_require_113_12_B.json': _require_file(REQUIRED[0]),  # 單一課程時 item 是物件
+        'course_require_113_12_G.json': _require_file([HEADER, TOTAL]),  # 只有標題列 => 不收錄
+        'course_require_113_12_X_old.json': _require_file(REQUIRED),  # 不符合檔名規則
+    }
+    for name, content in files.items():
+        (tmp_path / name).write_text(json.dumps(content, ensure_ascii=False), encoding='utf-8')
+    return tmp_path
+
+
+def test_header_rows_are_stripped_and_credits_are_floats():
+    courses = normalize_requirements([HEADER, *REQUIRED, TOTAL, 'broken'])
+    assert [c['course_id'] for c in courses] == ['100001', '100002', '100003']
+    assert [c['course_credit'] for c in courses] == [3.0, 3.0, 0.0]
+
+
+def test_files_are_indexed_by_year_dept_and_class(require_dir):
+    index = RequirementIndex(load_requirement_files(require_dir))
+    assert len(index) == 2
+    assert index.latest_year('12', 'B') == '113'
+    assert index.latest_year('12', 'G') is None
+    assert [c['course_id'] for c in index.get('113', '12', 'B')] == ['100001']
+
+
+def test_compute_progress_against_schedule():
+    requirements = normalize_requirements(REQUIRED[:2])
+    progress = compute_progress(requirements, {'1a': {'course_id': '100001'}}, [{'course_id': '999999'}])
+    assert progress['total_credits'] == 6.0 and progress['completed_credits'] == 3.0
+    assert progress['missing_credits'] == 3.0 and progress['progress'] == 50.0
+    assert [c['course_id'] for c in progress['missing']] == ['100002']
+    assert compute_progress([], {}, [])['progress'] == 0.0
+
+
+def test_bundle_round_trip_matches_per_file_load(require_dir, monkeypatch):
+    monkeypatch.syspath_prepend(str(Path(__file__).resolve().parents[2]))
+    from course_require_bundle import build_from_directory, write_bundle
+
+    bundle, files = build_from_directory(require_dir)
+    assert files == 3 and sorted(bundle['index']) == ['112_12_B', '113_12_B']
+    # 兩個組合共用的課程只存一份
+    assert len(bundle['records']) == 3 and bundle['strings'].count('計算機概論') == 1
+    assert datetime.fromisoformat(bundle['generated_at']).tzinfo is not None
+
+    write_bundle(bundle, require_dir / BUNDLE_FILENAME)
+    assert load_requirement_bundle(require_dir / BUNDLE_FILENAME) == load_requirement_files(require_dir)
+    assert load_requirements(require_dir) == load_requirement_files(require_dir)
+
+
+def test_unknown_bundle_format_falls_back_to_files(require_dir):
+    (require_dir / BUNDLE_FILENAME).write_text('{"format": "course_require_bundle/v0"}', encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_requirement_bundle(require_dir / BUNDLE_FILENAME)
+    assert load_requirements(require_dir) == load_requirement_files(require_dir)
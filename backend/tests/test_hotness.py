@@ -0,0 +1,27 @@
+# backend/tests/test_hotness.py
+from hotness import extract_course_ids, count_course_hotness, fetch_hotness_map
+from conftest import FakeClient
+
+
+def test_extract_course_ids_merges_fixed_and_flexible():
+    schedule_data = {'1a': {'course_id': 'A'}, '1b': {'course_id': 'A'}, '2c': {'course_id': 'B'}, '3d': 'broken'}
+    flexible_courses = [{'course_id': 'C'}, {'course_cname': '缺少 ID'}]
+    assert extract_course_ids(schedule_data, flexible_courses) == {'A', 'B', 'C'}
+    assert extract_course_ids(None, 'broken') == set()
+
+
+def test_count_course_hotness_counts_each_user_once():
+    rows = [
+        {'schedule_data': {'1a': {'course_id': 'A'}, '1b': {'course_id': 'A'}}, 'flexible_courses': [{'course_id': 'A'}]},
+        {'schedule_data': {'2c': {'course_id': 'A'}}, 'flexible_courses': [{'course_id': 'B'}]},
+        None,
+    ]
+    assert count_course_hotness(iter(rows)) == {'A': 2, 'B': 1}
+
+
+def test_fetch_hotness_map_skips_zero_counts():
+    client = FakeClient({'course_hotness': [
+        {'course_id': 'A', 'count': 3}, {'course_id': 'B', 'count': 0}, {'course_id': 'C', 'count': 1},
+    ]})
+    assert fetch_hotness_map(client) == {'A': 3, 'C': 1}
+    assert fetch_hotness_map(FakeClient({})) == {}
@@ -0,0 +1,29 @@
+# backend/tests/test_metrics.py
+import httpx
+from supabase import create_client, ClientOptions
+
+import metrics
+
+
+def test_supabase_queries_are_timed_through_the_client_option():
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=[{'version': 1}]))
+    client = create_client('https://example.supabase.co', 'anon-key',
+                           options=ClientOptions(httpx_client=metrics.timed_http_client(transport)))
+    before = metrics.SUPABASE_SECONDS._values.get(('GET', 'schedules'), [0])[-1]
+    trace = metrics.begin_request('GET', '/api/schedule')
+    try:
+        assert client.table('schedules').select('version').eq('user_id', 'u1').execute().data == [{'version': 1}]
+    finally:
+        metrics.end_request(trace, 200)
+    assert metrics.SUPABASE_SECONDS._values[('GET', 'schedules')][-1] == before + 1
+    assert [span[:2] for span in trace.spans] == [('supabase', 'GET schedules')]
+
+
+def test_counter_renders_large_values_exactly():
+    counter = metrics.Counter('test_large_total', 'Counter above 1e6.', ('kind',))
+    metrics._families.remove(counter)
+    counter.inc('int', amount=1234567)
+    counter.inc('int')
+    counter.inc('float', amount=2500000.5)
+    assert counter.render()[2:] == ['test_large_total{kind="float"} 2500000.5',
+                                    'test_large_total{kind="int"} 1234568']
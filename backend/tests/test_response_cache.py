@@ -0,0 +1,92 @@
+# backend/tests/test_response_cache.py
+import gzip
+import threading
+import time
+
+import pytest
+
+import response_cache
+from response_cache import CachedPayload, ResponseCache
+
+LARGE = [{'course_id': f"{i:06d}", 'course_cname': '資料結構'} for i in range(200)]
+
+
+def test_etag_match_returns_304_without_body():
+    payload = CachedPayload.from_object(LARGE)
+    status, body, headers = payload.render(None, None)
+    assert status == 200 and body == payload.body and headers['ETag'].startswith('W/"')
+    for if_none_match in (payload.etag, payload.etag[2:], f'"other", {payload.etag}', '*'):
+        assert payload.render(if_none_match, 'gzip')[:2] == (304, b'')
+    assert payload.render('"other"', None)[0] == 200
+
+
+def test_encoding_negotiation_prefers_brotli_then_gzip(monkeypatch):
+    payload = CachedPayload.from_object(LARGE)
+    status, body, headers = payload.render(None, 'gzip, deflate')
+    assert headers['Content-Encoding'] == 'gzip' and gzip.decompress(body) == payload.body
+    assert payload.render(None, 'identity')[2].get('Content-Encoding') is None
+    if response_cache.brotli is not None:
+        assert payload.render(None, 'gzip;q=0.8, br')[2]['Content-Encoding'] == 'br'
+    monkeypatch.setattr(response_cache, 'brotli', None)
+    assert payload.render(None, 'br, gzip')[2]['Content-Encoding'] == 'gzip'
+
+
+def test_small_bodies_are_not_compressed():
+    payload = CachedPayload.from_object({'ok': True})
+    status, body, headers = payload.render(None, 'br, gzip')
+    assert body == payload.body and 'Content-Encoding' not in headers
+
+
+def test_compression_is_lazy_and_memoized(monkeypatch):
+    payload = CachedPayload.from_object(LARGE)
+    assert payload.encoded == {}
+    calls = []
+    original = gzip.compress
+    monkeypatch.setattr(gzip, 'compress', lambda *args, **kwargs: calls.append(1) or original(*args, **kwargs))
+    first = payload.render(None, 'gzip')[1]
+    assert payload.render(None, 'gzip')[1] is first
+    assert len(calls) == 1 and list(payload.encoded) == ['gzip']
+
+
+def test_rebuilds_on_version_change_and_expiry():
+    cache, builds = ResponseCache(), []
+    producer = lambda: builds.append(1) or {'n': len(builds)}  # noqa: E731
+    first = cache.get_or_build('contacts', 1, producer)
+    assert cache.get_or_build('contacts', 1, producer) is first
+    assert cache.get_or_build('contacts', 2, producer) is not first
+    cache.get_or_build('hotness', None, producer, max_age_seconds=0)
+    cache.get_or_build('hotness', None, producer, max_age_seconds=0)
+    assert len(builds) == 4
+
+
+def test_single_flight_per_key_without_blocking_other_keys():
+    cache, builds = ResponseCache(), []
+    release = threading.Event()
+
+    def slow():
+        builds.append('slow')
+        release.wait(5)
+        return {'slow': True}
+
+    threads = [threading.Thread(target=cache.get_or_build, args=('hotness', None, slow)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    started = time.perf_counter()
+    assert cache.get_or_build('contacts', 1, lambda: {'fast': True}).body == b'{"fast":true}'
+    assert time.perf_counter() - started < 0.5
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert builds == ['slow']
+
+
+def test_failed_build_is_not_cached():
+    cache = ResponseCache()
+
+    def failing():
+        raise RuntimeError('db down')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_build('hotness', None, failing)
+    assert cache.get_or_build('hotness', None, lambda: []).body == b'[]'
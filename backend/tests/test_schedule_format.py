@@ -0,0 +1,123 @@
+# backend/tests/test_schedule_format.py
+import json
+
+import pytest
+
+import metrics
+from catalog import normalize_course
+from schedule_format import (compact_course, hydrate_course, compact_schedule, hydrate_schedule, is_compact,
+                             apply_schedule_ops, ScheduleOpError, COMPACT_FIELDS, DISPLAY_FIELDS)
+from conftest import make_course
+
+pytestmark = pytest.mark.usefixtures('lookup')
+
+
+def test_compact_keeps_key_and_display_fields(catalog):
+    course = catalog.get('100001', '0')
+    compacted = compact_course(course)
+    assert set(compacted) == set(COMPACT_FIELDS + DISPLAY_FIELDS)
+    assert compacted['course_cname'] == course['course_cname']
+    assert is_compact(compacted) and not is_compact(course)
+
+
+def test_compact_hydrate_round_trip(catalog):
+    course = catalog.get('100002', '0')
+    assert hydrate_course(compact_course(course)) == course
+
+
+def test_archived_course_hydrates_from_archive():
+    # 舊時期格式：class 為數字、學分為數字
+    old = make_course('090001', 0, '4cd', credit=3, year='113', semester='1')
+    hydrated = hydrate_course(compact_course(old))
+    assert hydrated['course_cname'] == old['course_cname']
+    assert hydrated['class'] == '0' and hydrated['course_credit'] == 3.0
+    assert hydrated['department'] == normalize_course(hydrated)['department']
+
+
+def test_unresolvable_course_is_not_compacted():
+    unknown = make_course('999999', year='110', semester='1')
+    assert compact_course(unknown) is unknown
+    no_semester = {'course_id': '100001', 'class': '0', 'course_cname': 'x'}
+    assert compact_course(no_semester) is no_semester
+
+
+def test_hydration_miss_keeps_display_fields_and_is_counted(catalog):
+    stored = dict(compact_course(catalog.get('100001', '0')), year='110')
+    before = metrics.SCHEDULE_HYDRATION_MISSES._values.get(('110_2',), 0)
+    hydrated = hydrate_course(stored)
+    assert hydrated is stored
+    assert hydrated['course_cname'] == '課程100001' and hydrated['time'] == '1ab'
+    assert metrics.SCHEDULE_HYDRATION_MISSES._values[('110_2',)] == before + 1
+
+
+def test_key_only_stub_hydrates_and_is_upgraded_on_save(catalog):
+    stub = {'course_id': '100003', 'class': '0', 'year': '114', 'semester': '2'}
+    assert is_compact(stub)
+    assert hydrate_course(stub) == catalog.get('100003', '0')
+    upgraded = compact_course(stub)
+    assert upgraded['course_cname'] == '課程100003' and upgraded['time'] == '2ef'
+
+
+def test_schedule_round_trip_shares_objects_per_course(catalog):
+    course = catalog.get('100001', '0')
+    flexible = catalog.get('100004', '0')
+    schedule_data, flexible_courses = compact_schedule({'1a': course, '1b': course}, [flexible])
+    assert schedule_data['1a'] is schedule_data['1b']
+    assert hydrate_schedule(schedule_data, flexible_courses) == ({'1a': course, '1b': course}, [flexible])
+
+
+def test_json_parsed_slots_of_one_course_are_deduped(catalog):
+    course = catalog.get('100001', '0')
+    parsed = json.loads(json.dumps({'1a': course, '1b': course, '3c': catalog.get('100001', '1')}))
+    assert parsed['1a'] is not parsed['1b']
+    schedule_data, _ = compact_schedule(parsed, [])
+    assert schedule_data['1a'] is schedule_data['1b']
+    assert schedule_data['3c'] is not schedule_data['1a'] and schedule_data['3c']['class'] == '1'
+
+
+def test_add_expands_slots_from_course_time(catalog):
+    schedule_data, _ = apply_schedule_ops({}, [], [{'op': 'add', 'course': catalog.get('100003', '0')}])
+    assert sorted(schedule_data) == ['2e', '2f']
+    assert is_compact(schedule_data['2e'])
+
+
+def test_add_with_explicit_slots_and_time_from_catalog():
+    stub = {'course_id': '100003', 'class': '0', 'year': '114', 'semester': '2'}
+    schedule_data, _ = apply_schedule_ops({}, [], [{'op': 'add', 'course': stub}])
+    assert sorted(schedule_data) == ['2e', '2f']
+    schedule_data, _ = apply_schedule_ops({}, [], [{'op': 'add', 'course': stub, 'slots': ['7l']}])
+    assert list(schedule_data) == ['7l']
+
+
+def test_add_rejects_occupied_slot(catalog):
+    schedule_data, _ = apply_schedule_ops({}, [], [{'op': 'add', 'course': catalog.get('100001', '0')}])
+    with pytest.raises(ScheduleOpError, match='occupied'):
+        apply_schedule_ops(schedule_data, [], [{'op': 'add', 'course': catalog.get('100002', '0')}])
+
+
+def test_remove_drops_course_everywhere_without_mutating_input(catalog):
+    course = catalog.get('100001', '0')
+    schedule_data = {'1a': course, '1b': course, '2e': catalog.get('100003', '0')}
+    flexible_courses = [course]
+    new_data, new_flexible = apply_schedule_ops(schedule_data, flexible_courses,
+                                                [{'op': 'remove', 'course_id': '100001'}])
+    assert list(new_data) == ['2e'] and new_flexible == []
+    assert len(schedule_data) == 3 and flexible_courses == [course]
+
+
+def test_flexible_add_is_idempotent(catalog):
+    op = {'op': 'add', 'course': catalog.get('100004', '0'), 'flexible': True}
+    _, flexible_courses = apply_schedule_ops({}, [], [op, op])
+    assert len(flexible_courses) == 1
+
+
+@pytest.mark.parametrize('op', [
+    {'op': 'rename'},
+    {'op': 'remove'},
+    {'op': 'add', 'course': {'class': '0'}},
+    {'op': 'add', 'course': {'course_id': '100001'}, 'slots': ['9z']},
+    'add',
+])
+def test_invalid_ops_raise(op):
+    with pytest.raises(ScheduleOpError):
+        apply_schedule_ops({}, [], [op])
@@ -0,0 +1,51 @@
+# backend/tests/test_schedule_requests.py
+import pytest
+
+from schedule_requests import RequestError, parse_save_body, parse_patch_body, patched_schedule
+from schedule_store import ScheduleVersionConflict, _saved_result
+
+pytestmark = pytest.mark.usefixtures('lookup')
+
+
+def test_save_body_accepts_legacy_and_current_formats():
+    assert parse_save_body({'1a': {'course_id': '1'}}) == ({'1a': {'course_id': '1'}}, [])
+    assert parse_save_body({'schedule_data': {}, 'flexible_courses': [{'course_id': '2'}]}) == \
+        ({}, [{'course_id': '2'}])
+    with pytest.raises(RequestError):
+        parse_save_body(None)
+
+
+@pytest.mark.parametrize('body', [None, [], {'ops': []}, {'base_version': '1', 'ops': []},
+                                  {'base_version': True, 'ops': []}, {'base_version': 1, 'ops': {}}])
+def test_patch_body_requires_integer_version_and_op_list(body):
+    with pytest.raises(RequestError) as error:
+        parse_patch_body(body)
+    assert error.value.status == 400
+
+
+def test_stale_base_version_is_a_409_with_current_version():
+    schedule = {'schedule_data': {}, 'flexible_courses': [], 'version': 4}
+    with pytest.raises(RequestError) as error:
+        patched_schedule(schedule, 3, [])
+    assert error.value.status == 409
+    assert error.value.body() == {'error': 'Schedule version conflict', 'version': 4}
+
+
+def test_patch_applies_ops_on_matching_version(catalog):
+    schedule = {'schedule_data': {}, 'flexible_courses': [], 'version': 2}
+    schedule_data, _ = patched_schedule(schedule, 2, [{'op': 'add', 'course': catalog.get('100002', '0')}])
+    assert list(schedule_data) == ['1b']
+
+
+def test_invalid_op_is_a_400():
+    schedule = {'schedule_data': {}, 'flexible_courses': [], 'version': 0}
+    with pytest.raises(RequestError) as error:
+        patched_schedule(schedule, 0, [{'op': 'rename'}])
+    assert error.value.status == 400
+
+
+def test_rpc_conflict_result_raises_409():
+    with pytest.raises(ScheduleVersionConflict) as error:
+        _saved_result({'conflict': True, 'version': 7})
+    assert error.value.status == 409 and error.value.current_version == 7
+    assert error.value.body() == {'error': 'Schedule version conflict', 'version': 7}
@@ -0,0 +1,163 @@
+# backend/tests/test_schedule_store.py
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from schedule_store import ScheduleWriteBuffer, ScheduleCache, ScheduleVersionBoard, fcntl
+
+
+class Writer:
+    """記錄寫入內容；fail 次數內拋出例外，block 設定時等到放行才寫完"""
+
+    def __init__(self, fail: int = 0):
+        self.writes, self.fail = [], fail
+        self.block = None
+
+    def __call__(self, user_id, schedule_data, flexible_courses):
+        if self.block is not None:
+            self.block.wait(5)
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError('db down')
+        self.writes.append((user_id, schedule_data, flexible_courses))
+        return {'data': {'user_id': user_id}, 'version': len(self.writes)}
+
+
+@pytest.fixture
+def make_buffer():
+    buffers = []
+
+    def make(writer, window_seconds=60.0, on_flushed=None):
+        buffers.append(ScheduleWriteBuffer(writer, window_seconds, on_flushed))
+        return buffers[-1]
+
+    yield make
+    for buffer in buffers:
+        buffer.close()
+
+
+def test_burst_of_saves_is_coalesced_into_one_write(make_buffer):
+    writer, flushed = Writer(), []
+    buffer = make_buffer(writer, on_flushed=lambda user_id, result: flushed.append((user_id, result['version'])))
+    for n in range(5):
+        buffer.put('u1', {'1a': {'course_id': str(n)}}, [])
+    buffer.put('u2', {}, [{'course_id': 'X'}])
+    assert buffer.get('u1') == ({'1a': {'course_id': '4'}}, [])
+    buffer.flush()
+    assert sorted(w[0] for w in writer.writes) == ['u1', 'u2']
+    assert ('u1', {'1a': {'course_id': '4'}}, []) in writer.writes
+    assert sorted(user_id for user_id, _ in flushed) == ['u1', 'u2']
+    assert buffer.get('u1') is None
+
+
+def test_only_due_entries_are_flushed_by_the_background_thread(make_buffer):
+    writer = Writer()
+    buffer = make_buffer(writer, window_seconds=0.2)
+    buffer.put('u1', {}, [])
+    time.sleep(0.05)
+    buffer.put('u1', {'1a': {'course_id': 'A'}}, [])  # 取代內容但不延後寫出時間
+    assert writer.writes == []
+    deadline = time.monotonic() + 2
+    while not writer.writes and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert writer.writes == [('u1', {'1a': {'course_id': 'A'}}, [])]
+
+
+def test_failed_write_is_retried_and_newer_save_wins(make_buffer):
+    writer = Writer(fail=1)
+    buffer = make_buffer(writer)
+    buffer.put('u1', {'v': 1}, [])
+    buffer.flush()
+    assert writer.writes == [] and buffer.get('u1') == ({'v': 1}, [])
+    buffer.flush()
+    assert writer.writes == [('u1', {'v': 1}, [])]
+
+    writer.fail, writer.block = 1, threading.Event()
+    buffer.put('u1', {'v': 2}, [])
+    flusher = threading.Thread(target=buffer.flush)
+    flusher.start()
+    time.sleep(0.05)
+    assert buffer.get('u1') == ({'v': 2}, [])  # 寫出途中仍讀得到
+    buffer.put('u1', {'v': 3}, [])
+    writer.block.set()
+    flusher.join(5)
+    writer.block = None
+    # 失敗的 v2 不會蓋掉之後排入的 v3
+    buffer.flush()
+    assert writer.writes[-1] == ('u1', {'v': 3}, [])
+
+
+def test_close_flushes_everything(make_buffer):
+    writer = Writer()
+    buffer = make_buffer(writer)
+    buffer.put('u1', {}, [])
+    buffer.close()
+    assert writer.writes == [('u1', {}, [])]
+
+
+def _schedule(version: int) -> dict:
+    return {'schedule_data': {}, 'flexible_courses': [], 'version': version}
+
+
+@pytest.fixture
+def board_path(tmp_path):
+    return str(tmp_path / 'versions.bin')
+
+
+def test_cache_lru_and_ttl(board_path):
+    cache = ScheduleCache(ttl_seconds=60, max_entries=2, board=ScheduleVersionBoard(board_path))
+    for user_id in ('u1', 'u2'):
+        cache.put(user_id, _schedule(1), cache.generation(user_id))
+    assert cache.get('u1')[0] == _schedule(1)  # u1 變成最近使用
+    cache.put('u3', _schedule(1), cache.generation('u3'))
+    assert cache.get('u2') is None and cache.get('u1') is not None and len(cache) == 2
+
+    short = ScheduleCache(ttl_seconds=0.05, board=ScheduleVersionBoard(board_path))
+    short.put('u1', _schedule(1), short.generation('u1'))
+    assert short.get('u1') is not None
+    time.sleep(0.1)
+    assert short.get('u1') is None
+    # ttl 為 0 時不快取，但仍回傳可用的 payload
+    assert ScheduleCache(ttl_seconds=0, board=ScheduleVersionBoard(board_path)).put('u1', _schedule(1), 0).etag
+
+
+def test_save_in_another_worker_invalidates_without_a_query(board_path):
+    # 兩個實例開同一個計數檔，模擬同一台主機上的兩個 worker
+    worker_a = ScheduleCache(ttl_seconds=60, board=ScheduleVersionBoard(board_path))
+    worker_b = ScheduleCache(ttl_seconds=60, board=ScheduleVersionBoard(board_path))
+    worker_a.put('u1', _schedule(1), worker_a.generation('u1'))
+    worker_b.put('u1', _schedule(1), worker_b.generation('u1'))
+
+    worker_b.saved('u1', _schedule(2))
+    assert worker_a.get('u1') is None
+    assert worker_b.get('u1')[0] == _schedule(2)
+    worker_a.invalidate('u1')
+    assert worker_b.get('u1') is None
+
+
+def test_write_during_read_leaves_no_stale_entry(board_path):
+    worker_a = ScheduleCache(ttl_seconds=60, board=ScheduleVersionBoard(board_path))
+    worker_b = ScheduleCache(ttl_seconds=60, board=ScheduleVersionBoard(board_path))
+    generation = worker_a.generation('u1')  # worker_a 開始讀資料庫
+    worker_b.saved('u1', _schedule(2))      # 讀取途中 worker_b 寫入
+    worker_a.put('u1', _schedule(1), generation)
+    assert worker_a.get('u1') is None
+
+
+def _bump_many(path: str, times: int):
+    board = ScheduleVersionBoard(path)
+    for _ in range(times):
+        board.bump('u1')
+
+
+@pytest.mark.skipif(fcntl is None, reason='跨 process 的計數需要 fcntl 檔案鎖')
+def test_concurrent_bumps_from_several_processes_are_not_lost(board_path):
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_bump_many, args=(board_path, 200)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert ScheduleVersionBoard(board_path).generation('u1') == 800
@@ -0,0 +1,129 @@
+# backend/tests/test_static_data.py
+import threading
+import time
+
+import pytest
+
+import static_data
+from static_data import StaticDataStore, CALENDAR_DATASET, CONTACTS_DATASET, save_snapshot, merge_contacts_with_units
+
+
+class Upstream:
+    """替換 NCNU API 與行事曆的抓取；calls 記錄每個資料來源被抓了幾次"""
+
+    def __init__(self, monkeypatch):
+        self.calls, self.failing, self.delay = {}, set(), 0.0
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+        self.release.set()
+        monkeypatch.setattr(static_data, 'fetch_ncnu_dataset', lambda url: self.fetch(url.split('json=')[1]))
+        monkeypatch.setattr(static_data, 'fetch_calendar_events', lambda: self.fetch(CALENDAR_DATASET))
+
+    def fetch(self, name):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            count = self.calls[name]
+        self.release.wait(5)
+        time.sleep(self.delay)
+        if name in self.failing:
+            raise RuntimeError(f"{name} is down")
+        return [{'name': name, 'fetch': count}]
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    return Upstream(monkeypatch)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StaticDataStore(ttl_seconds=0, snapshot_path=tmp_path / 'snapshot.json', seed_dir=tmp_path / 'seed')
+
+
+def test_refresh_swaps_in_new_data_and_keeps_last_good_on_failure(store, upstream):
+    store.refresh()
+    first = store.get_with_version('contact_ncnu')
+    assert first == ([{'name': 'contact_ncnu', 'fetch': 1}], 1)
+
+    upstream.failing.add('contact_ncnu')
+    store.refresh()
+    assert store.get_with_version('contact_ncnu') == (first[0], 2)
+    assert store.get('unitId_ncnu') == [{'name': 'unitId_ncnu', 'fetch': 2}]
+
+
+def test_readers_never_wait_for_a_background_refresh(store, upstream):
+    store.refresh()
+    upstream.release.clear()
+    refresher = threading.Thread(target=store.refresh)
+    refresher.start()
+    started = time.perf_counter()
+    assert store.get('course_deptId') == [{'name': 'course_deptId', 'fetch': 1}]
+    assert time.perf_counter() - started < 0.1
+    upstream.release.set()
+    refresher.join(5)
+    assert store.get('course_deptId') == [{'name': 'course_deptId', 'fetch': 2}]
+
+
+def test_dataset_status_reports_age(store, upstream):
+    upstream.failing.add(CALENDAR_DATASET)
+    store.refresh()
+    status = store.dataset_status()
+    assert status['unitId_ncnu']['items'] == 1 and 0 <= status['unitId_ncnu']['age_seconds'] < 5
+    assert status[CALENDAR_DATASET] == {'items': 0, 'loaded_at': None, 'age_seconds': None}
+
+
+def test_concurrent_first_requests_load_once_in_parallel(store, upstream):
+    upstream.delay = 0.2
+    started = time.perf_counter()
+    threads = [threading.Thread(target=store.ensure_loaded) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    # 每個來源只抓一次，四個來源同時抓 (總耗時接近單一來源)
+    assert upstream.calls == {name: 1 for name in static_data.SOURCE_DATASETS}
+    assert time.perf_counter() - started < 0.6
+    assert store.get('contact_ncnu') == [{'name': 'contact_ncnu', 'fetch': 1}]
+    assert store.snapshot_path.exists()
+
+
+def test_cold_start_serves_snapshot_without_waiting_for_upstream(store, upstream):
+    save_snapshot({'contact_ncnu': [{'name': 'from snapshot'}]}, {'contact_ncnu': 1.0}, store.snapshot_path)
+    upstream.release.clear()
+    started = time.perf_counter()
+    store.ensure_loaded()
+    assert time.perf_counter() - started < 0.5
+    assert store.get('contact_ncnu') == [{'name': 'from snapshot'}]
+    # 背景立刻更新一次
+    upstream.release.set()
+    store._refresher.join(5)
+    assert store.get('contact_ncnu') == [{'name': 'contact_ncnu', 'fetch': 1}]
+
+
+def test_cold_start_falls_back_to_seed_files(store, upstream):
+    store.seed_dir.mkdir()
+    (store.seed_dir / static_data.SEED_FILES['contact_ncnu']).write_text(
+        '{"contact_ncnu": {"item": [{"title": "教務處"}]}}', encoding='utf-8')
+    upstream.release.clear()
+    store.ensure_loaded()
+    assert store.get('contact_ncnu') == [{'title': '教務處'}]
+    upstream.release.set()
+    store._refresher.join(5)
+
+
+def test_merge_contacts_uses_first_unit_and_does_not_mutate():
+    contacts = [{'title': '教務處', 'web': ''}, {'title': '未知單位', 'web': 'old'}]
+    units = [{'中文名稱': '教務處', '網站網址': 'https://first'}, {'中文名稱': '教務處', '網站網址': 'https://second'}]
+    merged = merge_contacts_with_units(contacts, units)
+    assert merged == [{'title': '教務處', 'web': 'https://first'}, {'title': '未知單位', 'web': 'old'}]
+    assert contacts[0]['web'] == '' and merged[1] is contacts[1]
+
+
+def test_contacts_are_merged_once_per_load(store, upstream, monkeypatch):
+    calls = []
+    original = static_data.merge_contacts_with_units
+    monkeypatch.setattr(static_data, 'merge_contacts_with_units', lambda *args: calls.append(1) or original(*args))
+    store.ensure_loaded()
+    for _ in range(3):
+        store.get(CONTACTS_DATASET)
+    assert len(calls) == 1
@@ -0,0 +1,30 @@
+# backend/tests/test_table_scan.py
+from table_scan import iter_table_rows
+from wrapped import CreditDistribution
+from conftest import FakeClient
+
+
+def test_keyset_pagination_reads_every_row_in_pages():
+    client = FakeClient({'schedules': [{'id': i, 'credits': i % 25} for i in range(2500, 0, -1)]})
+    rows = iter_table_rows(client, 'schedules', 'credits', page_size=1000)
+    assert next(rows) == {'id': 1, 'credits': 1}
+    assert len(client.calls) == 1  # generator：第一頁讀完前不會查下一頁
+    assert [row['id'] for row in rows] == list(range(2, 2501))
+    assert len(client.calls) == 3
+
+
+def test_filters_and_exact_page_boundary():
+    client = FakeClient({'course_hotness': [{'course_id': f"{i:03d}", 'count': i % 2} for i in range(8)]})
+    rows = list(iter_table_rows(client, 'course_hotness', 'count', key_column='course_id', page_size=2,
+                                apply_filters=lambda query: query.gt('count', 0)))
+    assert [row['course_id'] for row in rows] == ['001', '003', '005', '007']
+    # 最後一頁剛好滿頁時，多查一次空頁才結束
+    assert len(client.calls) == 3
+
+
+def test_percentile_covers_population_beyond_first_thousand():
+    # 前 1000 人 0 學分、後 1000 人 20 學分：只讀前 1000 筆時百分位會是 0
+    client = FakeClient({'schedules': [{'id': i, 'credits': 0.0 if i < 1000 else 20.0} for i in range(2000)]})
+    distribution = CreditDistribution.from_credits(row['credits'] for row in iter_table_rows(client, 'schedules', 'credits'))
+    assert distribution.population == 2000
+    assert distribution.percentile(20.0) == 50
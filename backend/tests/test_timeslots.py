@@ -0,0 +1,33 @@
+# backend/tests/test_timeslots.py
+from timeslots import parse_time_mask, slot_key_mask, mask_to_slots, occupied_days, schedule_masks
+
+
+def test_time_string_round_trip():
+    mask = parse_time_mask('1ef3cd')
+    assert mask_to_slots(mask) == ['1e', '1f', '3c', '3d']
+    assert parse_time_mask('1EF3cd') == mask
+    assert occupied_days(mask) == 2
+    assert mask & slot_key_mask('3c') and not mask & slot_key_mask('3e')
+
+
+def test_unknown_or_empty_times_are_zero():
+    assert parse_time_mask('') == parse_time_mask(None) == parse_time_mask(['1a']) == 0
+    assert parse_time_mask('8a1x') == 0
+    assert slot_key_mask('1') == slot_key_mask('1ab') == slot_key_mask(None) == 0
+
+
+def test_schedule_masks_groups_slots_by_course():
+    schedule_data = {'1a': {'course_id': 'A'}, '1b': {'course_id': 'A'}, '2c': {'course_id': 'B'},
+                     '9z': {'course_id': 'C'}, '3d': 'broken'}
+    occupied, by_course = schedule_masks(schedule_data)
+    assert mask_to_slots(occupied) == ['1a', '1b', '2c', '3d']
+    assert by_course == {'A': parse_time_mask('1ab'), 'B': parse_time_mask('2c')}
+
+
+def test_classify_conflicts(catalog):
+    occupied, own_masks = schedule_masks({'1a': catalog.get('100001', '0'), '1b': catalog.get('100001', '0')})
+    result = catalog.classify_conflicts(occupied, own_masks)
+    # 100002 (1b) 與課表衝堂；課表中的 100001 本身不算衝堂
+    assert result['conflicting'] == ['100002-0']
+    assert result['fitting'] == ['100001-0', '100001-1', '100003-0']
+    assert result['no_time'] == ['100004-0']
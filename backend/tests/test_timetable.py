@@ -0,0 +1,93 @@
+# backend/tests/test_timetable.py
+import threading
+import time
+
+import pytest
+
+from timeslots import parse_time_mask
+from timetable import build_problem, generate_timetables, TimetableError, TimetableRunner, TimetableBusy
+
+
+def test_generation_prefers_more_courses_without_overlap(catalog):
+    problem = build_problem(catalog, ['100001', '100002', '100003'])
+    result = generate_timetables(problem, time_budget=5)
+    best = result['results'][0]
+    # 100001 的 0 班 (1ab) 與 100002 (1b) 衝堂，只能選 1 班 (3cd)
+    assert sorted(best['courses']) == ['100001-1', '100002-0', '100003-0']
+    assert best['course_count'] == 3 and best['total_credits'] == 7.0
+    for entry in result['results']:
+        masks = [parse_time_mask(catalog.get(*key.split('-'))['time']) for key in entry['courses']]
+        assert sum(masks) == sum(set(masks)) and all(a & b == 0 for i, a in enumerate(masks) for b in masks[i + 1:])
+    assert not result['timed_out']
+
+
+def test_blocked_slots_credit_cap_and_required(catalog):
+    blocked = parse_time_mask('3c')
+    problem = build_problem(catalog, ['100001', '100002'], required=['100001'], blocked_mask=blocked)
+    result = generate_timetables(problem, time_budget=5)
+    # 3c 被封鎖 => 100001 只剩 0 班，必選，因此 100002 排不進去
+    assert [entry['courses'] for entry in result['results']] == [['100001-0']]
+
+    problem = build_problem(catalog, ['100002', '100003'], max_credits=3)
+    assert all(entry['total_credits'] <= 3 for entry in generate_timetables(problem, 5)['results'])
+
+
+def test_unavailable_courses_are_reported(catalog):
+    problem = build_problem(catalog, ['100002', '999999'])
+    assert problem['unavailable'] == ['999999']
+
+
+@pytest.mark.parametrize('course_ids, required, message', [
+    ([], (), 'must not be empty'),
+    (['100001'], ['100002'], 'must also be in course_ids'),
+    (['999999'], ['999999'], 'no available section'),
+])
+def test_invalid_problems_raise(catalog, course_ids, required, message):
+    with pytest.raises(TimetableError, match=message):
+        build_problem(catalog, course_ids, required)
+
+
+def _endless_problem(course_count=30) -> dict:
+    """每門課三個無固定時間的班別，全部組合都合法，搜尋一定會用滿時間上限"""
+    groups = [{'course_id': str(i), 'required': False, 'sections': [(f"{i}-{s}", 0, 1.0) for s in range(3)]}
+              for i in range(course_count)]
+    return {'groups': groups, 'blocked_mask': 0, 'max_credits': None, 'max_results': 5, 'unavailable': []}
+
+
+@pytest.fixture
+def runner():
+    runner = TimetableRunner(workers=1, queue_size=3)
+    yield runner
+    runner.close()
+
+
+def test_queue_time_does_not_count_against_the_budget(runner):
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(runner.run(_endless_problem(), time_budget=0.4))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(runner.capacity)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    # 單一 worker 依序執行：最後一個請求排隊 1.2 秒，仍然完整跑完自己的 0.4 秒
+    assert errors == []
+    assert len(results) == 4 and all(r['timed_out'] and r['results'] for r in results)
+
+
+def test_saturated_queue_is_rejected_without_affecting_running_jobs(runner):
+    threads = [threading.Thread(target=runner.run, args=(_endless_problem(), 0.3)) for _ in range(runner.capacity)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    with pytest.raises(TimetableBusy):
+        runner.run(_endless_problem(), time_budget=0.3)
+    for thread in threads:
+        thread.join(10)
+    # 名額在工作結束後釋放
+    assert runner.run(_endless_problem(3), time_budget=1)['results']
@@ -0,0 +1,37 @@
+# backend/tests/test_wrapped.py
+from collections import Counter
+
+from wrapped import CreditDistribution, summarize_courses, build_payload
+
+
+def test_percentile_counts_only_strictly_lower_credits():
+    distribution = CreditDistribution.from_credits([10.0, 12.0, 12.0, 18.0, 22.0])
+    assert distribution.percentile(12.0) == 20
+    assert distribution.percentile(13.0) == 60
+    assert distribution.percentile(0.0) == 0
+    assert distribution.percentile(30.0) == 100
+    assert CreditDistribution.from_credits([]).percentile(12.0) == 0
+
+
+def test_snapshot_histogram_restores_same_distribution():
+    credits = [3.0, 9.0, 9.0, 16.0, 16.0, 16.0]
+    live = CreditDistribution.from_credits(credits)
+    counts = [c - (live.cumulative[i - 1] if i else 0) for i, c in enumerate(live.cumulative)]
+    restored = CreditDistribution(live.values, counts)
+    for credits_value in (3.0, 9.0, 16.0, 17.0):
+        assert restored.percentile(credits_value) == live.percentile(credits_value)
+
+
+def test_summarize_courses_dedupes_fixed_and_flexible():
+    course = {'course_id': 'A', 'course_credit': '3.0', 'department': '資工系'}
+    schedule_data = {'1a': course, '1b': course, '2c': {'course_id': 'B', 'course_credit': 'x', 'department': '資管系'}}
+    total_credits, dept_counts = summarize_courses(schedule_data, [{'course_id': 'C', 'course_credit': 2}])
+    assert total_credits == 5.0
+    assert dept_counts == Counter({'資工系': 1, '資管系': 1})
+
+
+def test_build_payload():
+    payload = build_payload({'created_at': '2025-02-01T08:00:00+00:00', 'full_name': ''}, 7, 18.04,
+                            Counter({'資工系': 2, '資管系': 1}), 55)
+    assert payload == {'join_date': '2025-02-01', 'user_name': 'Student', 'user_rank': 7, 'total_credits': 18.0,
+                       'percentile': 55, 'favorite_dept': '資工系', 'tag': "充實的\n大學生"}
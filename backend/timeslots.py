@@ -0,0 +1,78 @@
+# backend/timeslots.py
+"""
+上課時間的位元遮罩 (bitmask) 表示法
+
+課程時間字串如 "1ef3cd" 代表星期一 e、f 節與星期三 c、d 節；
+schedule_data 的 key 則是單一節次如 "1e"。
+每個 (星期, 節次) 對應一個 bit，整門課的時間編成一個 int：
+- 衝堂判斷只要一次 AND，不必重複解析字串
+- 課程目錄載入時就把每門課的時間編好 (見 catalog.CourseCatalog.time_masks)
+"""
+import re
+
+DAYS = '1234567'
+PERIODS = 'abcdzefghijkl'  # 與前端 CourseTable 的節次順序相同
+SLOTS_PER_DAY = len(PERIODS)
+TIME_GROUP = re.compile(r'(\d)([a-zA-Z]+)')
+
+
+def slot_bit(day: str, period: str) -> int:
+    """單一節次的 bit；無法辨識的星期或節次回傳 0"""
+    day_index = DAYS.find(day)
+    period_index = PERIODS.find(period.lower())
+    if day_index < 0 or period_index < 0:
+        return 0
+    return 1 << (day_index * SLOTS_PER_DAY + period_index)
+
+
+def parse_time_mask(time_string) -> int:
+    """課程時間字串 ("1ef3cd") => bitmask；空字串或非字串回傳 0 (無固定時間)"""
+    if not time_string or not isinstance(time_string, str):
+        return 0
+    mask = 0
+    for day, periods in TIME_GROUP.findall(time_string):
+        for period in periods:
+            mask |= slot_bit(day, period)
+    return mask
+
+
+def slot_key_mask(slot_key) -> int:
+    """schedule_data 的 key ("1e") => bitmask"""
+    if not isinstance(slot_key, str) or len(slot_key) != 2:
+        return 0
+    return slot_bit(slot_key[0], slot_key[1])
+
+
+def mask_to_slots(mask: int) -> list:
+    """bitmask => ["1e", "1f", ...]，依星期、節次排序"""
+    slots = []
+    while mask:
+        low_bit = mask & -mask
+        index = low_bit.bit_length() - 1
+        slots.append(f"{DAYS[index // SLOTS_PER_DAY]}{PERIODS[index % SLOTS_PER_DAY]}")
+        mask ^= low_bit
+    return slots
+
+
+def occupied_days(mask: int) -> int:
+    """bitmask 佔用了幾天"""
+    day_mask = (1 << SLOTS_PER_DAY) - 1
+    return sum(1 for day_index in range(len(DAYS)) if mask & (day_mask << (day_index * SLOTS_PER_DAY)))
+
+
+def schedule_masks(schedule_data) -> tuple:
+    """
+    使用者課表 => (全部已佔用節次, {course_id: 該課程佔用的節次})
+    後者用來排除「自己跟自己衝堂」，與前端 hasTimeConflict 的判斷一致
+    """
+    occupied = 0
+    by_course = {}
+    if isinstance(schedule_data, dict):
+        for slot_key, course in schedule_data.items():
+            bit = slot_key_mask(slot_key)
+            if not bit:
+                continue
+            occupied |= bit
+            if isinstance(course, dict) and 'course_id' in course:
+                by_course[course['course_id']] = by_course.get(course['course_id'], 0) | bit
+    return occupied, by_course
@@ -0,0 +1,221 @@
+# backend/timetable.py
+"""
+自動排課：從願望清單列舉不衝堂的班別組合
+
+- 每個課號最多選一個班別，以 bitmask 回溯搜尋 (見 timeslots.py)，
+  已佔用節次、封鎖節次、學分上限在每一步剪枝
+- 結果依「排進的課程數多 → 到校天數少 → 學分多」排序，只保留前 max_results 組，
+  並以「剩下的課全排進去也贏不了目前最差結果」剪枝
+- 搜尋在獨立的 process pool 執行並有硬性時間上限，大型願望清單不會卡住 request worker；
+  時間上限從 worker 開始執行搜尋時起算，排隊時間不計入。執行中加排隊中的工作數有上限，
+  佇列已滿時直接回傳 503，尖峰時不會無限排隊
+"""
+import os
+import heapq
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from timeslots import occupied_days, mask_to_slots
+
+TIMETABLE_TIME_BUDGET_SECONDS = float(os.environ.get("TIMETABLE_TIME_BUDGET_SECONDS", "2.0"))
+TIMETABLE_WORKERS = int(os.environ.get("TIMETABLE_WORKERS", "2"))
+# 除了執行中的工作，最多再排隊幾個；超過時回傳 503
+TIMETABLE_QUEUE_SIZE = int(os.environ.get("TIMETABLE_QUEUE_SIZE", str(TIMETABLE_WORKERS * 4)))
+MAX_WISHLIST_SIZE = 40
+MAX_RESULTS_LIMIT = 50
+DEADLINE_CHECK_INTERVAL = 1024  # 每展開多少個節點檢查一次時間
+
+
+class TimetableError(ValueError):
+    """請求內容無法排課 (回傳 400)"""
+
+
+class TimetableBusy(Exception):
+    """執行中與排隊中的排課工作已滿 (回傳 503)"""
+
+
+def build_problem(catalog, course_ids, required=(), blocked_mask=0, max_credits=None, max_results=10) -> dict:
+    """由課程目錄整理出可 pickle 的搜尋問題；每個課號對應目錄中的所有班別"""
+    course_ids = list(dict.fromkeys(str(c).strip() for c in course_ids if str(c).strip()))
+    required = {str(c).strip() for c in required}
+    if not course_ids:
+        raise TimetableError("course_ids must not be empty")
+    if len(course_ids) > MAX_WISHLIST_SIZE:
+        raise TimetableError(f"course_ids must not exceed {MAX_WISHLIST_SIZE} courses")
+    unknown_required = required - set(course_ids)
+    if unknown_required:
+        raise TimetableError(f"required courses must also be in course_ids: {sorted(unknown_required)}")
+
+    sections_by_id = {course_id: [] for course_id in course_ids}
+    for key, course, mask in zip(catalog.keys, catalog.courses, catalog.time_masks):
+        sections = sections_by_id.get(str(course.get('course_id', '')).strip())
+        if sections is None or mask & blocked_mask:
+            continue
+        try:
+            credits = float(course.get('course_credit') or 0)
+        except (TypeError, ValueError):
+            credits = 0.0
+        sections.append((key, mask, credits))
+
+    missing = [course_id for course_id, sections in sections_by_id.items() if not sections]
+    missing_required = sorted(required.intersection(missing))
+    if missing_required:
+        raise TimetableError(f"required courses have no available section: {missing_required}")
+
+    # 必選課先排，其餘依班別數由少到多，越早剪枝越有效
+    groups = [
+        {"course_id": course_id, "required": course_id in required, "sections": sections}
+        for course_id, sections in sections_by_id.items() if sections
+    ]
+    groups.sort(key=lambda g: (not g["required"], len(g["sections"])))
+    return {
+        "groups": groups,
+        "blocked_mask": blocked_mask,
+        "max_credits": max_credits,
+        "max_results": max(1, min(int(max_results), MAX_RESULTS_LIMIT)),
+        "unavailable": missing,
+    }
+
+
+def generate_timetables(problem: dict, time_budget: float) -> dict:
+    """回溯列舉不衝堂組合；超過 time_budget 秒時停止並回傳目前最好的結果"""
+    deadline = time.monotonic() + time_budget
+    groups = problem["groups"]
+    max_credits = problem["max_credits"]
+    max_results = problem["max_results"]
+    best = []  # min-heap: (課程數, -到校天數, 學分, 課程主鍵) 越小越差
+    state = {"explored": 0, "timed_out": False}
+    chosen = []
+
+    def record(mask, credits):
+        if not chosen:
+            return
+        entry = (len(chosen), -occupied_days(mask), credits, tuple(key for key, _ in chosen), mask)
+        if len(best) < max_results:
+            heapq.heappush(best, entry)
+        elif entry > best[0]:
+            heapq.heapreplace(best, entry)
+
+    def search(index, mask, credits):
+        state["explored"] += 1
+        if state["explored"] % DEADLINE_CHECK_INTERVAL == 0 and time.monotonic() > deadline:
+            state["timed_out"] = True
+        if state["timed_out"]:
+            return
+        # 剩下的課全部排進去，課程數也追不上目前最差的結果 => 剪枝
+        if len(best) >= max_results and len(chosen) + (len(groups) - index) < best[0][0]:
+            return
+        if index == len(groups):
+            record(mask, credits)
+            return
+
+        group = groups[index]
+        for key, section_mask, section_credits in group["sections"]:
+            if section_mask & mask:
+                continue
+            if max_credits is not None and credits + section_credits > max_credits:
+                continue
+            chosen.append((key, section_mask))
+            search(index + 1, mask | section_mask, credits + section_credits)
+            chosen.pop()
+        if not group["required"]:
+            search(index + 1, mask, credits)
+
+    search(0, problem["blocked_mask"], 0.0)
+
+    results = [
+        {
+            "courses": list(keys),
+            "course_count": count,
+            "days_on_campus": -neg_days,
+            "total_credits": round(credits, 1),
+            "slots": mask_to_slots(mask & ~problem["blocked_mask"]),
+        }
+        for count, neg_days, credits, keys, mask in sorted(best, reverse=True)
+    ]
+    return {
+        "results": results,
+        "timed_out": state["timed_out"],
+        "explored": state["explored"],
+        "unavailable": problem["unavailable"],
+    }
+
+
+class TimetableRunner:
+    """
+    在 process pool 中執行搜尋。搜尋本身在 worker 內從開始執行時計算 time_budget 並自行停止，
+    佇列長度有上限，因此等待時間也有上限：前面每個工作都用滿時間的情況再多等一秒。
+    等待逾時只放棄這個請求，不結束共用 pool 的 worker，其他請求的搜尋不受影響
+    """
+
+    def __init__(self, workers: int = TIMETABLE_WORKERS, queue_size: int = TIMETABLE_QUEUE_SIZE):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        # 工作結束 (而不是請求放棄等待) 時才釋放，仍在跑的工作持續佔用名額
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _replace_pool(self, pool: ProcessPoolExecutor):
+        """worker 異常結束 (例如記憶體不足) 後 pool 無法再使用，換成新的；多個請求同時發現只換一次"""
+        with self._pool_lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, problem: dict, time_budget: float):
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                return pool, pool.submit(generate_timetables, problem, time_budget)
+            except (BrokenProcessPool, RuntimeError):
+                # RuntimeError：pool 在取得與 submit 之間被其他請求換掉並關閉
+                self._replace_pool(pool)
+                if attempt:
+                    raise
+
+    def max_wait_seconds(self, time_budget: float) -> float:
+        waves = -(-self.capacity // self.workers)
+        return time_budget * waves + 1.0
+
+    def run(self, problem: dict, time_budget: float = TIMETABLE_TIME_BUDGET_SECONDS) -> dict:
+        """執行一次搜尋；佇列已滿時拋出 TimetableBusy，等待超過上限時拋出 FutureTimeoutError"""
+        if not self._slots.acquire(blocking=False):
+            raise TimetableBusy("Schedule generation is busy, please try again shortly.")
+        try:
+            pool, future = self._submit(problem, time_budget)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.max_wait_seconds(time_budget))
+        except FutureTimeoutError:
+            future.cancel()  # 還在排隊就取消；已在執行的搜尋會在自己的時間上限內結束
+            raise
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            raise
+
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+_runner = TimetableRunner()
+
+
+def run_generation(problem: dict, time_budget: float = TIMETABLE_TIME_BUDGET_SECONDS) -> dict:
+    """在共用的 TimetableRunner 上執行搜尋"""
+    return _runner.run(problem, time_budget)
@@ -0,0 +1,256 @@
+# backend/wrapped.py
+"""
+Semester Wrapped 統計
+
+- build_wrapped_snapshot(): 批次作業，各掃描 users / schedules 一次，算出
+  全校學分分佈、加入順序與每位使用者的 wrapped 結果，寫入 wrapped_stats / wrapped_snapshot_meta
+- get_wrapped_payload(): API 使用；快照中有此使用者就直接讀取，
+  否則（快照後才註冊、或快照過期）即時計算，百分位以快照的學分分佈做 bisect 查詢
+
+資料表定義見 sql/002_wrapped_snapshot.sql；執行 `python wrapped.py --refresh` 更新快照。
+"""
+import os
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timezone
+
+from table_scan import iter_table_rows
+from schedule_format import hydrate_course
+
+WRAPPED_STATS_TABLE = 'wrapped_stats'
+WRAPPED_META_TABLE = 'wrapped_snapshot_meta'
+# 快照超過此時數即視為過期，改走即時計算（排程每天刷新一次，預留一天緩衝）
+WRAPPED_SNAPSHOT_MAX_AGE_HOURS = float(os.environ.get("WRAPPED_SNAPSHOT_MAX_AGE_HOURS", "48"))
+# 行程內快取快照學分分佈的秒數
+WRAPPED_META_CACHE_SECONDS = int(os.environ.get("WRAPPED_META_CACHE_SECONDS", "300"))
+UPSERT_BATCH_SIZE = 500
+
+_meta_cache = {'loaded_at': 0.0, 'meta': None}
+
+
+# --- 單一使用者統計 ---
+def summarize_courses(schedule_data, flexible_courses):
+    """去重後合併固定與彈性課程，回傳 (總學分, 各科系課程數)"""
+    # 去重計算固定課程
+    unique_fixed = {}
+    if isinstance(schedule_data, dict):
+        unique_fixed = {
+            v['course_id']: v for v in schedule_data.values()
+            if isinstance(v, dict) and 'course_id' in v
+        }
+    # 彈性課程
+    unique_flex = {}
+    if isinstance(flexible_courses, list):
+        unique_flex = {
+            v['course_id']: v for v in flexible_courses
+            if isinstance(v, dict) and 'course_id' in v
+        }
+
+    total_credits = 0.0
+    dept_counts = Counter()
+    for c in list(unique_fixed.values()) + list(unique_flex.values()):
+        c = hydrate_course(c)  # 精簡格式的課程由課程目錄補回學分與系所
+        try:
+            total_credits += float(c.get('course_credit', 0))
+        except (TypeError, ValueError):
+            pass
+        dept = c.get('department', '')
+        if dept:
+            dept_counts[dept] += 1
+    return total_credits, dept_counts
+
+
+def credit_tag(total_credits: float) -> str:
+    """依總學分產生評語"""
+    if total_credits >= 20: return "卷哥卷姐\n候選人"
+    if total_credits >= 18: return "充實的\n大學生"
+    if total_credits >= 16: return "Work-Life\nBalance"
+    if total_credits >= 12: return "佛系\n大學生"
+    return "還在\n探索中..."
+
+
+def build_payload(user: dict, user_rank: int, total_credits: float, dept_counts: Counter, percentile: int) -> dict:
+    """組出 /api/wrapped 的回應內容"""
+    join_date = user.get('created_at') or ''
+    fav_dept = dept_counts.most_common(1)
+    return {
+        "join_date": join_date.split('T')[0] if 'T' in join_date else join_date,
+        "user_name": user.get('full_name') or 'Student',
+        "user_rank": user_rank,
+        "total_credits": round(total_credits, 1),
+        "percentile": percentile,
+        "favorite_dept": fav_dept[0][0] if fav_dept else "尚未分析",
+        "tag": credit_tag(total_credits),
+    }
+
+
+# --- 學分分佈 ---
+class CreditDistribution:
+    """排序後的學分直方圖，以 bisect 在 O(log k) 內算出「贏過多少人」"""
+
+    def __init__(self, credit_values, credit_counts):
+        self.values = list(credit_values)
+        self.cumulative = []
+        running = 0
+        for count in credit_counts:
+            running += count
+            self.cumulative.append(running)
+        self.population = running
+
+    @classmethod
+    def from_credits(cls, credits):
+        histogram = sorted(Counter(credits).items())
+        return cls([v for v, _ in histogram], [c for _, c in histogram])
+
+    def percentile(self, my_credits: float) -> int:
+        """贏過多少人 => (小於我的學分的人數 / 總人數) * 100"""
+        if not self.population:
+            return 0
+        idx = bisect_left(self.values, my_credits)
+        wins = self.cumulative[idx - 1] if idx > 0 else 0
+        return int((wins / self.population) * 100)
+
+
+def _parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _snapshot_age_hours(generated_at: str) -> float:
+    return (datetime.now(timezone.utc) - _parse_timestamp(generated_at)).total_seconds() / 3600
+
+
+# --- 批次快照 ---
+def build_wrapped_snapshot(client) -> dict:
+    """一次掃描計算全部使用者的 wrapped 結果並寫入快照表，回傳 meta"""
+    generated_at = datetime.now(timezone.utc).isoformat()
+
+    user_stats = {}
+    all_credits = []
+    for row in iter_table_rows(client, 'schedules', 'user_id, schedule_data, flexible_courses'):
+        total_credits, dept_counts = summarize_courses(row.get('schedule_data'), row.get('flexible_courses'))
+        user_stats[row['user_id']] = (total_credits, dept_counts)
+        all_credits.append(total_credits)
+    distribution = CreditDistribution.from_credits(all_credits)
+
+    users = [u for u in iter_table_rows(client, 'users', 'created_at, full_name', key_column='google_id')
+             if u.get('created_at')]
+    users.sort(key=lambda u: _parse_timestamp(u['created_at']))
+
+    payload_rows = []
+    previous_join, previous_rank = None, 0
+    for position, user in enumerate(users):
+        # 與即時查詢一致：rank = created_at 嚴格早於自己的人數 + 1（同時加入者同名次）
+        join_time = _parse_timestamp(user['created_at'])
+        user_rank = previous_rank if join_time == previous_join else position + 1
+        previous_join, previous_rank = join_time, user_rank
+
+        total_credits, dept_counts = user_stats.get(user['google_id'], (0.0, Counter()))
+        payload_rows.append({
+            'user_id': user['google_id'],
+            'payload': build_payload(user, user_rank, total_credits, dept_counts,
+                                     distribution.percentile(total_credits)),
+            'generated_at': generated_at,
+        })
+
+    for start in range(0, len(payload_rows), UPSERT_BATCH_SIZE):
+        client.table(WRAPPED_STATS_TABLE).upsert(
+            payload_rows[start:start + UPSERT_BATCH_SIZE], on_conflict='user_id'
+        ).execute()
+
+    meta = {
+        'id': 1,
+        'generated_at': generated_at,
+        'credit_values': distribution.values,
+        'credit_counts': [c - (distribution.cumulative[i - 1] if i else 0)
+                          for i, c in enumerate(distribution.cumulative)],
+        'user_count': len(payload_rows),
+    }
+    client.table(WRAPPED_META_TABLE).upsert(meta, on_conflict='id').execute()
+    return meta
+
+
+def _load_snapshot_meta(client):
+    """讀取快照 meta（行程內快取）；不存在或已過期時回傳 None"""
+    now = time.monotonic()
+    if _meta_cache['meta'] is None or now - _meta_cache['loaded_at'] > WRAPPED_META_CACHE_SECONDS:
+        res = client.table(WRAPPED_META_TABLE).select('*').eq('id', 1).limit(1).execute()
+        _meta_cache['meta'] = res.data[0] if res.data else None
+        _meta_cache['loaded_at'] = now
+
+    meta = _meta_cache['meta']
+    if not meta or _snapshot_age_hours(meta['generated_at']) > WRAPPED_SNAPSHOT_MAX_AGE_HOURS:
+        return None
+    return meta
+
+
+# --- API 使用 ---
+def get_wrapped_payload(client, user_google_id: str):
+    """回傳使用者的 wrapped 結果；使用者不存在時回傳 None"""
+    try:
+        meta = _load_snapshot_meta(client)
+    except Exception as e:
+        print(f"Warning: Failed to load wrapped snapshot, computing live. Error: {e}")
+        meta = None
+
+    # 1. 快照直接讀取
+    if meta:
+        res = (client.table(WRAPPED_STATS_TABLE).select('payload, generated_at')
+               .eq('user_id', user_google_id).limit(1).execute())
+        if res.data and _snapshot_age_hours(res.data[0]['generated_at']) <= WRAPPED_SNAPSHOT_MAX_AGE_HOURS:
+            return res.data[0]['payload']
+
+    # 2. 快照後才加入的使用者：即時計算
+    user_res = client.table('users').select('created_at, full_name').eq('google_id', user_google_id).execute()
+    if not user_res.data:
+        return None
+    current_user = user_res.data[0]
+    join_date = current_user['created_at']  # ISO format string
+
+    # 計算有多少人的 created_at 比這位使用者早
+    try:
+        rank_res = client.table('users').select('google_id', count='exact').lt('created_at', join_date).execute()
+        user_rank = rank_res.count + 1
+    except Exception:
+        # Fallback if created_at doesn't exist or other error, assume based on row count roughly
+        user_rank = 999
+
+    schedule_res = (client.table('schedules').select('schedule_data, flexible_courses')
+                    .eq('user_id', user_google_id).limit(1).execute())
+    total_credits, dept_counts = 0.0, Counter()
+    if schedule_res.data:
+        data = schedule_res.data[0]
+        total_credits, dept_counts = summarize_courses(data.get('schedule_data'), data.get('flexible_courses'))
+
+    # 全校學分分佈：優先使用快照，否則分頁串流掃描
+    if meta:
+        distribution = CreditDistribution(meta['credit_values'], meta['credit_counts'])
+    else:
+        distribution = CreditDistribution.from_credits(
+            summarize_courses(row.get('schedule_data'), row.get('flexible_courses'))[0]
+            for row in iter_table_rows(client, 'schedules', 'schedule_data, flexible_courses')
+        )
+
+    return build_payload(current_user, user_rank, total_credits, dept_counts,
+                         distribution.percentile(total_credits))
+
+
+if __name__ == '__main__':
+    if '--refresh' not in sys.argv[1:]:
+        print("用法: python wrapped.py --refresh")
+        sys.exit(1)
+
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        print("FATAL: SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
+        sys.exit(1)
+
+    print("開始建立 Semester Wrapped 快照...")
+    snapshot_meta = build_wrapped_snapshot(create_client(url, key))
+    print(f"✔ 快照完成：{snapshot_meta['user_count']} 位使用者，產生時間 {snapshot_meta['generated_at']}")
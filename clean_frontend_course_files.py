@@ -1,23 +1,48 @@
 # clean_frontend_course_files.py
+"""
+清理前端 data 資料夾中沒有課程的 course_require_*.json
+
+用法：
+    python clean_frontend_course_files.py [--preview] [--data-dir 路徑] [--workers N]
+
+- 資料夾預設為本專案的 frontend/public/data，可用 --data-dir 或環境變數 COURSE_DATA_DIR 指定 (CI 可直接執行)
+- .cleanup_manifest.json 記錄每個檔案的大小、mtime、內容雜湊與判斷結果；
+  大小與 mtime 都沒變的檔案直接沿用結果，mtime 變了但雜湊相同也不必重新解析
+- 需要重新檢查的檔案以 process pool 平行處理
+"""
 import os
+import re
 import json
+import hashlib
 import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any
 
-# 🎯 修改：指向前端專案的 data 資料夾
-DATA_DIR = Path(r"C:\Users\ofire\Desktop\ncnu-super-assistant\frontend\public\data")
+# 🎯 修改：預設指向本專案的前端 data 資料夾，不再寫死本機路徑
+DATA_DIR = Path(os.getenv("COURSE_DATA_DIR", Path(__file__).parent / "frontend" / "public" / "data"))
 LOG_FILE = DATA_DIR / "cleanup_log.txt"
+MANIFEST_FILE = DATA_DIR / ".cleanup_manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+# 只處理單一系所班別的檔案，course_require_bundle.json 等合併檔不在清理範圍
+COURSE_REQUIRE_FILE = re.compile(r'^course_require_(\d+)_([0-9A-Za-z]+)_([A-Za-z])\.json$')
 
-# 設定日誌
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding="utf-8"),
-        logging.StreamHandler()  # 同時顯示在控制台
-    ]
-)
+def configure(data_dir: Path):
+    """設定資料夾與日誌 (日誌檔寫在資料夾內，因此要在確定路徑後才設定)"""
+    global DATA_DIR, LOG_FILE, MANIFEST_FILE
+    DATA_DIR = data_dir
+    LOG_FILE = DATA_DIR / "cleanup_log.txt"
+    MANIFEST_FILE = DATA_DIR / ".cleanup_manifest.json"
+    handlers = [logging.StreamHandler()]  # 同時顯示在控制台
+    if DATA_DIR.exists():
+        handlers.insert(0, logging.FileHandler(LOG_FILE, encoding="utf-8"))
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=handlers
+    )
 
 def is_empty_course_file(file_path: Path) -> tuple[bool, str]:
     """
@@ -83,7 +108,79 @@ def is_empty_course_file(file_path: Path) -> tuple[bool, str]:
         logging.warning(f"讀取檔案失敗 {file_path}: {e}")
         return False, f"讀取失敗: {e}"
 
-def clean_empty_files() -> Dict[str, List[str]]:
+# ───────────────────────── 增量檢查 ──────────────────────────
+def load_manifest() -> Dict[str, Any]:
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest["files"]
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"清單檔無法讀取，全部重新檢查: {e}")
+    return {}
+
+def list_course_files() -> List[Path]:
+    return sorted(p for p in DATA_DIR.glob("course_require_*.json") if COURSE_REQUIRE_FILE.match(p.name))
+
+def save_manifest(files: Dict[str, Any]):
+    tmp_path = MANIFEST_FILE.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+def inspect_file(file_path: Path, previous: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    計算單一檔案的雜湊並判斷是否為空 (在 worker process 執行)
+    內容雜湊與上次相同時沿用上次的判斷，不必解析 JSON
+    """
+    stat = file_path.stat()
+    with open(file_path, 'rb') as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    if previous and previous.get("hash") == content_hash:
+        is_empty, reason = previous["is_empty"], previous["reason"]
+    else:
+        is_empty, reason = is_empty_course_file(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": content_hash,
+            "is_empty": is_empty, "reason": reason}
+
+def check_files(course_files: List[Path], workers: int = DEFAULT_WORKERS) -> Dict[str, Dict[str, Any]]:
+    """
+    回傳 {檔名: 清單紀錄}；大小與 mtime 都沒變的檔案直接沿用清單，其餘以 process pool 平行檢查
+    結果會寫回清單檔，讀取失敗的檔案不記錄，下次會再檢查
+    """
+    manifest = load_manifest()
+    verdicts, pending = {}, []
+    for file_path in course_files:
+        entry = manifest.get(file_path.name)
+        stat = file_path.stat()
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            verdicts[file_path.name] = entry
+        else:
+            pending.append(file_path)
+
+    logging.info(f"{len(verdicts)} 個檔案未變更沿用清單，{len(pending)} 個檔案需要檢查")
+    if pending:
+        previous = [manifest.get(p.name) for p in pending]
+        if workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                entries = list(executor.map(inspect_file, pending, previous, chunksize=16))
+        else:
+            entries = [inspect_file(p, prev) for p, prev in zip(pending, previous)]
+        verdicts.update({p.name: entry for p, entry in zip(pending, entries)})
+
+    save_manifest({name: entry for name, entry in verdicts.items() if not entry["reason"].startswith("讀取失敗")})
+    return verdicts
+
+def forget_files(names: List[str]):
+    """已刪除的檔案從清單移除"""
+    files = load_manifest()
+    for name in names:
+        files.pop(name, None)
+    save_manifest(files)
+
+def clean_empty_files(workers: int = DEFAULT_WORKERS) -> Dict[str, List[str]]:
     """
     掃描並清理空的課程檔案
     
@@ -96,23 +193,26 @@ def clean_empty_files() -> Dict[str, List[str]]:
     
     # 找出所有 course_require_*.json 檔案
     pattern = "course_require_*.json"
-    course_files = list(DATA_DIR.glob(pattern))
+    course_files = list_course_files()
     
     if not course_files:
         logging.warning(f"在 {DATA_DIR} 中找不到符合 {pattern} 的檔案")
         return {"deleted": [], "kept": [], "errors": []}
     
     results = {"deleted": [], "kept": [], "errors": []}
+    deleted_names = []
     
     logging.info(f"開始掃描 {len(course_files)} 個檔案...")
+    verdicts = check_files(course_files, workers)
     
     for file_path in course_files:
         try:
-            is_empty, reason = is_empty_course_file(file_path)
+            is_empty, reason = verdicts[file_path.name]["is_empty"], verdicts[file_path.name]["reason"]
             
             if is_empty:
                 # 刪除空檔案
                 file_path.unlink()
+                deleted_names.append(file_path.name)
                 results["deleted"].append(f"{file_path.name} - {reason}")
                 logging.info(f"✘ 刪除: {file_path.name} ({reason})")
             else:
@@ -124,6 +224,7 @@ def clean_empty_files() -> Dict[str, List[str]]:
             results["errors"].append(f"{file_path.name} - {e}")
             logging.error(f"❌ 處理失敗: {file_path.name} - {e}")
     
+    forget_files(deleted_names)
     return results
 
 def generate_summary_report(results: Dict[str, List[str]]):
@@ -179,7 +280,7 @@ def generate_summary_report(results: Dict[str, List[str]]):
     
     print(f"📄 詳細報告已儲存至: {report_file}")
 
-def preview_files_to_delete():
+def preview_files_to_delete(workers: int = DEFAULT_WORKERS):
     """預覽將要刪除的檔案"""
     print("🔍 預覽模式：檢查將要刪除的檔案...")
     
@@ -187,7 +288,7 @@ def preview_files_to_delete():
         print(f"❌ 資料目錄不存在: {DATA_DIR}")
         return
     
-    course_files = list(DATA_DIR.glob("course_require_*.json"))
+    course_files = list_course_files()
     if not course_files:
         print("❌ 找不到課程檔案")
         return
@@ -195,12 +296,12 @@ def preview_files_to_delete():
     to_delete = []
     to_keep = []
     
-    for file_path in course_files:
-        is_empty, reason = is_empty_course_file(file_path)
-        if is_empty:
-            to_delete.append((file_path.name, reason))
+    # 預覽也會更新清單 (判斷結果只取決於檔案內容)，之後的正式執行不必重新檢查
+    for name, entry in check_files(course_files, workers).items():
+        if entry["is_empty"]:
+            to_delete.append((name, entry["reason"]))
         else:
-            to_keep.append(file_path.name)
+            to_keep.append(name)
     
     print(f"\n📊 預覽結果:")
     print(f"🗑️  將刪除: {len(to_delete)} 個檔案")
@@ -214,11 +315,15 @@ def preview_files_to_delete():
             print(f"   ... 及其他 {len(to_delete) - 15} 個檔案")
 
 def main():
-    import sys
+    parser = argparse.ArgumentParser(description="清理沒有課程的 course_require_*.json")
+    parser.add_argument("--preview", action="store_true", help="只預覽將刪除的檔案")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="course_require_*.json 所在資料夾")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="平行檢查的 process 數")
+    args = parser.parse_args()
+    configure(args.data_dir)
     
-    # 檢查命令列參數
-    if len(sys.argv) > 1 and sys.argv[1] == "--preview":
-        preview_files_to_delete()
+    if args.preview:
+        preview_files_to_delete(args.workers)
         return
     
     logging.info(f"開始清理前端專案中的空課程資料檔案...")
@@ -232,7 +337,7 @@ def main():
         return
     
     # 執行清理
-    results = clean_empty_files()
+    results = clean_empty_files(args.workers)
     
     # 生成報告
     generate_summary_report(results)
@@ -0,0 +1,138 @@
+# course_require_bundle.py
+"""
+把所有 course_require_{YEAR}_{deptId}_{class}.json 合併成單一精簡檔 course_require_bundle.json
+
+格式 (format = "course_require_bundle/v1")：
+- strings: 字串表，系所、班別、課名、課號等重複字串只存一次，其他地方以索引引用
+- records: 去重後的課程 [課號, 課名, 學分(數字), 系所, 班別]，字串欄位皆為 strings 的索引
+- entries: 各組合的課程 (records 索引) 依序攤平成一個陣列
+- index:   "{year}_{deptId}_{class}" => [entries 起點, 筆數]
+
+標題列 (" 必修課程" / "合計:") 已濾除，沒有任何課程的組合不會輸出，因此不需要再跑清理腳本。
+前端只需抓一次這個檔案，後端也只需讀一個檔案。
+
+用法：
+    python course_require_bundle.py [--source 資料夾] [--output 輸出檔]
+"""
+import sys
+import json
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+
+# 格式、檔名規則與標題列判斷和讀取端 (backend/graduation.py) 共用同一份定義
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+from graduation import BUNDLE_FORMAT, BUNDLE_FILENAME, COURSE_REQUIRE_FILE, is_header_row  # noqa: E402
+
+DEFAULT_SOURCE_DIR = Path(__file__).parent / "frontend" / "public" / "data"
+
+
+def _to_credit(value):
+    try:
+        credit = float(value)
+    except (TypeError, ValueError):
+        return 0
+    return int(credit) if credit.is_integer() else credit
+
+
+def extract_courses(content: dict) -> list:
+    """API 回應 => 去除標題列的課程列表 (item 可能是單一物件或陣列)"""
+    items = (content or {}).get('course_require_ncnu', {}).get('item')
+    if isinstance(items, dict):
+        items = [items]
+    return [c for c in items or [] if isinstance(c, dict) and not is_header_row(c)]
+
+
+class BundleBuilder:
+    """逐一加入 (year, deptId, class) 的課程，最後輸出合併檔"""
+
+    def __init__(self):
+        self._strings = []
+        self._string_ids = {}
+        self._records = []
+        self._record_ids = {}
+        self._combinations = {}
+
+    def _intern(self, value) -> int:
+        value = str(value if value is not None else '').strip()
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+        return string_id
+
+    def add(self, year: str, dept_id: str, class_type: str, content: dict) -> int:
+        """加入一個組合的 API 回應，回傳有效課程數；空組合不會被記錄"""
+        record_ids = []
+        for course in extract_courses(content):
+            record = (
+                self._intern(course.get('course_id')),
+                self._intern(course.get('course_cname')),
+                _to_credit(course.get('course_credit')),
+                self._intern(course.get('department')),
+                self._intern(course.get('class')),
+            )
+            record_id = self._record_ids.get(record)
+            if record_id is None:
+                record_id = self._record_ids[record] = len(self._records)
+                self._records.append(list(record))
+            record_ids.append(record_id)
+        if record_ids:
+            self._combinations[f"{year}_{dept_id}_{class_type}"] = record_ids
+        return len(record_ids)
+
+    def build(self) -> dict:
+        entries, index = [], {}
+        for key in sorted(self._combinations):
+            record_ids = self._combinations[key]
+            index[key] = [len(entries), len(record_ids)]
+            entries.extend(record_ids)
+        return {
+            "format": BUNDLE_FORMAT,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "strings": self._strings,
+            "records": self._records,
+            "entries": entries,
+            "index": index,
+        }
+
+
+def write_bundle(bundle: dict, output_path: Path):
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(bundle, ensure_ascii=False, separators=(',', ':')), encoding="utf-8")
+
+
+def build_from_directory(source_dir: Path) -> tuple:
+    """由既有的 course_require_*.json 檔案建立合併檔，回傳 (bundle, 讀取檔案數)"""
+    builder = BundleBuilder()
+    files = 0
+    for file_path in sorted(source_dir.glob("course_require_*.json")):
+        match = COURSE_REQUIRE_FILE.match(file_path.name)
+        if not match:
+            continue
+        with open(file_path, 'r', encoding='utf-8') as f:
+            builder.add(*match.groups(), json.load(f))
+        files += 1
+    return builder.build(), files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合併 course_require_*.json 為單一精簡檔")
+    parser.add_argument("--source", type=Path, default=DEFAULT_SOURCE_DIR, help="course_require_*.json 所在資料夾")
+    parser.add_argument("--output", type=Path, help=f"輸出路徑，預設為 <source>/{BUNDLE_FILENAME}")
+    args = parser.parse_args()
+
+    if not args.source.exists():
+        print(f"❌ 資料目錄不存在: {args.source}")
+        sys.exit(1)
+
+    output_path = args.output or args.source / BUNDLE_FILENAME
+    bundle, files = build_from_directory(args.source)
+    write_bundle(bundle, output_path)
+    print(f"✔ 已合併 {files} 個檔案 => {len(bundle['index'])} 個有資料的組合、"
+          f"{len(bundle['records'])} 筆不重複課程，輸出至 {output_path} "
+          f"({output_path.stat().st_size / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
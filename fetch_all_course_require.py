@@ -1,17 +1,41 @@
 # fetch_all_course_require.py
+"""
+抓取所有 deptId × 班別 (B/G/P) 的必修資料並輸出合併檔 course_require_bundle.json
+
+- 多執行緒並行抓取 (FETCH_WORKERS)，所有 worker 共用一個 token bucket 限制對 API 的請求速率
+- 每完成一個組合就更新檢查點 fetch_manifest_{YEAR}.json；中途失敗後加上 --resume 重跑，
+  只會補抓尚未完成或失敗的組合
+- 每個組合記錄內容雜湊；整批抓完後若所有雜湊都與上一次相同且合併檔已存在，就不重寫合併檔
+
+離線測試：先執行 python ncnu_api_stub.py，再以
+    NCNU_API_BASE=http://127.0.0.1:8765/API/get.aspx python fetch_all_course_require.py
+"""
 import os
-import time
 import json
+import time
+import hashlib
 import logging
+import argparse
+import threading
+from datetime import datetime
 from pathlib import Path
 from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 from requests.exceptions import RequestException
 
+from course_require_bundle import BundleBuilder, write_bundle, extract_courses, BUNDLE_FILENAME
+
 YEAR = os.getenv("NCNU_YEAR", "114")            # 可改成 CLI 參數
+API_BASE = os.getenv("NCNU_API_BASE", "https://api.ncnu.edu.tw/API/get.aspx")
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "4"))
+FETCH_RATE = float(os.getenv("FETCH_RATE", "2"))      # 每秒平均請求數
+FETCH_BURST = int(os.getenv("FETCH_BURST", "4"))      # 允許的瞬間請求數
+CLASS_TYPES = ["B", "G", "P"]
 SAVE_DIR = Path("./course_require_data")
 SAVE_DIR.mkdir(exist_ok=True)
 LOG_FILE = SAVE_DIR / "fetch_log.txt"
+MANIFEST_VERSION = 1
 
 # ───────────────────────── 日誌設定 ──────────────────────────
 logging.basicConfig(
@@ -21,52 +45,207 @@ logging.basicConfig(
     encoding="utf-8"
 )
 
+# ───────────────────────── 速率限制 ──────────────────────────
+class TokenBucket:
+    """執行緒安全的 token bucket：平均每秒 rate 個請求，最多累積 burst 個"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+rate_limiter = TokenBucket(FETCH_RATE, FETCH_BURST)
+_session_local = threading.local()
+
 # ───────────────────────── 公用函式 ──────────────────────────
+def _session() -> requests.Session:
+    """每個 worker 執行緒各自一個 Session，重用連線"""
+    if not hasattr(_session_local, "session"):
+        _session_local.session = requests.Session()
+    return _session_local.session
+
 def fetch_json(url: str, retries: int = 3, sleep_sec: float = 1.0):
-    """簡易 GET，失敗自動重試"""
+    """簡易 GET，失敗自動重試；每次嘗試都要先取得 token"""
     for attempt in range(1, retries + 1):
+        rate_limiter.acquire()
         try:
-            res = requests.get(url, timeout=15)
+            res = _session().get(url, timeout=15)
             res.raise_for_status()
             return res.json()
-        except RequestException as e:
+        except (RequestException, ValueError) as e:
             logging.warning(f"Attempt {attempt}/{retries} failed: {e}")
             if attempt == retries:
                 raise
-            time.sleep(sleep_sec)
+            time.sleep(sleep_sec * attempt)
 
 def get_dept_ids() -> List[str]:
     """讀取所有 deptId（兩碼大小寫英數字）"""
-    url = "https://api.ncnu.edu.tw/API/get.aspx?json=course_deptId"
+    url = f"{API_BASE}?json=course_deptId"
     data = fetch_json(url)
     items = data.get("course_deptId", {}).get("item", [])
     return [item["開課單位代碼"].strip() for item in items if item.get("開課單位代碼")]
 
-def save_course_require(dept_id: str, cls: str):
-    """抓取並儲存單一系所+班別資料"""
-    url = (f"https://api.ncnu.edu.tw/API/get.aspx?"
-           f"json=course_require&year={YEAR}&deptId={dept_id}&class={cls}")
-    try:
-        data = fetch_json(url)
-        fname = SAVE_DIR / f"course_require_{YEAR}_{dept_id}_{cls}.json"
-        fname.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-        logging.info(f"✔ Saved {fname.name}")
-    except Exception as e:
-        logging.error(f"✘ Failed {dept_id}-{cls}: {e}")
+def content_hash(courses: list) -> str:
+    """去除標題列後的課程內容雜湊 (key 排序，與欄位順序無關)"""
+    canonical = json.dumps(courses, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def fetch_course_require(dept_id: str, cls: str) -> list:
+    """抓取單一系所+班別資料，回傳去除標題列的課程列表"""
+    url = f"{API_BASE}?json=course_require&year={YEAR}&deptId={dept_id}&class={cls}"
+    return extract_courses(fetch_json(url))
+
+# ───────────────────────── 檢查點 ──────────────────────────
+class FetchManifest:
+    """
+    fetch_manifest_{YEAR}.json：
+    {"version", "year", "run_id", "completed", "combinations": {"{deptId}_{class}": {...}}}
+    每個組合記錄 status (ok / empty / failed)、hash、courses、run_id 與 fetched_at
+    """
 
+    def __init__(self, path: Path, year: str):
+        self.path = path
+        self.year = year
+        self.data = {"version": MANIFEST_VERSION, "year": year, "run_id": None,
+                     "completed": False, "combinations": {}}
+        self._lock = threading.Lock()
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    loaded = json.load(f)
+                if loaded.get("version") == MANIFEST_VERSION and loaded.get("year") == year:
+                    self.data = loaded
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable manifest {path}: {e}")
+
+    def start_run(self, resume: bool) -> bool:
+        """開始一次抓取；可續跑時沿用上次的 run_id 並回傳 True"""
+        if resume and self.data["run_id"] and not self.data["completed"]:
+            return True
+        self.data["run_id"] = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.data["completed"] = False
+        self.save()
+        return False
+
+    def is_done(self, key: str) -> bool:
+        entry = self.data["combinations"].get(key)
+        return bool(entry) and entry.get("run_id") == self.data["run_id"] and entry.get("status") != "failed"
+
+    def record(self, key: str, status: str, courses: list = None, error: str = None) -> bool:
+        """記錄一個組合的結果並寫回檢查點，回傳內容是否與上一次不同"""
+        with self._lock:
+            previous = self.data["combinations"].get(key, {})
+            entry = {"status": status, "run_id": self.data["run_id"],
+                     "fetched_at": datetime.now().isoformat(timespec="seconds")}
+            if status == "failed":
+                # 保留上一次成功的內容，合併檔才不會因暫時失敗而少掉組合
+                entry.update({k: previous[k] for k in ("hash", "courses") if k in previous})
+                entry["error"] = error
+                changed = False
+            else:
+                entry["hash"] = content_hash(courses)
+                entry["courses"] = courses
+                changed = entry["hash"] != previous.get("hash")
+            self.data["combinations"][key] = entry
+            self.save()
+            return changed
+
+    def prune(self, keys: set) -> int:
+        """移除已不在 deptId 清單中的組合，回傳移除數"""
+        with self._lock:
+            stale = [key for key in self.data["combinations"] if key not in keys]
+            for key in stale:
+                del self.data["combinations"][key]
+            if stale:
+                self.save()
+            return len(stale)
+
+    def finish(self):
+        with self._lock:
+            self.data["completed"] = True
+            self.save()
+
+    def save(self):
+        """先寫暫存檔再 replace，程式中斷也不會留下寫一半的檢查點"""
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def build_bundle(self) -> dict:
+        builder = BundleBuilder()
+        for key in sorted(self.data["combinations"]):
+            courses = self.data["combinations"][key].get("courses")
+            if courses:
+                dept_id, cls = key.rsplit("_", 1)
+                builder.add(self.year, dept_id, cls, {"course_require_ncnu": {"item": courses}})
+        return builder.build()
+
+# ───────────────────────── 主程式 ──────────────────────────
 def main():
+    parser = argparse.ArgumentParser(description="抓取所有系所班別的必修資料")
+    parser.add_argument("--resume", action="store_true", help="從上次中斷的檢查點繼續")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS, help="並行抓取的執行緒數")
+    args = parser.parse_args()
+
+    manifest = FetchManifest(SAVE_DIR / f"fetch_manifest_{YEAR}.json", YEAR)
+    resumed = manifest.start_run(args.resume)
+
     dept_ids = get_dept_ids()
-    class_types = ["B", "G", "P"]
-    total = len(dept_ids) * len(class_types)
-    logging.info(f"Start fetching {total} files for academic year {YEAR}")
+    combinations = [(dept, cls) for dept in dept_ids for cls in CLASS_TYPES]
+    pending = [(dept, cls) for dept, cls in combinations if not manifest.is_done(f"{dept}_{cls}")]
+    logging.info(f"Start fetching {len(pending)}/{len(combinations)} combinations for academic year {YEAR} "
+                 f"({'resumed' if resumed else 'new run'} {manifest.data['run_id']}, "
+                 f"{args.workers} workers, {FETCH_RATE}/s)")
+
+    changed = manifest.prune({f"{dept}_{cls}" for dept, cls in combinations})
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(fetch_course_require, dept, cls): (dept, cls) for dept, cls in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            dept, cls = futures[future]
+            key = f"{dept}_{cls}"
+            try:
+                courses = future.result()
+            except Exception as e:
+                failed += 1
+                manifest.record(key, "failed", error=str(e))
+                logging.error(f"✘ Failed {dept}-{cls}: {e}")
+                continue
+            if manifest.record(key, "ok" if courses else "empty", courses):
+                changed += 1
+            if courses:
+                logging.info(f"✔ Fetched {dept}-{cls}: {len(courses)} courses")
+            else:
+                logging.info(f"- Skipped empty {dept}-{cls}")
+            if done % 60 == 0:
+                logging.info(f"Progress: {done}/{len(pending)} combinations done")
 
-    for idx, dept in enumerate(dept_ids, 1):
-        for cls in class_types:
-            save_course_require(dept, cls)
-            time.sleep(1)          # 禮貌間隔
-        if idx % 20 == 0:
-            logging.info(f"Progress: {idx}/{len(dept_ids)} departments done")
+    if failed:
+        logging.warning(f"{failed} combinations failed; rerun with --resume to retry them")
+    else:
+        manifest.finish()
 
+    bundle_path = SAVE_DIR / BUNDLE_FILENAME
+    if changed or resumed or not bundle_path.exists():
+        bundle = manifest.build_bundle()
+        write_bundle(bundle, bundle_path)
+        logging.info(f"✔ Saved {BUNDLE_FILENAME}: {len(bundle['index'])} non-empty combinations ({changed} changed)")
+    else:
+        logging.info(f"- {BUNDLE_FILENAME} unchanged, skip writing")
     logging.info("All done!")
 
 if __name__ == "__main__":
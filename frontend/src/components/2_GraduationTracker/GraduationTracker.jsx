@@ -1,6 +1,6 @@
 // frontend/src/components/2_GraduationTracker/GraduationTracker.jsx (爬蟲適配版)
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import './GraduationTracker.css';
 
@@ -26,6 +26,39 @@ const GraduationTracker = () => {
         return `/data/course_require_${year}_${deptId}_${classType}.json`;
     };
 
+    // 🆕 必修合併檔 (course_require_bundle.json) 只下載一次；載入失敗時記為 false，改回逐檔載入
+    const requireBundleRef = useRef(null);
+    const loadRequireBundle = async () => {
+        if (requireBundleRef.current === null) {
+            try {
+                const res = await axios.get('/data/course_require_bundle.json');
+                requireBundleRef.current = res.data?.index ? res.data : false;
+            } catch (err) {
+                console.warn('必修合併檔載入失敗，改為逐檔載入:', err.message);
+                requireBundleRef.current = false;
+            }
+        }
+        return requireBundleRef.current;
+    };
+
+    // 🆕 從合併檔還原單一系所班別的必修課程 (字串以索引存放於 strings)
+    const getCoursesFromBundle = (bundle, deptId, classType, year = '114') => {
+        const entry = bundle.index[`${year}_${deptId}_${classType}`];
+        if (!entry) return [];
+        const [offset, count] = entry;
+        return bundle.entries.slice(offset, offset + count).map(recordId => {
+            const [courseId, cname, credit, department, className] = bundle.records[recordId];
+            return {
+                year,
+                course_id: bundle.strings[courseId],
+                course_cname: bundle.strings[cname],
+                course_credit: credit,
+                department: bundle.strings[department],
+                class: bundle.strings[className]
+            };
+        });
+    };
+
     useEffect(() => {
         axios.get('/data/開課單位代碼API.json')
             .then(res => {
@@ -40,11 +73,16 @@ const GraduationTracker = () => {
             setError('');
             
             try {
-                // 🎯 動態生成檔案路徑
-                const filePath = generateFilePath(selection.deptId, selection.classType);
-                
-                const response = await axios.get(filePath);
-                const courses = response.data?.course_require_ncnu?.item || [];
+                let courses;
+                const bundle = await loadRequireBundle();
+                if (bundle) {
+                    courses = getCoursesFromBundle(bundle, selection.deptId, selection.classType);
+                } else {
+                    // 🎯 動態生成檔案路徑
+                    const filePath = generateFilePath(selection.deptId, selection.classType);
+                    const response = await axios.get(filePath);
+                    courses = response.data?.course_require_ncnu?.item || [];
+                }
                 
                 if (courses.length > 0) {
                     // 🎯 有資料：正常顯示課程
@@ -0,0 +1,112 @@
+# ncnu_api_stub.py
+"""
+離線測試用的 api.ncnu.edu.tw 替身
+
+以 frontend/public/data 的檔案回應
+    /API/get.aspx?json=course_deptId                              (由 course_require 檔案的 deptId 組成)
+    /API/get.aspx?json=course_require&year=&deptId=&class=        course_require_{YEAR}_{deptId}_{class}.json
+    /API/get.aspx?json=unitId_ncnu | contact_ncnu | course_ncnu   對應的 API 快取檔
+    /calendar.ics                                                 學校行事曆 (Google 行事曆替身)
+沒有檔案的 course_require 組合回傳只有標題列的空結果 (與正式 API 相同)。
+可加上人工延遲與隨機失敗率，用來測試抓取腳本的並行、重試與 --resume。
+
+用法：
+    python ncnu_api_stub.py [--port 8765] [--delay 0.2] [--fail-rate 0.1]
+"""
+import re
+import json
+import time
+import random
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_DATA_DIR = Path(__file__).parent / "frontend" / "public" / "data"
+COURSE_REQUIRE_FILE = re.compile(r'^course_require_(\d+)_([0-9A-Za-z]+)_([A-Za-z])\.json$')
+DATASET_FILES = {
+    "unitId_ncnu": "行政教學單位代碼API.json",
+    "contact_ncnu": "校園聯絡資訊API.json",
+    "course_ncnu": "本學期開課資訊API.json",
+}
+EMPTY_REQUIRE = {"course_require_ncnu": {"item": [{"course_id": " 必修課程", "course_cname": ""}]}}
+
+
+def make_handler(data_dir: Path, delay: float, fail_rate: float):
+    dept_ids = sorted({
+        match.group(2)
+        for match in (COURSE_REQUIRE_FILE.match(p.name) for p in data_dir.glob("course_require_*.json"))
+        if match
+    })
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if delay:
+                time.sleep(delay)
+            if url.path not in ("/API/get.aspx", "/calendar.ics"):
+                return self._send_json(404, {"error": "not found"})
+            if fail_rate and random.random() < fail_rate:
+                return self._send_json(503, {"error": "injected failure"})
+
+            if url.path == "/calendar.ics":
+                body = (data_dir / "calendar.ics").read_bytes()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/calendar; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if params.get("json") in DATASET_FILES:
+                with open(data_dir / DATASET_FILES[params["json"]], "r", encoding="utf-8") as f:
+                    return self._send_json(200, json.load(f))
+
+            if params.get("json") == "course_deptId":
+                return self._send_json(200, {"course_deptId": {"item": [
+                    {"開課單位代碼": dept_id} for dept_id in dept_ids
+                ]}})
+            if params.get("json") == "course_require":
+                name = f"course_require_{params.get('year')}_{params.get('deptId')}_{params.get('class')}.json"
+                file_path = data_dir / name
+                if not file_path.exists():
+                    return self._send_json(200, EMPTY_REQUIRE)
+                with open(file_path, "r", encoding="utf-8") as f:
+                    return self._send_json(200, json.load(f))
+            return self._send_json(400, {"error": "unsupported json parameter"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler, dept_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="api.ncnu.edu.tw 離線替身")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    parser.add_argument("--delay", type=float, default=0.0, help="每個請求的人工延遲秒數")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="隨機回傳 503 的比例 (0~1)")
+    args = parser.parse_args()
+
+    handler, dept_ids = make_handler(args.data_dir, args.delay, args.fail_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    print(f"✔ Stub API on http://127.0.0.1:{args.port}/API/get.aspx ({len(dept_ids)} deptIds from {args.data_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
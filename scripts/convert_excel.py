@@ -22,6 +22,11 @@ SCRIPT_DIR = Path(__file__).parent
 INPUT_EXCEL_PATH = SCRIPT_DIR / SOURCE_EXCEL_FILENAME
 REPO_PATH = SCRIPT_DIR.parent
 TARGET_JSON_PATH = REPO_PATH / "frontend" / "public" / "data" / "本學期開課資訊API.json"
+ARCHIVE_PATH = REPO_PATH / "backend" / "data" / "course_archive"
+
+# 歷年封存模組 (backend/course_archive.py)，每次轉換後也封存該學年期
+sys.path.insert(0, str(REPO_PATH / "backend"))
+from course_archive import CourseArchive
 
 # [非常重要] Excel 欄位名稱 -> JSON Key 的對應字典
 COLUMN_MAPPING = {
@@ -118,6 +123,10 @@ def convert():
             current_semester = str(final_df.iloc[0]['semester'])
 
         print(f"[OK] 轉換成功！資料已儲存至: {TARGET_JSON_PATH}")
+
+        if course_list:
+            archived = CourseArchive(ARCHIVE_PATH).append(current_year, current_semester, course_list)
+            print(f"[OK] {current_year}-{current_semester} 歷年封存{'已更新' if archived else '無變更'}: {ARCHIVE_PATH}")
         return True, current_year, current_semester
     except Exception as e:
         print(f"在轉換過程中發生錯誤: {e}")
@@ -136,7 +145,7 @@ def git_commit_and_push(year, semester):
             return
 
         print("正在將更新的課程資料加入版本控制...")
-        repo.index.add([str(TARGET_JSON_PATH)])
+        repo.git.add(str(TARGET_JSON_PATH), str(ARCHIVE_PATH))
         
         commit_message = f"Data: 自動更新 {year}-{semester} 課程資料 (來自 {SOURCE_EXCEL_FILENAME})"
         repo.index.commit(commit_message)
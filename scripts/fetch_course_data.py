@@ -1,5 +1,14 @@
-# scripts/fetch_course_data.py (強制更新版)
+# scripts/fetch_course_data.py (差異同步版)
+"""
+從學校 API 同步本學期開課資訊
 
+- 以 course_id + class 比對新舊目錄，只有內容真的不同時才寫入 本學期開課資訊API.json
+  (課程依主鍵排序，輸出順序固定)，沒有變更就不產生 git diff、不觸發重新部署
+- 有變更時另外輸出 course_catalog_changeset.json (新增 / 移除 / 修改的課程)，
+  後端 (backend/catalog.py) 以 base_hash 確認手上的版本後直接套用，不必重新解析整份目錄
+- 有變更時同時更新 backend/data/course_archive 中該學年期的欄式封存 (見 backend/course_archive.py)
+- API 失敗時保留原本的目錄檔並以非零狀態結束；API 回傳空資料 (學期之間) 只警告，保留原檔
+"""
 import requests
 import json
 from pathlib import Path
@@ -7,82 +16,139 @@ import sys
 import os
 from datetime import datetime
 
+# 歷年封存與目錄模組放在 backend/，只依賴標準函式庫；主鍵、雜湊與 changeset 格式與後端共用
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from course_archive import CourseArchive
+from catalog import CHANGESET_FILENAME, CHANGESET_FORMAT, index_courses, catalog_hash
+
+CATALOG_FILENAME = "本學期開課資訊API.json"
+
 def get_current_academic_year_semester():
     """根據當前日期自動判斷學年和學期"""
     now = datetime.utcnow()
     year = now.year
     month = now.month
     day = now.day
-    
+
     if month > 6 or (month == 6 and day >= 24):
         academic_year = year - 1911
     else:
         academic_year = year - 1912
-    
+
     if month >= 1 and month < 6:
         semester = "2"
     elif month == 6 and day < 24:
-        semester = "2"  
+        semester = "2"
     else:
         semester = "1"
-    
+
     return str(academic_year), semester
 
+def load_previous_catalog(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = json.load(f)
+        return index_courses(content.get('course_ncnu', {}).get('item'))
+    except Exception as e:
+        print(f"⚠️ 無法讀取既有目錄，視為全新同步: {e}")
+        return {}
+
+def diff_catalogs(previous: dict, current: dict) -> dict:
+    """比對新舊目錄，回傳新增 / 移除 (主鍵) / 修改的課程，皆依主鍵排序"""
+    return {
+        "added": [current[key] for key in sorted(current.keys() - previous.keys())],
+        "removed": sorted(previous.keys() - current.keys()),
+        "modified": [current[key] for key in sorted(current.keys() & previous.keys())
+                     if current[key] != previous[key]],
+    }
+
+def write_json(path: Path, content: dict, indent=4):
+    """先寫暫存檔再 replace，避免留下寫一半的檔案"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(content, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, path)
+
 def fetch_and_save_courses():
-    """強制從 API 獲取並更新課程資料"""
+    """從 API 獲取課程資料，只有內容變更時才更新檔案並輸出 changeset"""
     YEAR, SEMESTER = get_current_academic_year_semester()
-    
+
     print(f"--- 週期性課程資料同步 ---")
     print(f"執行時間 (UTC): {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"目標學年期: {YEAR}-{SEMESTER}")
     print(f"---------------------------")
-    
+
     API_URL = f"https://api.ncnu.edu.tw/API/get.aspx?json=course_ncnu&year={YEAR}&semester={SEMESTER}&unitId=all"
     base_path = Path(os.getenv("GITHUB_WORKSPACE", "."))
-    OUTPUT_PATH = base_path / "frontend" / "public" / "data" / "本學期開課資訊API.json"
-    
+    DATA_DIR = base_path / "frontend" / "public" / "data"
+    OUTPUT_PATH = DATA_DIR / CATALOG_FILENAME
+    CHANGESET_PATH = DATA_DIR / CHANGESET_FILENAME
+
     print(f"正在從學校 API 獲取課程資料...")
     print(f"API URL: {API_URL}")
     print(f"儲存路徑: {OUTPUT_PATH}")
-    
+
     try:
         response = requests.get(API_URL, timeout=60)
         response.raise_for_status()
         content = response.json()
-        
+
         # 檢查資料完整性
-        data_key = list(content.keys())[0]
-        if content[data_key].get('item') is None:
-            print("⚠️ 警告：API 返回空資料，但仍將強制更新檔案")
-        
-        # 強制建立目錄並儲存檔案
-        OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-        
-        # 添加更新時間戳記
-        content['_last_updated'] = datetime.utcnow().isoformat()
-        content['_update_source'] = 'weekly_auto_sync'
-        
-        with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-            json.dump(content, f, ensure_ascii=False, indent=4)
-        
-        print(f"✔ 強制更新完成！資料已儲存到 {OUTPUT_PATH}")
-        
+        items = content.get('course_ncnu', {}).get('item')
+        if not items:
+            print("⚠️ 警告：API 返回空資料 (可能在學期之間)，保留原本的課程目錄")
+            return
+
+        previous = load_previous_catalog(OUTPUT_PATH)
+        current = index_courses(items)
+        previous_hash = catalog_hash(previous) if previous else None
+        current_hash = catalog_hash(current)
+
+        if previous_hash == current_hash:
+            print(f"✔ 課程資料無變更 ({len(current)} 門課)，不更新檔案")
+            return
+
+        changes = diff_catalogs(previous, current)
+        print(f"課程資料有變更：新增 {len(changes['added'])}、移除 {len(changes['removed'])}、"
+              f"修改 {len(changes['modified'])} 門課")
+
+        # 依主鍵排序輸出，時間戳記只在內容變更時才會更新
+        write_json(OUTPUT_PATH, {
+            "course_ncnu": {"item": [current[key] for key in sorted(current)]},
+            "_last_updated": datetime.utcnow().isoformat(),
+            "_update_source": "weekly_auto_sync",
+            "_content_hash": current_hash,
+        })
+
+        # 換學期或第一次同步時沒有可比對的基準，客戶端應整份重新載入
+        write_json(CHANGESET_PATH, {
+            "format": CHANGESET_FORMAT,
+            "year": YEAR,
+            "semester": SEMESTER,
+            "generated_at": datetime.utcnow().isoformat(),
+            "base_hash": previous_hash,
+            "hash": current_hash,
+            "full_reload": previous_hash is None or len(changes['removed']) == len(previous),
+            **changes,
+        }, indent=None)
+
+        archive = CourseArchive(base_path / "backend" / "data" / "course_archive")
+        archive.append(YEAR, SEMESTER, [current[key] for key in sorted(current)])
+
+        print(f"✔ 更新完成！資料已儲存到 {OUTPUT_PATH}，變更清單已儲存到 {CHANGESET_PATH}")
+
     except requests.exceptions.RequestException as e:
         print(f"❌ 網路請求錯誤: {e}")
-        # 建立錯誤標記檔案
-        error_content = {
-            "error": str(e),
-            "timestamp": datetime.utcnow().isoformat(),
-            "message": "API請求失敗，請檢查網路連線"
-        }
-        with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-            json.dump(error_content, f, ensure_ascii=False, indent=4)
+        print("保留原本的課程目錄，請檢查網路連線")
         sys.exit(1)
-        
+
     except json.JSONDecodeError as e:
         print(f"❌ JSON解析錯誤: {e}")
         sys.exit(1)
-        
+
     except Exception as e:
         print(f"❌ 未知錯誤: {e}")
         sys.exit(1)